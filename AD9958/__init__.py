@@ -1 +1,15 @@
-from source.AD9958 import *
\ No newline at end of file
+from source.AD9958 import *
+from source.rampCache import *
+from source.protocol import *
+from source.emulator import *
+from source.registerShadow import *
+from source.sequence import *
+from source.optimizer import *
+from source.timingAnalyzer import *
+from source.asyncAD9958 import *
+from source.devicePool import *
+from source.driverStats import *
+from source.profiler import *
+from source.sequenceTemplate import *
+from source.sequenceLibrary import *
+from source.envelope import *
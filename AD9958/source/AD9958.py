@@ -34,12 +34,18 @@ from __future__ import division
 import serial
 import numpy as np
 import time
+from rampCache import rampCache_class
+from protocol import *
+from registerShadow import registerShadow_class
+from sequence import sequence_class
+from driverStats import driverStats_class
+from envelope import fitPiecewiseLinear
 
 class AD9958_class:
 	"""
 		Main AD9958 class
 
-		:param ser: Serial port object
+		:param ser: Serial port object (None for offline recording, see :func:`AD9958_class.startRecording`)
 		:type ser: serial.Serial
 		:param ref_clk: REF_CLK frequency in Hz.
 		:type ref_clk: int
@@ -47,8 +53,12 @@ class AD9958_class:
 		:type PLL_MULTIPLIER: int
 		:param chipkit_clk: System clock of the chipkit Max 32
 		:type chipkit_clk: int
+		:param rampCache: Persistent cache for the solutions of :func:`AD9958_class.findOptimalRamp` (Default is None, no cache).
+		:type rampCache: rampCache_class
+		:param connectTimeout: Maximum waiting time in s for the readiness handshake with the microcontroller after (re)opening the serial port (Default is 5, see :func:`AD9958_class.waitReady`). An already open port is checked with a single checkStackFinished.
+		:type connectTimeout: float
 	"""
-	def __init__(self,ser,ref_clk,PLL_multiplier,chipkit_clk):
+	def __init__(self,ser,ref_clk,PLL_multiplier,chipkit_clk,rampCache=None,connectTimeout=5.):
 	#Clock properties
 		self.REF_CLK=ref_clk
 		self.PLL_MULTIPLIER=PLL_multiplier
@@ -58,10 +68,45 @@ class AD9958_class:
 		self.ch0Enabled=1
 		self.ch1Enabled=1
 
+	#Command encoding
+		self.binaryMode=False
+
+	#Serial link
+		self.baudRate=BAUD_DEFAULT
+		self.effectiveThroughput=None
+
+	#Instrumentation counters
+		self.stats=driverStats_class()
+		self.traceHooks=[]
+
+	#Write buffer
+		self.bufferedWrite=False
+		self.writeBuffer=None
+		self.writeBufferPos=0
+
+	#Recording
+		self.recording=None
+
+	#Stack paging
+		self.pageSizes=[]
+
+	#Upload skipping
+		self.lazyUpload=False
+		self.pendingSequence=sequence_class()
+		self.uploadsSkipped=0
+
+	#Delta patching
+		self.uploadedSequence=None #Last sequence uploaded with uploadSequence or patchSequence
+		self.patchesSent=0
+		self.patchBytesSaved=0
+
 	# Starting communication
 		self.ser=ser
+		self.connectTime=None
 		forceRestartFlag=False
-		if not(self.ser.isOpen()):
+		if self.ser is None:
+			print "No serial port. Recording function stack offline."
+		elif not(self.ser.isOpen()):
 			forceRestartFlag=True
 			print "Serial port closed.  Requesting restart."
 		else:
@@ -73,8 +118,10 @@ class AD9958_class:
 			self.ser.close()
 			self.ser.open()
 			print "Restarting serial port."
-			time.sleep(5) #Waiting for microcontroller to start
-		print "Serial port OK."
+			if not(self.waitReady(connectTimeout)):
+				print "ERROR: microcontroller not ready after %.1f s."%connectTimeout
+		if self.ser is not None:
+			print "Serial port OK."
 
 	# Modulation
 		self.modulationLevel=0
@@ -82,26 +129,375 @@ class AD9958_class:
 
 	#Sweep
 		self.sweepType=None
+		self.rampCache=rampCache
 
 	#Instructions counter
 		self.instructionCounter=0
 
 	#Initializing register map
-		self.registerMap0=np.zeros(25,dtype=np.uint32) #Register map of channel 0
-		self.registerMap1=np.zeros(25,dtype=np.uint32) #Register map of channel 1
-		self.registerMap=np.zeros(25,dtype=np.uint32) #Current register map
+		self.registerShadow=registerShadow_class()
+		self.registerMap0=self.registerShadow.map0 #Register map of channel 0
+		self.registerMap1=self.registerShadow.map1 #Register map of channel 1
+		self.registerMap=self.registerShadow.working #Current register map
 		self.commonRegisters=[0x00,0x01,0x02] #Registeres shared between channel 0 and channel 1
+		self.skipRedundantWrites=False
+
+		if self.ser is None:
+			self.startRecording()
+
+
+
+
+
+	def _sendCommand(self,opcode,*params):
+		"""
+			Encodes a command (ASCII or binary, see :func:`AD9958_class.setBinaryMode`) and sends it to the microcontroller. While recording, function stack instructions are appended to the recorded sequence instead.
+		"""
+		self.stats.opcodeCalls[opcode]=self.stats.opcodeCalls.get(opcode,0)+1
+		if self.traceHooks:
+			startTime=time.time()
+			data=self._dispatchCommand(opcode,params)
+			self._trace(commandNames[opcode],params,data,startTime,time.time())
+			return
+		self._dispatchCommand(opcode,params)
+		return
+
+	def _dispatchCommand(self,opcode,params):
+		"""
+			Records or sends a command (see :func:`AD9958_class._sendCommand`).
+
+			:returns: Encoded command (None if the command is recorded).
+		"""
+		if self.recording is not None:
+			if opcode in stackOpcodes:
+				self.recording.append(opcode,params,self.ch0Enabled,self.ch1Enabled)
+			elif opcode==OP_CLEAR_STACK:
+				self.recording.clear()
+			return None
+		if self.lazyUpload and (opcode in stackOpcodes or opcode==OP_CLEAR_STACK):
+			if opcode==OP_CLEAR_STACK:
+				self.pendingSequence.clear()
+			else:
+				self.pendingSequence.append(opcode,params,self.ch0Enabled,self.ch1Enabled)
+			return None
+		return self._transmit(opcode,params)
+
+	def _transmit(self,opcode,params=()):
+		"""
+			Encodes a command and sends it to the microcontroller.
+		"""
+		startTime=time.time()
+		if self.binaryMode:
+			data=encodeBinary(opcode,params)
+		else:
+			data=encodeASCII(opcode,params)
+		self.stats.encodeTime+=time.time()-startTime
+		self._write(data)
+		return data
+
+	def _trace(self,name,params,data,startTime,endTime):
+		"""
+			Calls the trace hooks (see :func:`AD9958_class.addTraceHook`).
+		"""
+		for hook in list(self.traceHooks):
+			hook(name,params,data,startTime,endTime)
+		return
+
+	def addTraceHook(self,hook):
+		"""
+			Adds a trace hook, which is called for every emitted command as **hook(name,params,data,startTime,endTime)**: command name (e.g. "setRegister"), command parameters, encoded bytes (None if the command was recorded) and time.time() before and after encoding and writing it. Block transfers of :func:`AD9958_class.uploadSequence` and :func:`AD9958_class.setRegisterArray` are reported as a single call with their method name. See :func:`profile` for a profiler based on trace hooks.
+
+			:param hook: Callable.
+			:type hook: function
+		"""
+		self.traceHooks.append(hook)
+		return
+
+	def removeTraceHook(self,hook):
+		"""
+			Removes a trace hook added with :func:`AD9958_class.addTraceHook`.
+
+			:param hook: Callable.
+			:type hook: function
+		"""
+		self.traceHooks.remove(hook)
+		return
+
+	def _serialWrite(self,data):
+		"""
+			Writes to the serial port and updates the write counters of **stats**.
+		"""
+		startTime=time.time()
+		self.ser.write(data)
+		stats=self.stats
+		stats.writeTime+=time.time()-startTime
+		stats.writeCalls+=1
+		stats.bytesWritten+=len(data)
+		return
+
+	def _query(self,opcode):
+		"""
+			Sends a request and returns the answer line of the microcontroller. The round trip time is recorded in **stats**.
+		"""
+		startTime=time.time()
+		self._sendCommand(opcode)
+		self.flush()
+		line=self.ser.readline()
+		self.stats.addRoundTrip(opcode,time.time()-startTime)
+		return line
+
+	def _write(self,data):
+		"""
+			Sends an encoded command to the serial port. In buffered mode the command is appended to the write buffer, which is flushed when full.
+		"""
+		if not self.bufferedWrite:
+			self._serialWrite(data)
+			return
+
+		n=len(data)
+		if self.writeBufferPos+n>len(self.writeBuffer):
+			self.flush()
+			if n>len(self.writeBuffer):
+				self._serialWrite(data)
+				return
+		self.writeBuffer[self.writeBufferPos:self.writeBufferPos+n]=data
+		self.writeBufferPos+=n
+		return
+
+	def flush(self):
+		"""
+			Sends the content of the write buffer to the serial port (only relevant in buffered mode, see :func:`AD9958_class.setBufferedWrite`).
+		"""
+		if self.writeBufferPos>0:
+			self._serialWrite(self.writeBuffer[:self.writeBufferPos])
+			self.writeBufferPos=0
+		return
+
+	def setBufferedWrite(self,enable,bufferSize=4096):
+		"""
+			Enables/disables the buffered write mode. In buffered mode the encoded commands are collected in a preallocated buffer and sent in large chunks: when the buffer is full, on :func:`AD9958_class.runStack`, on :func:`AD9958_class.flush` and before any command expecting an answer from the microcontroller.
+
+			:param enable: Buffered write mode flag.
+			:type enable: bool
+			:param bufferSize: Size of the write buffer in bytes (Default is 4096).
+			:type bufferSize: int
+		"""
+		if self.bufferedWrite:
+			self.flush()
+		self.bufferedWrite=enable
+		if enable:
+			self.writeBuffer=bytearray(bufferSize)
+		else:
+			self.writeBuffer=None
+		self.writeBufferPos=0
+		return
+
+	def setBinaryMode(self,enable):
+		"""
+			Enables/disables the binary upload protocol. In binary mode every command is sent as a one byte opcode followed by fixed width little endian operands (see :mod:`protocol`), which reduces the upload size per instruction by a factor 3-12 with respect to the ASCII commands.
+
+			:param enable: Binary mode flag.
+			:type enable: bool
+		"""
+		if enable and not self.binaryMode:
+			self._write(ASCII_BINARY_MODE)
+			self.flush()
+			if self.ser.readline()!="OK\n":
+				print "ERROR: binary mode not supported by the microcontroller. Using ASCII mode."
+				return
+		elif not enable and self.binaryMode:
+			self._write(encodeBinary(OP_ASCII_MODE))
+		self.binaryMode=enable
+		return
+
+	def setBaudRate(self,baudRate):
+		"""
+			Negotiates a new baud rate with the microcontroller: the setBaud command is answered at the current baud rate, then both sides switch and an echo test (BAUD_ECHO_TEST) is sent at the new baud rate. A valid echo is confirmed with BAUD_CONFIRM, and the microcontroller only keeps the new baud rate once the confirmation arrives. The new baud rate is then checked with checkStackFinished. If any step fails, both sides fall back to the previous baud rate; if the microcontroller does not answer there, the new baud rate is probed as well, so a lost answer can not leave both ends at different baud rates. On success, **baudRate** is updated and the round trip throughput of the echo test (in bytes/s) is stored in **effectiveThroughput**.
+
+			:param baudRate: New baud rate.
+			:type baudRate: int
+			:returns: True if the new baud rate is active.
+		"""
+		if self.recording is not None:
+			print "ERROR: no serial port."
+			return False
+		binaryMode=self.binaryMode
+		if binaryMode:
+			self.setBinaryMode(False) #setBaud is an ASCII command
+		previousBaudRate=self.ser.baudrate
+
+		self.flush()
+		self.ser.flushInput()
+		self._write(ASCII_SET_BAUD%baudRate)
+		self.flush()
+		if self.ser.readline()!="OK\n":
+			print "ERROR: baud rate negotiation not supported by the microcontroller."
+			success=False
+		else:
+			time.sleep(2*BAUD_SWITCH_DELAY) #microcontroller switches the baud rate
+			self.ser.baudrate=baudRate
+			startTime=time.time()
+			self._write(BAUD_ECHO_TEST+"\n")
+			self.flush()
+			echo=self.ser.readline()
+			elapsed=time.time()-startTime
+			success=echo==BAUD_ECHO_TEST+"\n"
+			if success:
+				self._write(BAUD_CONFIRM+"\n")
+				self.flush()
+				success=self.checkStackFinished()
+			if not success:
+				print "WARNING: baud rate negotiation at %d baud failed. Falling back to %d baud."%(baudRate,previousBaudRate)
+				self.ser.baudrate=previousBaudRate
+				time.sleep(BAUD_TIMEOUT) #microcontroller falls back after BAUD_TIMEOUT
+				if not self.waitReady(BAUD_TIMEOUT):
+					self.ser.baudrate=baudRate #the confirmation arrived but the answer of its check was lost
+					success=self.waitReady(BAUD_TIMEOUT)
+					if not success:
+						self.ser.baudrate=previousBaudRate
+						print "ERROR: microcontroller not answering at %d or %d baud."%(previousBaudRate,baudRate)
+			if success:
+				self.baudRate=baudRate
+				self.effectiveThroughput=2*len(echo)/max(elapsed,1e-9)
+
+		if binaryMode:
+			self.setBinaryMode(True)
+		return success
+
+	def negotiateBaudRate(self,baudRates=(921600,460800,230400,115200,57600)):
+		"""
+			Tries the given baud rates in order (see :func:`AD9958_class.setBaudRate`) and keeps the first one passing the echo test.
+
+			:param baudRates: Candidate baud rates, fastest first.
+			:type baudRates: tuple
+			:returns: Active baud rate.
+		"""
+		for baudRate in baudRates:
+			if self.setBaudRate(baudRate):
+				break
+		return self.baudRate
+
+	def startRecording(self):
+		"""
+			Starts recording the function stack instructions into a :class:`sequence_class` instead of sending them to the microcontroller. The recorded sequence can be inspected, stored and uploaded later in one shot with :func:`AD9958_class.uploadSequence`.
+		"""
+		self.recording=sequence_class()
+		self.instructionCounter=0
+		self.registerShadow.invalidate()
+		return
+
+	def stopRecording(self):
+		"""
+			Stops recording.
+
+			:returns: Recorded sequence.
+		"""
+		recordedSequence=self.recording
+		self.recording=None
+		return recordedSequence
+
+	def uploadSequence(self,sequence,checkHash=True):
+		"""
+			Clears the function stack and uploads a recorded sequence in one shot. If the function stack of the microcontroller already holds an identical sequence (same :func:`AD9958_class.getStackHash`), the upload is skipped and counted in **uploadsSkipped**.
+
+			:param sequence: Recorded sequence.
+			:type sequence: sequence_class
+			:param checkHash: Compares the stack hashes before uploading (Default is True).
+			:type checkHash: bool
+		"""
+		if checkHash and self.recording is None and self.getStackHash()==sequence.hash():
+			self.uploadsSkipped+=1
+		else:
+			self._transmit(OP_CLEAR_STACK)
+			startTime=time.time()
+			data=sequence.encode(self.binaryMode)
+			self.stats.encodeTime+=time.time()-startTime
+			self._write(data)
+			if self.traceHooks:
+				self._trace("uploadSequence",(len(sequence),),data,startTime,time.time())
+			self.flush()
+		self.uploadedSequence=sequence.copy()
+		self.registerShadow.invalidate()
+		self.instructionCounter=len(sequence)
+		return
+
+	def patchSequence(self,sequence,checkHash=True):
+		"""
+			Updates the function stack to a new sequence by sending only the changed parameters of the last uploaded sequence (patchStack command with instruction index, parameter slot and value). If the opcodes differ from the last uploaded sequence, or if the microcontroller does not hold it anymore, the sequence is uploaded in full (see :func:`AD9958_class.uploadSequence`). The bytes saved with respect to a full upload are accumulated in **patchBytesSaved**.
+
+			:param sequence: Recorded sequence.
+			:type sequence: sequence_class
+			:param checkHash: Verifies with the stack hash that the microcontroller holds the last uploaded sequence (Default is True).
+			:type checkHash: bool
+		"""
+		uploaded=self.uploadedSequence
+		if uploaded is None or len(uploaded)!=len(sequence) or (uploaded.instructions()["opcode"]!=sequence.instructions()["opcode"]).any() or (checkHash and self.getStackHash()!=uploaded.hash()):
+			self.uploadSequence(sequence,checkHash)
+			return
+
+		index,slot=np.nonzero(uploaded.instructions()["params"]!=sequence.instructions()["params"])
+		if len(index)==0:
+			self.uploadsSkipped+=1
+		values=sequence.instructions()["params"][index,slot]
+		patchBytes=0
+		for patch in zip(index.tolist(),slot.tolist(),values.tolist()):
+			self._sendCommand(OP_PATCH_STACK,*patch)
+			patchBytes+=len(encodeBinary(OP_PATCH_STACK,patch) if self.binaryMode else encodeASCII(OP_PATCH_STACK,patch))
+		self.flush()
+		fullBytes=len(encodeBinary(OP_CLEAR_STACK) if self.binaryMode else encodeASCII(OP_CLEAR_STACK))+len(sequence.encode(self.binaryMode))
+		self.patchBytesSaved+=fullBytes-patchBytes
+		self.patchesSent+=len(index)
+
+		self.uploadedSequence=sequence.copy()
+		self.registerShadow.invalidate()
+		self.instructionCounter=len(sequence)
+		return
 
+	def setLazyUpload(self,enable):
+		"""
+			Enables/disables the lazy upload mode. In lazy upload mode the function stack instructions are collected in **pendingSequence** and uploaded by :func:`AD9958_class.runStack` (see :func:`AD9958_class.uploadSequence`), which skips the upload when the microcontroller already holds the same function stack. Reruns of identical shots then only send runStack.
 
+			:param enable: Lazy upload mode flag.
+			:type enable: bool
+		"""
+		self.lazyUpload=enable
+		self.pendingSequence.clear()
+		return
 
+	def runSequence(self,sequence,timeout=60.):
+		"""
+			Runs a recorded sequence of any length. The sequence is split into pages of at most LEN_FUNCTIONSTACK instructions (see :func:`sequence_class.splitPages`), which are uploaded and run one after another. The number of instructions programmed on the function stack for every page is stored in **pageSizes**.
 
+			:param sequence: Recorded sequence.
+			:type sequence: sequence_class
+			:param timeout: Maximum execution time of a page in s (Default is 60).
+			:type timeout: float
+			:returns: True if all pages were executed, False otherwise.
+		"""
+		if self.recording is not None:
+			print "ERROR: runSequence is not available while recording."
+			return False
+		self.pageSizes=[]
+		for page in sequence.splitPages():
+			self.uploadSequence(page)
+			lenStack=self.getLenStack()
+			self.pageSizes.append(lenStack)
+			if lenStack!=len(page):
+				print "ERROR: page %d not uploaded correctly. Programmed instructions: %s, requested instructions: %d."%(len(self.pageSizes)-1,lenStack,len(page))
+				return False
+			self.runStack()
+			if not self.waitStackFinished(timeout):
+				print "ERROR: page %d not finished after %.1f s."%(len(self.pageSizes)-1,timeout)
+				return False
+		return True
 
 	def reset(self):
 		"""
 			Resets the AD9958 chip by pulsing the RESET pin.
 		"""
-		self.ser.write("reset\n")
+		self._sendCommand(OP_RESET)
 		self.instructionCounter+=1
+		self.registerShadow.invalidate()
 
 		return
 
@@ -116,24 +512,18 @@ class AD9958_class:
 		:type registerValue: int
 		:param doIO_update: Performs an IO update after writting to the register (Default is True).
 		:type doIO_update: bool
+
+		.. note::
+			If **skipRedundantWrites** is True, writes which would not change the AD9958 (see :func:`registerShadow_class.isRedundant`) are skipped and counted in **registerShadow.skippedWrites**. Skipped writes shorten the execution time of the function stack.
 		"""
+		if self.skipRedundantWrites and self.registerShadow.isRedundant(registerAddress,registerValue,self.ch0Enabled,self.ch1Enabled,doIO_update):
+			self.registerShadow.skippedWrites+=1
+			return
 
-		self.ser.write("setRegister "+str(registerAddress)+" "+str(registerValue)+" "+str(doIO_update&1)+" \n")
+		self._sendCommand(OP_SET_REGISTER,registerAddress,registerValue,doIO_update&1)
 		self.instructionCounter+=1
 
-		#Individual registers
-		if self.ch0Enabled or (registerAddress in self.commonRegisters):
-			self.registerMap0[registerAddress]=registerValue
-		if self.ch1Enabled or (registerAddress in self.commonRegisters):
-			self.registerMap1[registerAddress]=registerValue
-		#Working register
-		if self.ch0Enabled:
-			self.registerMap=np.copy(self.registerMap0)
-		if self.ch1Enabled:
-			self.registerMap=np.copy(self.registerMap1)
-		if self.ch0Enabled and self.ch0Enabled:
-			self.registerMap=self.registerMap0|self.registerMap1
-
+		self.registerShadow.write(registerAddress,registerValue,self.ch0Enabled,self.ch1Enabled,doIO_update)
 		return
 
 	# def readRegister(self,registerAddress):
@@ -164,7 +554,49 @@ class AD9958_class:
 		# return
 
 
-	def setEnabledChannels(self,setCh0Enabled,setCh1Enabled):
+	def setRegisterArray(self,registerAddress,registerValues,doIO_update=True):
+		"""
+		Writes a block of values into AD9958 registers (one setRegister instruction per value). The commands are encoded (or recorded) from the NumPy arrays in one pass, see :func:`encodeSetRegisters`.
+
+		:param registerAddress: Register address (int) or array of register addresses (same length as **registerValues**).
+		:type registerAddress: numpy.ndarray
+		:param registerValues: Values to be written into the registers.
+		:type registerValues: numpy.ndarray
+		:param doIO_update: Performs an IO update after every write (Default is True).
+		:type doIO_update: bool
+		"""
+		registerValues=np.asarray(registerValues,dtype=np.uint32).ravel()
+		registerAddresses=np.broadcast_to(np.asarray(registerAddress,dtype=np.uint8),registerValues.shape)
+		if len(registerValues)==0:
+			return
+		if self.skipRedundantWrites:
+			for address,value in zip(registerAddresses.tolist(),registerValues.tolist()):
+				self.setRegister(address,value,doIO_update)
+			return
+
+		self.stats.opcodeCalls[OP_SET_REGISTER]=self.stats.opcodeCalls.get(OP_SET_REGISTER,0)+len(registerValues)
+		if self.recording is not None:
+			self.recording.appendSetRegisters(registerAddresses,registerValues,doIO_update,self.ch0Enabled,self.ch1Enabled)
+		elif self.lazyUpload:
+			self.pendingSequence.appendSetRegisters(registerAddresses,registerValues,doIO_update,self.ch0Enabled,self.ch1Enabled)
+		else:
+			startTime=time.time()
+			data=encodeSetRegisters(registerAddresses,registerValues,doIO_update,self.binaryMode)
+			self.stats.encodeTime+=time.time()-startTime
+			self._write(data)
+			if self.traceHooks:
+				self._trace("setRegisterArray",(len(registerValues),),data,startTime,time.time())
+		self.instructionCounter+=len(registerValues)
+
+		#Only the last write of each register is relevant for the shadow
+		addresses,lastIndex=np.unique(registerAddresses[::-1],return_index=True)
+		lastIndex=len(registerValues)-1-lastIndex
+		for j in np.sort(lastIndex).tolist():
+			self.registerShadow.write(int(registerAddresses[j]),int(registerValues[j]),self.ch0Enabled,self.ch1Enabled,doIO_update)
+		return
+
+
+	def setEnabledChannels(self,setCh0Enabled,setCh1Enabled,doIO_update=True):
 		"""
 		Sets the enabled channels for the communication (read/write) of the AD9958 registers. The communication will only affect the channel with a logic high value.
 
@@ -172,6 +604,8 @@ class AD9958_class:
 		:type setCh0Enabled: bool
 		:param setCh1Enabled: Flag for channel 1 (True-> comm. enabled ; False-> comm. disabled).
 		:type setCh1Enabled: bool
+		:param doIO_update: Performs an IO update after writting the channel enable bits (Default is True). The channel enable bits take effect without IO update.
+		:type doIO_update: bool
 
 		.. note::
 			Channels 0x00, 0x01 and 0x02 are shared registers and get programmed regardless of the enabled channels settings.
@@ -182,7 +616,7 @@ class AD9958_class:
 		flag=((setCh1Enabled&1)<<7)+((setCh0Enabled&1)<<6)
 		registerAddress=0x00
 		registerValue=flag+(1<<1)
-		self.setRegister(registerAddress,registerValue)
+		self.setRegister(registerAddress,registerValue,doIO_update)
 
 
 
@@ -203,6 +637,22 @@ class AD9958_class:
 		self.setRegister(registerAddress,registerValue)
 		return
 
+	def setClock(self,ref_clk,PLL_multiplier):
+		"""
+			Changes REF_CLK and PLL_MULTIPLIER of the host side model (SYS_CLK=ref_clk*PLL_multiplier). Cached ramp solutions for the previous SYS_CLK are invalidated. Call :func:`AD9958_class.configureSysClock` to program the new PLL_MULTIPLIER into the AD9958.
+
+			:param ref_clk: REF_CLK frequency in Hz.
+			:type ref_clk: int
+			:param PLL_multiplier: PLL multiplier for the AD9958.
+			:type PLL_multiplier: int
+		"""
+		if self.rampCache is not None:
+			self.rampCache.invalidate(self.SYS_CLK)
+		self.REF_CLK=ref_clk
+		self.PLL_MULTIPLIER=PLL_multiplier
+		self.SYS_CLK=self.REF_CLK*self.PLL_MULTIPLIER
+		return
+
 	def setSingleToneMode(self):
 		"""
 			Enables the Single Tone Mode of the AD9958.
@@ -225,7 +675,7 @@ class AD9958_class:
 		return
 
 
-	def setFreqTuningWord(self,channelId,tuningWord):
+	def setFreqTuningWord(self,channelId,tuningWord,doIO_update=True):
 		"""
 			Sets the frequency tuning word. Perfroms the frequency register mapping from channelId to the AD9958 register addresses.
 
@@ -233,6 +683,8 @@ class AD9958_class:
 			:type channelId: int
 			:param tuningWord: frequency tuning word  (minVal=0 maxVal=2^32-1)
 			:type tuningWord: int
+			:param doIO_update: Performs an IO update after writting to the register (Default is True).
+			:type doIO_update: bool
 
 		"""
 		if channelId==0:
@@ -241,16 +693,18 @@ class AD9958_class:
 			registerAddress=0x09+channelId
 
 		registerValue=tuningWord
-		self.setRegister(registerAddress,registerValue)
+		self.setRegister(registerAddress,registerValue,doIO_update)
 		return
 
-	def setPhaseTuningWord(self,channelId,tuningWord):
+	def setPhaseTuningWord(self,channelId,tuningWord,doIO_update=True):
 		"""Sets the phase tuning word. Perfroms the phase register mapping from channelId to the AD9958 register addresses.
 
 			:param channelId: channel ID (minVal=0 maxVal=15)
 			:type channelId: int
 			:param tuningWord: phase tuning word (minVal=0 maxVal=2^14-1)
 			:type tuningWord: int
+			:param doIO_update: Performs an IO update after writting to the register (Default is True).
+			:type doIO_update: bool
 		"""
 		if channelId==0:
 			registerAddress=0x05
@@ -259,17 +713,19 @@ class AD9958_class:
 			registerAddress=0x09+channelId
 			registerValue=(tuningWord<<18)
 
-		self.setRegister(registerAddress,registerValue)
+		self.setRegister(registerAddress,registerValue,doIO_update)
 		return
 
 
-	def setAmplitudeTuningWord(self,channelId,tuningWord):
+	def setAmplitudeTuningWord(self,channelId,tuningWord,doIO_update=True):
 		"""Sets the amplitude tuning word. Perfroms the amplitude register mapping from channelId to the AD9958 register addresses.
 
 			:param channelId: channel ID (minVal=0 maxVal=15)
 			:type channelId: int
 			:param tuningWord: amplitude tuning word (minVal=0 maxVal=2^10-1)
 			:type tuningWord: int
+			:param doIO_update: Performs an IO update after writting to the register (Default is True).
+			:type doIO_update: bool
 		"""
 		if channelId==0:
 			registerAddress=0x06
@@ -278,7 +734,7 @@ class AD9958_class:
 		else:
 			registerAddress=0x09+channelId
 			registerValue=(tuningWord<<22)
-		self.setRegister(registerAddress,registerValue)
+		self.setRegister(registerAddress,registerValue,doIO_update)
 		return
 
 
@@ -321,11 +777,166 @@ class AD9958_class:
 		return
 
 
+	def freqToTuningWords(self,freq):
+		"""Converts an array of frequencies into frequency tuning words (same rounding as :func:`AD9958_class.setFreq`). Out of range values are clipped.
+
+		:param freq: frequencies in Hz (minVal=0 maxVal=SYS_CLK*(2^32-1)/2^32)
+		:type freq: numpy.ndarray
+		:returns: (tuningWords, quantizationError). Tuning words (uint32) and difference in Hz between the requested and the programmed frequencies.
+		"""
+		freq=np.asarray(freq,dtype=float)
+		tuningWords=self._clipTuningWords((freq/self.SYS_CLK)*(2**32),2**32-1,"Frequency")
+		return tuningWords,freq-tuningWords/2.**32*self.SYS_CLK
+
+	def phaseToTuningWords(self,phase):
+		"""Converts an array of phases into phase tuning words (same rounding as :func:`AD9958_class.setPhase`). Out of range values are clipped.
+
+		:param phase: phases in degrees (minVal=0 maxVal=360*(2^14-1)/2^14=359.9780)
+		:type phase: numpy.ndarray
+		:returns: (tuningWords, quantizationError). Tuning words (uint32) and difference in degrees between the requested and the programmed phases.
+		"""
+		phase=np.asarray(phase,dtype=float)
+		tuningWords=self._clipTuningWords(phase/360.*(2**14),2**14-1,"Phase")
+		return tuningWords,phase-tuningWords*(360./2**14)
+
+	def amplitudeToTuningWords(self,amplitude):
+		"""Converts an array of amplitudes into amplitude tuning words (same rounding as :func:`AD9958_class.setAmplitude`). Out of range values are clipped.
+
+		:param amplitude: amplitudes (minVal=0 maxVal=1)
+		:type amplitude: numpy.ndarray
+		:returns: (tuningWords, quantizationError). Tuning words (uint32) and difference between the requested and the programmed amplitudes.
+		"""
+		amplitude=np.asarray(amplitude,dtype=float)
+		tuningWords=self._clipTuningWords(amplitude*(2**10-1),2**10-1,"Amplitude")
+		return tuningWords,amplitude-tuningWords/(2.**10-1)
+
+	def _clipTuningWords(self,scaledValues,maxWord,name):
+		"""
+			Truncates scaled values to integer tuning words and clips them to [0,maxWord].
+		"""
+		outOfRange=(scaledValues<0)|(scaledValues>=maxWord+1)|np.isnan(scaledValues)
+		if outOfRange.any():
+			print "ERROR: %s out of range for %d of %d values. Values clipped."%(name,np.count_nonzero(outOfRange),outOfRange.size)
+		return np.clip(np.nan_to_num(scaledValues),0,maxWord).astype(np.uint32)
+
+	def setFreqArray(self,channelId,freq):
+		"""Writes a block of frequencies into a given channel ID, one setRegister instruction (with IO update) per value.
+
+		:param channelId: channel ID (minVal=0 maxVal=15)
+		:type channelId: int
+		:param freq: frequencies in Hz (minVal=0 maxVal=SYS_CLK*(2^32-1)/2^32)
+		:type freq: numpy.ndarray
+		:returns: Quantization error in Hz.
+		"""
+		tuningWords,quantizationError=self.freqToTuningWords(freq)
+		if channelId==0:
+			registerAddress=0x04
+		else:
+			registerAddress=0x09+channelId
+		self.setRegisterArray(registerAddress,tuningWords)
+		return quantizationError
+
+	def setPhaseArray(self,channelId,phase):
+		"""Writes a block of phases into a given channel ID, one setRegister instruction (with IO update) per value.
+
+		:param channelId: channel ID (minVal=0 maxVal=15)
+		:type channelId: int
+		:param phase: phases in degrees (minVal=0 maxVal=359.9780)
+		:type phase: numpy.ndarray
+		:returns: Quantization error in degrees.
+		"""
+		tuningWords,quantizationError=self.phaseToTuningWords(phase)
+		if channelId==0:
+			self.setRegisterArray(0x05,tuningWords)
+		else:
+			self.setRegisterArray(0x09+channelId,tuningWords<<18)
+		return quantizationError
+
+	def setAmplitudeArray(self,channelId,amplitude):
+		"""Writes a block of amplitudes into a given channel ID, one setRegister instruction (with IO update) per value.
+
+		:param channelId: channel ID (minVal=0 maxVal=15)
+		:type channelId: int
+		:param amplitude: amplitudes (minVal=0 maxVal=1)
+		:type amplitude: numpy.ndarray
+		:returns: Quantization error.
+		"""
+		tuningWords,quantizationError=self.amplitudeToTuningWords(amplitude)
+		if channelId==0:
+			mask=~(2**10-1)&0xFFFFFFFF #mask for unchanged bits
+			self.setRegisterArray(0x06,(mask&self.registerMap[0x06])|tuningWords)
+		else:
+			self.setRegisterArray(0x09+channelId,tuningWords<<22)
+		return quantizationError
+
+
+	def setChannelWords(self,modulationTypeSelect,ch0Values=None,ch1Values=None):
+		"""Loads the channel word registers (profiles 0-15 of the modulation, see :func:`AD9958_class.setModulationRegister`) of channel 0 and/or channel 1 from arrays. The values are converted in one pass and shifted into the word position of the modulation type. Registers already holding the requested value (see :class:`registerShadow_class`) are not written, identical words for both channels are written once with both channels enabled and a single IO update is performed at the end. The enabled channels are restored afterwards.
+
+		:param modulationTypeSelect: Type of modulation: "amplitude", "frequency" or "phase".
+		:type modulationTypeSelect: str
+		:param ch0Values: Up to 16 frequencies (Hz), phases (degrees) or amplitudes for channel 0, element i is loaded into channel word i (Default is None, channel 0 unchanged).
+		:type ch0Values: numpy.ndarray
+		:param ch1Values: Same as **ch0Values** for channel 1 (Default is None, channel 1 unchanged).
+		:type ch1Values: numpy.ndarray
+		:returns: (quantizationError0, quantizationError1), None for an unchanged channel.
+		"""
+		if modulationTypeSelect=="frequency":
+			toTuningWords,shift,word0Address=self.freqToTuningWords,0,0x04
+		elif modulationTypeSelect=="phase":
+			toTuningWords,shift,word0Address=self.phaseToTuningWords,18,0x05
+		elif modulationTypeSelect=="amplitude":
+			toTuningWords,shift,word0Address=self.amplitudeToTuningWords,22,0x06
+		else:
+			print "ERROR: modulationTypeSelect must be amplitude, frequency or phase."
+			return None,None
+
+		shadow=self.registerShadow
+		quantizationErrors=[]
+		blocks=[] #[ch0Enabled, ch1Enabled, register addresses, register values]
+		for channel,values in ((0,ch0Values),(1,ch1Values)):
+			if values is None:
+				quantizationErrors.append(None)
+				continue
+			tuningWords,quantizationError=toTuningWords(np.asarray(values,dtype=float).ravel())
+			quantizationErrors.append(quantizationError)
+			if len(tuningWords)>16:
+				print "ERROR: at most 16 channel words per channel (%d values given)."%len(tuningWords)
+				return None,None
+			if len(tuningWords)==0:
+				continue
+			registerMap,known=(shadow.map0,shadow.known0) if channel==0 else (shadow.map1,shadow.known1)
+			registerAddresses=np.arange(0x09,0x09+len(tuningWords),dtype=np.uint8)
+			registerAddresses[0]=word0Address
+			registerValues=tuningWords<<shift
+			if modulationTypeSelect=="phase":
+				registerValues[0]=tuningWords[0] #CPOW0 holds the unshifted phase offset word
+			elif modulationTypeSelect=="amplitude":
+				registerValues[0]=(~(2**10-1)&0xFFFFFFFF&registerMap[0x06])|tuningWords[0]
+			changed=np.array([not (known>>address&1) or registerMap[address]!=value for address,value in zip(registerAddresses.tolist(),registerValues.tolist())],dtype=bool)
+			if changed.any():
+				blocks.append([int(channel==0),int(channel==1),registerAddresses[changed],registerValues[changed]])
+		if len(blocks)==2 and np.array_equal(blocks[0][2],blocks[1][2]) and np.array_equal(blocks[0][3],blocks[1][3]):
+			blocks=[[1,1,blocks[0][2],blocks[0][3]]]
+
+		ch0Enabled,ch1Enabled=self.ch0Enabled,self.ch1Enabled
+		for i,(enable0,enable1,registerAddresses,registerValues) in enumerate(blocks):
+			if (enable0,enable1)!=(self.ch0Enabled&1,self.ch1Enabled&1):
+				self.setEnabledChannels(enable0,enable1,False)
+			last=(i==len(blocks)-1) and (enable0,enable1)==(ch0Enabled&1,ch1Enabled&1)
+			self.setRegisterArray(registerAddresses[:-1],registerValues[:-1],False)
+			self.setRegister(int(registerAddresses[-1]),int(registerValues[-1]),last)
+		if (self.ch0Enabled&1,self.ch1Enabled&1)!=(ch0Enabled&1,ch1Enabled&1):
+			self.setEnabledChannels(ch0Enabled,ch1Enabled,True)
+		return tuple(quantizationErrors)
+
+
 	def IO_update(self):
 		"""Performs an IO update.
 		"""
-		self.ser.write("IO_update \n")
+		self._sendCommand(OP_IO_UPDATE)
 		self.instructionCounter+=1
+		self.registerShadow.ioUpdate()
 		return
 
 	def setModulationMode(self,modulationTypeSelect,modulationLevelSelect,priorityChannel):
@@ -508,6 +1119,106 @@ class AD9958_class:
 		return
 
 
+	def setSweepEnvelope(self,sweepTypeSelect,times,values,maxError,minSegmentTime=10e-6):
+		"""
+			Synthesizes a sampled amplitude, frequency or phase envelope with chained linear sweeps instead of one register write per sample. The envelope is fitted with the fewest linear segments within **maxError** (see :func:`fitPiecewiseLinear`) and each segment is played as a sweep (see :func:`AD9958_class.setSweepMode` and :func:`AD9958_class.findOptimalRampArray`):
+
+			* Rising segment: end point E0 (channel word 1), RSRR and RDW are written, a falling segment writes the start point S0 (channel word 0), FSRR and FDW.
+			* The registers are written without IO update during the previous segment. At the segment start (:func:`AD9958_class.waitForTimer`) an IO update transfers them and the profile pins of the enabled channels are toggled if the sweep direction changes (see :func:`AD9958_class.setModulationRegister`). Consecutive segments in the same direction keep the profile pin and only move the end point, the sweep then resumes from the current value.
+			* Flat segments do not produce any instruction.
+			* Segments without a suitable sweep (zero ramp rate or step, see :func:`AD9958_class.findOptimalRampArray`) are skipped and reported, the output holds its value until the next segment.
+
+			The output starts from the first value with the profile pins low. The timer is reset at the beginning of the envelope (**times** are relative to the first sample), after the register writes of the first segment.
+
+			:param sweepTypeSelect: Type of sweep: "amplitude", "frequency" or "phase".
+			:type sweepTypeSelect: str
+			:param times: Sample times in s (strictly increasing).
+			:type times: numpy.ndarray
+			:param values: Target amplitudes, frequencies (Hz) or phases (degrees).
+			:type values: numpy.ndarray
+			:param maxError: Maximum deviation between the target samples and the piecewise-linear fit.
+			:type maxError: float
+			:param minSegmentTime: Minimum duration of a segment in s, leaves time for the register writes of the next segment (Default is 10e-6).
+			:type minSegmentTime: float
+			:returns: Report dict: number of segments and samples, knot times, indices of the skipped segments, maximum and rms deviation of the programmed (quantized) fit from the target, and number of function stack instructions.
+		"""
+		times=np.asarray(times,dtype=float)
+		values=np.asarray(values,dtype=float)
+		if sweepTypeSelect=="frequency":
+			toTuningWords,setTuningWord=self.freqToTuningWords,self.setFreqTuningWord
+		elif sweepTypeSelect=="phase":
+			toTuningWords,setTuningWord=self.phaseToTuningWords,self.setPhaseTuningWord
+		elif sweepTypeSelect=="amplitude":
+			toTuningWords,setTuningWord=self.amplitudeToTuningWords,self.setAmplitudeTuningWord
+		else:
+			print "ERROR: sweepTypeSelect must be amplitude, frequency or phase."
+			return None
+		startInstructions=self.instructionCounter
+
+		#Fit
+		knots=fitPiecewiseLinear(times,values,maxError,minSegmentTime)
+		knotTimes=times[knots]-times[0]
+		tuningWords,quantizationError=toTuningWords(values[knots])
+		tuningWords=tuningWords.tolist()
+		programmedValues=values[knots]-quantizationError
+		lowValue=np.minimum(programmedValues[:-1],programmedValues[1:])
+		highValue=np.maximum(programmedValues[:-1],programmedValues[1:])
+		ramps=self.findOptimalRampArray(sweepTypeSelect,lowValue,highValue,np.diff(knotTimes),np.diff(knotTimes)).tolist()
+
+		#Start point, profile pins low
+		self.setSweepMode(sweepTypeSelect)
+		setTuningWord(0,tuningWords[0],False)
+		setTuningWord(1,tuningWords[0],False)
+		self.IO_update()
+		pinHigh=0
+		self.setModulationRegister(0,0)
+		timerStarted=False
+
+		#Segments
+		skippedSegments=[]
+		currentWord=tuningWords[0] #Tuning word reached at the start of the segment
+		for k in range(len(knots)-1):
+			if tuningWords[k+1]==currentWord:
+				continue
+			RSRR,RDW,FSRR,FDW=ramps[k]
+			rising=int(tuningWords[k+1]>currentWord)
+			if (rising and not(RSRR and RDW)) or (not rising and not(FSRR and FDW)):
+				print "ERROR: no suitable sweep for segment %d (%.3e s to %.3e s). Segment skipped."%(k,knotTimes[k],knotTimes[k+1])
+				skippedSegments.append(k)
+				programmedValues[k+1]=programmedValues[k] #output holds its value
+				continue
+			currentWord=tuningWords[k+1]
+			self.setRegister(0x07,(FSRR<<8)+RSRR,False)
+			if rising:
+				self.setRegister(0x08,RDW,False)
+				setTuningWord(1,tuningWords[k+1],False)
+			else:
+				self.setRegister(0x09,FDW,False)
+				setTuningWord(0,tuningWords[k+1],False)
+			if not timerStarted:
+				self.resetTimer()
+				timerStarted=True
+			self.waitForTimer(knotTimes[k])
+			self.IO_update()
+			if rising!=pinHigh:
+				pinHigh=rising
+				self.setModulationRegister(pinHigh&self.ch0Enabled,pinHigh&self.ch1Enabled)
+		if not timerStarted:
+			self.resetTimer()
+
+		#Fit error of the programmed knots
+		deviation=np.interp(times-times[0],knotTimes,programmedValues)-values
+		return {
+			"segments":len(knots)-1,
+			"samples":len(times),
+			"knotTimes":knotTimes,
+			"skippedSegments":skippedSegments,
+			"maxError":float(np.abs(deviation).max()),
+			"rmsError":float(np.sqrt(np.mean(deviation**2))),
+			"instructions":self.instructionCounter-startInstructions,
+		}
+
+
 	def setDACFullScale(self):
 		"""
 			Sets the DAC output amplitude to full scale.
@@ -565,102 +1276,146 @@ class AD9958_class:
 				The AD9958 register overflows during a rising sweep when :math:`RDW\cdot \Tilde{N}_{DAC \; steps}+S0\geq 2^{32}` where :math:`\Tilde{N}_{DAC \; steps}=\mbox{ceil} \Big( \dfrac{E0-S0}{xDW} \Big)`.
 				The current implementation of :func:`AD9958_class.findOptimalRamp` excludes solutions leading to a register overflow. In case no alternative solution can be found, an error is raised and [0,0,0,0] is returned.
 
+			.. note::
+				If a :class:`rampCache_class` is attached to the AD9958 object, solutions are looked up in the cache first and the search is skipped for ramps solved before.
+
 		"""
 		SYNC_CLK=self.SYS_CLK/4.
 
+		if self.rampCache is not None:
+			solution=self.rampCache.get(rampTypeSelect,lowValue,highValue,rampUpTime,rampDownTime,self.SYS_CLK)
+			if solution is not None:
+				self.stats.rampCacheHits+=1
+				return solution
+			self.stats.rampCacheMisses+=1
+
+		RSRRArray,RDWArray,FSRRArray,FDWArray,rampUpFound,rampDownFound,S0,E0=self._solveRamps(rampTypeSelect,lowValue,highValue,rampUpTime,rampDownTime)
+
 		#RAMP UP
-		RSRRArray=np.array([])
-		RDWArray=np.array([])
-		figureOfMeritArray=np.array([])
-
-		for RSRR in range(1,255):
-			timeStep=RSRR/SYNC_CLK #
-			NTimeSteps=np.ceil(rampUpTime/timeStep)#Amount of rising steps
-			if rampTypeSelect=="frequency":
-				S0=int(lowValue/self.SYS_CLK*2**32)
-				E0=int(highValue/self.SYS_CLK*2**32)
-				RDW=int(np.ceil((E0-S0)/NTimeSteps))
-
-			elif rampTypeSelect=="phase":
-				S0=int(lowValue/360*2**14)<<18
-				E0=int(highValue/360*2**14)<<18
-				RDW=int(np.ceil((E0-S0)/NTimeSteps))
-				RDW=((RDW>>18)<<18)
-			elif rampTypeSelect=="amplitude":
-				S0=int(lowValue*2**10)<<22
-				E0=int(highValue*2**10)<<22
-				RDW=int(np.ceil((E0-S0)/NTimeSteps))
-				RDW=((RDW>>22)<<22)
-
-			if RDW>0:
-				slope=(E0-S0)/(rampUpTime)
-				NDACSteps=np.floor((E0-S0)/RDW)
-				NDACStepsCeil=np.ceil((E0-S0)/RDW)
-
-				figureOfMerit=0
-				#ramp up figure of merit
-				figureOfMerit+=1/6 *NDACSteps *timeStep *(RDW**2* (1 + NDACSteps)* (1 + 2 *NDACSteps) - RDW *slope *(1 + NDACSteps) *(-1 + 4* NDACSteps)* timeStep +  2 *slope**2 *NDACSteps**2 *timeStep**2)
-				figureOfMerit+=1/3* slope**2 *(rampUpTime - NDACSteps*timeStep)**3
-
-				# Saving RSRR,RDW and figureOfMerit
-				if (RDW*NDACStepsCeil+S0)<2**32: #Avoids sweep overflow
-					RDWArray=np.append(RDWArray,[RDW])
-					RSRRArray=np.append(RSRRArray,[RSRR])
-					figureOfMeritArray=np.append(figureOfMeritArray,[figureOfMerit])
-
-		#Finding best figureOfMerit
-		try:
-			minIndex=np.where(figureOfMeritArray==np.min(figureOfMeritArray))[0][0]
-			RSRR=RSRRArray[minIndex]
-			RDW=RDWArray[minIndex]
-			print "Ramp up time: %.2e"%((E0-S0)/RDW*RSRR/SYNC_CLK)
-		except:
+		if not rampUpFound[0]:
 			print "ERROR: the chosen final point amd ramp up time lead to register overflow for all available time steps (RSRR). Try a slightly smaller final point and/or a longer ramp."
 			return [0,0,0,0]
-
+		RSRR=RSRRArray[0]
+		RDW=RDWArray[0]
+		print "Ramp up time: %.2e"%((E0[0]-S0[0])/RDW*RSRR/SYNC_CLK)
 
 		#RAMP DOWN
-		FSRRArray=np.array([])
-		FDWArray=np.array([])
-		figureOfMeritArray=np.array([])
-
-		for FSRR in range(1,255):
-			timeStep=FSRR/SYNC_CLK #
-			NTimeSteps=np.ceil(rampDownTime/timeStep)#Amount of rising steps
-
-			if rampTypeSelect=="frequency":
-				S0=int(lowValue/self.SYS_CLK*2**32)
-				E0=int(highValue/self.SYS_CLK*2**32)
-				FDW=int(np.ceil((E0-S0)/NTimeSteps))
-			elif rampTypeSelect=="phase":
-				S0=int(lowValue/360*2**14)<<18
-				E0=int(highValue/360*2**14)<<18
-				FDW=int(np.ceil((E0-S0)/NTimeSteps))
-				FDW=((FDW>>18)<<18)
-			elif rampTypeSelect=="amplitude":
-				S0=int(lowValue*2**10)<<22
-				E0=int(highValue*2**10)<<22
-				FDW=int(np.ceil((E0-S0)/NTimeSteps))
-				FDW=((FDW>>22)<<22)
-
-			if FDW>0:
-				slope=(E0-S0)/(rampDownTime)
-				NDACSteps=np.floor((E0-S0)/FDW)
-				figureOfMerit=0
-				#ramp up figure of merit
-				figureOfMerit+=1/6 *NDACSteps *timeStep *(FDW**2* (1 + NDACSteps)* (1 + 2 *NDACSteps) - FDW *slope *(1 + NDACSteps) *(-1 + 4* NDACSteps)* timeStep +  2 *slope**2 *NDACSteps**2 *timeStep**2)
-				figureOfMerit+=1/3* slope**2 *(rampDownTime - NDACSteps*timeStep)**3
-
-				FDWArray=np.append(FDWArray,[FDW])
-				FSRRArray=np.append(FSRRArray,[FSRR])
-				figureOfMeritArray=np.append(figureOfMeritArray,[figureOfMerit])
-
-		#Finding best figureOfMerit
-		minIndex=np.where(figureOfMeritArray==np.min(figureOfMeritArray))[0][0]
-		FSRR=FSRRArray[minIndex]
-		FDW=FDWArray[minIndex]
-		print "Ramp down time: %.2e"%((E0-S0)/FDW*FSRR/SYNC_CLK)
-		return np.array([RSRR,RDW,FSRR,FDW],dtype=int)
+		if not rampDownFound[0]:
+			print "ERROR: no suitable ramp down found for the chosen points and ramp down time."
+			return [0,0,0,0]
+		FSRR=FSRRArray[0]
+		FDW=FDWArray[0]
+		print "Ramp down time: %.2e"%((E0[0]-S0[0])/FDW*FSRR/SYNC_CLK)
+
+		solution=np.array([RSRR,RDW,FSRR,FDW],dtype=int)
+		if self.rampCache is not None:
+			self.rampCache.put(rampTypeSelect,lowValue,highValue,rampUpTime,rampDownTime,self.SYS_CLK,solution)
+		return solution
+
+	def findOptimalRampArray(self,rampTypeSelect,lowValue,highValue,rampUpTime,rampDownTime):
+		"""
+			Vectorized version of :func:`AD9958_class.findOptimalRamp`. Solves many ramps in a single call, e.g. for parameter scans. The parameters are broadcast against each other and every ramp gets exactly the same RSRR,RDW,FSRR,FDW as returned by :func:`AD9958_class.findOptimalRamp`.
+
+			:param rampTypeSelect: Type of ramp: "amplitude", "frequency" or "phase".
+			:type sweepTypeSelect: str
+			:param lowValue: Low values in the units of amplitude,frequency or phase.
+			:type lowValue: float or numpy.ndarray
+			:param highValue: High values in the units of amplitude,frequency or phase.
+			:type highValue: float or numpy.ndarray
+			:param rampUpTime: Ramp up times in s.
+			:type rampUpTime: float or numpy.ndarray
+			:param rampDownTime: Ramp down times in s.
+			:type rampDownTime: float or numpy.ndarray
+
+			:return: Integer array of shape (N,4) with rows [RSRR,RDW,FSRR,FDW]. Rows without a suitable solution are set to [0,0,0,0].
+		"""
+		RSRR,RDW,FSRR,FDW,rampUpFound,rampDownFound,S0,E0=self._solveRamps(rampTypeSelect,lowValue,highValue,rampUpTime,rampDownTime)
+		result=np.stack((RSRR,RDW,FSRR,FDW),axis=1)
+		result[~(rampUpFound&rampDownFound)]=0
+		return result
+
+	def _rampEndpoints(self,rampTypeSelect,lowValue,highValue):
+		"""
+			Returns the start and end points S0,E0 (as written into the 32 bit registers of the AD9958) and the granularity (in bits) of the delta words for arrays of low/high values.
+		"""
+		if rampTypeSelect=="frequency":
+			S0=(lowValue/self.SYS_CLK*2**32).astype(np.int64)
+			E0=(highValue/self.SYS_CLK*2**32).astype(np.int64)
+			shift=0
+		elif rampTypeSelect=="phase":
+			S0=(lowValue/360*2**14).astype(np.int64)<<18
+			E0=(highValue/360*2**14).astype(np.int64)<<18
+			shift=18
+		elif rampTypeSelect=="amplitude":
+			S0=(lowValue*2**10).astype(np.int64)<<22
+			E0=(highValue*2**10).astype(np.int64)<<22
+			shift=22
+		return S0,E0,shift
+
+	def _scoreRamps(self,S0,E0,shift,rampTime,checkOverflow):
+		"""
+			Evaluates the figure of merit of :func:`AD9958_class.findOptimalRamp` for all xSRR (1-254) and all ramps in a single array pass.
+
+			:return: xSRR, xDW and a boolean flag for each ramp (False if no suitable xSRR exists).
+		"""
+		SYNC_CLK=self.SYS_CLK/4.
+		xSRRArray=np.arange(1,255)
+		timeStep=xSRRArray/SYNC_CLK
+		deltaValue=(E0-S0)[:,None]
+		rampTime=rampTime[:,None]
+
+		with np.errstate(divide="ignore",invalid="ignore",over="ignore"):
+			NTimeSteps=np.ceil(rampTime/timeStep) #Amount of rising steps
+			xDWFloat=np.ceil(deltaValue/NTimeSteps)
+			finite=np.isfinite(xDWFloat)
+			xDW=np.where(finite,xDWFloat,0).astype(np.int64)
+			xDW=(xDW>>shift)<<shift
+			valid=finite&(xDW>0)
+
+			xDWFloat=xDW.astype(np.float64)
+			slope=deltaValue/rampTime
+			NDACSteps=np.floor(deltaValue/xDWFloat)
+
+			figureOfMerit=1/6 *NDACSteps *timeStep *(xDWFloat**2* (1 + NDACSteps)* (1 + 2 *NDACSteps) - xDWFloat *slope *(1 + NDACSteps) *(-1 + 4* NDACSteps)* timeStep +  2 *slope**2 *NDACSteps**2 *timeStep**2)
+			figureOfMerit+=1/3* slope**2 *(rampTime - NDACSteps*timeStep)**3
+
+			if checkOverflow: #Avoids sweep overflow
+				NDACStepsCeil=np.ceil(deltaValue/xDWFloat)
+				valid&=(xDWFloat*NDACStepsCeil+S0[:,None])<2**32
+
+		figureOfMerit[~valid]=np.nan
+		found=valid.any(axis=1)
+		minIndex=np.zeros(len(S0),dtype=int)
+		if found.any():
+			minIndex[found]=np.nanargmin(figureOfMerit[found],axis=1)
+		rows=np.arange(len(S0))
+		return xSRRArray[minIndex],xDW[rows,minIndex],found
+
+	def _solveRamps(self,rampTypeSelect,lowValue,highValue,rampUpTime,rampDownTime):
+		"""
+			Solves the ramp up and ramp down of :func:`AD9958_class.findOptimalRamp` for arrays of ramps. Large batches are processed in chunks to bound the memory footprint.
+		"""
+		startTime=time.time()
+		lowValue,highValue,rampUpTime,rampDownTime=[np.ravel(x) for x in np.broadcast_arrays(*[np.asarray(x,dtype=np.float64) for x in (lowValue,highValue,rampUpTime,rampDownTime)])]
+		S0,E0,shift=self._rampEndpoints(rampTypeSelect,lowValue,highValue)
+
+		N=len(S0)
+		RSRR=np.zeros(N,dtype=np.int64)
+		RDW=np.zeros(N,dtype=np.int64)
+		FSRR=np.zeros(N,dtype=np.int64)
+		FDW=np.zeros(N,dtype=np.int64)
+		rampUpFound=np.zeros(N,dtype=bool)
+		rampDownFound=np.zeros(N,dtype=bool)
+
+		chunkSize=1024
+		for i in range(0,N,chunkSize):
+			j=slice(i,i+chunkSize)
+			RSRR[j],RDW[j],rampUpFound[j]=self._scoreRamps(S0[j],E0[j],shift,rampUpTime[j],True)
+			FSRR[j],FDW[j],rampDownFound[j]=self._scoreRamps(S0[j],E0[j],shift,rampDownTime[j],False)
+
+		self.stats.rampSolverCalls+=1
+		self.stats.rampSolverTime+=time.time()-startTime
+		return RSRR,RDW,FSRR,FDW,rampUpFound,rampDownFound,S0,E0
 
 	def setTriggerOut(self,flag):
 		"""
@@ -669,7 +1424,7 @@ class AD9958_class:
 		:param flag: Trigger state.
 		:type flag: bool
 		"""
-		self.ser.write("setTriggerOut "+str(flag&1)+ "\n")
+		self._sendCommand(OP_SET_TRIGGER_OUT,flag&1)
 		self.instructionCounter+=1
 		return
 
@@ -687,7 +1442,18 @@ class AD9958_class:
 		:param pin3Flag: Profile pin 3 state.
 		:type pin3Flag: bool
 		"""
-		self.ser.write("setProfilePins "+str(pin0Flag&1)+" "+str(pin1Flag&1)+" "+str(pin2Flag&1)+" "+str(pin3Flag&1)+" \n")
+		self._sendCommand(OP_SET_PROFILE_PINS,profilePinsFlag(pin0Flag,pin1Flag,pin2Flag,pin3Flag))
+		self.instructionCounter+=1
+		return
+
+	def setProfileFlag(self,flag):
+		"""
+		Sets the profile pins output states from a PORTE flag (see :func:`profilePinsFlag` and :func:`AD9958_class.modulationRegisterFlags`).
+
+		:param flag: PORTE flag, profile pins P0-P3 on bits 7-4.
+		:type flag: int
+		"""
+		self._sendCommand(OP_SET_PROFILE_PINS,flag)
 		self.instructionCounter+=1
 		return
 
@@ -695,7 +1461,7 @@ class AD9958_class:
 		"""
 		Waits for a rising edge on the trigger input port.
 		"""
-		self.ser.write("waitTriggerIn\n")
+		self._sendCommand(OP_WAIT_TRIGGER_IN)
 		self.instructionCounter+=1
 		return
 
@@ -707,7 +1473,7 @@ class AD9958_class:
 		:type time: float
 		"""
 		clkCycles=time*self.CHIPKIT_CLK
-		self.ser.write("delayTimer "+str(clkCycles)+" \n")
+		self._sendCommand(OP_DELAY_TIMER,clkCycles)
 		self.instructionCounter+=1
 		return
 
@@ -715,7 +1481,7 @@ class AD9958_class:
 		"""
 		Resets the internal timer (Timer 4 and Timer 5 of the Chipkit Max32) used for :func:`AD9958_class.waitForTimer`.
 		"""
-		self.ser.write("resetTimer \n")
+		self._sendCommand(OP_RESET_TIMER)
 		self.instructionCounter+=1
 		return
 
@@ -728,7 +1494,7 @@ class AD9958_class:
 		"""
 
 		clkCycles=time*self.CHIPKIT_CLK
-		self.ser.write("waitForTimer "+str(clkCycles)+" \n")
+		self._sendCommand(OP_WAIT_FOR_TIMER,clkCycles)
 		self.instructionCounter+=1
 		return
 
@@ -752,65 +1518,50 @@ class AD9958_class:
 
 	def setModulationRegister(self,regChannel0,regChannel1):
 		"""
-		Sets the active amplitude/frequency/phase register for the ongoing modulation/sweep. Profile pins are set according to the modulation level and priority channel (encoded in PPC).
+		Sets the active amplitude/frequency/phase register for the ongoing modulation/sweep. Profile pins are set according to the modulation level and priority channel (encoded in PPC), see :func:`profileFlagTable`.
 
 		:param regChannel0: Active register for channel 0.
 		:type regChannel0: int
 		:param regChannel1: Active register for channel 1.
 		:type regChannel1: int
 		"""
+		self._sendCommand(OP_SET_PROFILE_PINS,profileFlagLookup(self.modulationLevel,self.PPC)[regChannel0&15][regChannel1&15])
+		self.instructionCounter+=1
+		return
 
-		if self.modulationLevel==0:
-			P0=0
-			P1=0
-			P2=regChannel0
-			P3=regChannel1
-		if self.modulationLevel==1:
-			P0=(regChannel0>>1)&1
-			P1=(regChannel0>>0)&1
-			P2=(regChannel1>>1)&1
-			P3=(regChannel1>>0)&1
-		if self.modulationLevel==2:
-			if self.PPC==(1<<1):
-				P0=(regChannel0>>2)&1
-				P1=(regChannel0>>1)&1
-				P2=(regChannel0>>0)&1
-				P3=0
-			elif self.PPC==((1<<1)+1):
-				P0=(regChannel1>>2)&1
-				P1=(regChannel1>>1)&1
-				P2=(regChannel1>>0)&1
-				P3=0
-		if self.modulationLevel==3:
-			if self.PPC==(1<<1):
-				P0=(regChannel0>>3)&1
-				P1=(regChannel0>>2)&1
-				P2=(regChannel0>>1)&1
-				P3=(regChannel0>>0)&1
-			elif self.PPC==((1<<1)+1):
-				P0=(regChannel1>>3)&1
-				P1=(regChannel1>>2)&1
-				P2=(regChannel1>>1)&1
-				P3=(regChannel1>>0)&1
-
-		self.setProfilePins(P0,P1,P2,P3)
+	def modulationRegisterFlags(self,regChannel0,regChannel1):
+		"""
+		Vectorized profile pin encoding of :func:`AD9958_class.setModulationRegister` for the current modulation level and priority channel.
 
-		return
+		:param regChannel0: Active registers for channel 0.
+		:type regChannel0: numpy.ndarray
+		:param regChannel1: Active registers for channel 1.
+		:type regChannel1: numpy.ndarray
+		:returns: PORTE flags (uint32) of the symbol pairs, to be sent with :func:`AD9958_class.setProfileFlag`.
+		"""
+		table=profileFlagTable(self.modulationLevel,self.PPC)
+		return table[np.asarray(regChannel0,dtype=np.intp)&15,np.asarray(regChannel1,dtype=np.intp)&15]
 
 
 	def clearStack(self):
 		"""
 		Clears the function stack.
 		"""
-		self.ser.write("clearStack \n")
+		self._sendCommand(OP_CLEAR_STACK)
+		if not self.lazyUpload:
+			self.uploadedSequence=None
 		self.instructionCounter=0
+		self.registerShadow.invalidate()
 		return
 
 	def runStack(self):
 		"""
-		Starts the function stack.
+		Starts the function stack. In lazy upload mode the pending instructions are uploaded first, unless the function stack already holds them, or patched if only parameters changed (see :func:`AD9958_class.setLazyUpload` and :func:`AD9958_class.patchSequence`).
 		"""
-		self.ser.write("runStack \n")
+		if self.lazyUpload:
+			self.patchSequence(self.pendingSequence)
+		self._sendCommand(OP_RUN_STACK)
+		self.flush()
 
 		return
 
@@ -833,10 +1584,36 @@ class AD9958_class:
 		:returns: Message of type *Programmed instructions: X (max len Y)*.
 		"""
 
-		self.ser.write("checkLenStack \n")
-		txtStr=self.ser.readline()
+		if self.recording is not None:
+			return "Programmed instructions: %d (max %d)"%(len(self.recording),LEN_FUNCTIONSTACK)
+		txtStr=self._query(OP_CHECK_LEN_STACK)
 		return txtStr[:-1] #returns all execpt the linebreak
 
+	def getStackHash(self):
+		"""
+		Returns the hash of the function stack programmed on the microcontroller (see :func:`stackHash`).
+
+		:returns: Hash value (None if not supported by the firmware).
+		"""
+		if self.recording is not None:
+			return self.recording.hash()
+		txtStr=self._query(OP_CHECK_STACK_HASH)
+		if txtStr.startswith("Stack hash: "):
+			return int(txtStr.split()[2])
+		self.ser.flushInput() #error message of an older firmware
+		return None
+
+	def getLenStack(self):
+		"""
+		Returns the number of programmed instructions on the function stack (see :func:`AD9958_class.checkLenStack`).
+
+		:returns: Number of instructions (None if the answer of the microcontroller can not be parsed).
+		"""
+		try:
+			return int(self.checkLenStack().split()[2])
+		except (IndexError,ValueError):
+			return None
+
 
 
 
@@ -847,12 +1624,70 @@ class AD9958_class:
 		:returns: True/False.
 
 		"""
-		self.ser.write("checkStackFinished \n")
-		if self.ser.readline()=="OK\n":
+		if self.recording is not None:
+			return True
+		if self._query(OP_CHECK_STACK_FINISHED)=="OK\n":
 			return True
 		else:
 			return False
 
+	def waitReady(self,timeout=5.,initialInterval=0.01,maxInterval=0.5):
+		"""
+		Readiness handshake: polls checkStackFinished with exponential backoff until the microcontroller answers (e.g. after opening the serial port, which restarts the chipKIT). Answers to earlier polls which are still in flight are read until the line is quiet, so they are not taken for the answers of later requests. The elapsed time is stored in **connectTime**.
+
+		:param timeout: Maximum waiting time in s (Default is 5).
+		:type timeout: float
+		:param initialInterval: Waiting time after the first unanswered poll in s.
+		:type initialInterval: float
+		:param maxInterval: Maximum waiting time between polls in s.
+		:type maxInterval: float
+		:returns: True if the microcontroller is ready, False on timeout.
+		"""
+		startTime=time.time()
+		self.ser.flushInput()
+		interval=initialInterval
+		polls=0
+		while True:
+			polls+=1
+			if self.checkStackFinished():
+				self.connectTime=time.time()-startTime
+				for i in range(polls-1): #at most one late answer per earlier poll
+					if self.ser.readline()=="":
+						break
+				return True
+			elapsed=time.time()-startTime
+			if elapsed>timeout:
+				return False
+			time.sleep(min(interval,timeout-elapsed))
+			interval=min(2*interval,maxInterval)
+
+	def waitStackFinished(self,timeout=None,pollInterval=0.001):
+		"""
+		Waits until the function stack execution is finished. The microcontroller answers checkStackFinished only after runStack returns, so a single request is sent and its answer is polled.
+
+		:param timeout: Maximum waiting time in s (Default is None, wait forever).
+		:type timeout: float
+		:param pollInterval: Time between polls of the serial port in s.
+		:type pollInterval: float
+		:returns: True if finished, False on timeout.
+		"""
+		if self.recording is not None:
+			return True
+		self._sendCommand(OP_CHECK_STACK_FINISHED)
+		self.flush()
+		startTime=time.time()
+		line=""
+		while True:
+			line+=self.ser.readline()
+			if line.endswith("\n"):
+				if line=="OK\n":
+					return True
+				line=""
+			elif timeout is not None and time.time()-startTime>timeout:
+				return False
+			else:
+				time.sleep(pollInterval)
+
 
 
 	def enableAutomaticRURD(self,stepSize,amplitudeRampRate):
@@ -0,0 +1,288 @@
+"""
+.. module:: asyncAD9958
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+try:
+	import trollius as asyncio #asyncio for Python 2.7
+	from trollius import From,Return
+except ImportError:
+	asyncio=None
+from protocol import *
+from AD9958 import AD9958_class
+
+
+def _coroutine(func):
+	if asyncio is None:
+		return func
+	return asyncio.coroutine(func)
+
+
+class AsyncAD9958_class(object):
+	"""
+		Non-blocking counterpart of :class:`AD9958_class` for applications running an asyncio event loop (trollius on Python 2.7). Sequences are built offline with the blocking driver (see :func:`AsyncAD9958_class.record`) and uploaded, run and awaited with coroutines, so the event loop keeps serving other devices while the chipKIT executes the function stack. The serial port is only polled (inWaiting/read), never blocked on, which allows using :class:`AD9958Emulator_class` as a local stand-in. Uploads are written in chunks which fit into the output buffer of the port (see :func:`AsyncAD9958_class.uploadSequence`).
+
+		:param ser: Serial port of the chipKIT (or :class:`AD9958Emulator_class`).
+		:type ser: serial.Serial
+		:param ref_clk: REF_CLK frequency in Hz.
+		:type ref_clk: int
+		:param PLL_multiplier: PLL multiplier for the AD9958.
+		:type PLL_multiplier: int
+		:param chipkit_clk: Clock frequency of the chipKIT timers in Hz.
+		:type chipkit_clk: int
+		:param loop: Event loop (Default is the current event loop).
+		:type loop: asyncio.AbstractEventLoop
+		:param pollInterval: Time between polls of the serial port in s.
+		:type pollInterval: float
+	"""
+	def __init__(self,ser,ref_clk,PLL_multiplier,chipkit_clk,loop=None,pollInterval=0.001):
+		if asyncio is None:
+			raise ImportError("AsyncAD9958_class requires the trollius package (pip install trollius).")
+		self.ser=ser
+		self.REF_CLK=ref_clk
+		self.PLL_MULTIPLIER=PLL_multiplier
+		self.CHIPKIT_CLK=chipkit_clk
+		if loop is None:
+			loop=asyncio.get_event_loop()
+		self.loop=loop
+		self.pollInterval=pollInterval
+		self.binaryMode=False
+		self.lineBuffer=""
+		self.pendingAnswers=0 #Requests sent whose answer line has not been read yet
+		self.instructionCounter=0
+		self.pageSizes=[]
+		self.connectTime=None
+
+	def record(self):
+		"""
+			Returns a blocking driver with the same clock settings in offline recording mode. Call its :func:`AD9958_class.stopRecording` to get the sequence to upload.
+		"""
+		return AD9958_class(None,self.REF_CLK,self.PLL_MULTIPLIER,self.CHIPKIT_CLK)
+
+	def _encode(self,opcode,*params):
+		if self.binaryMode:
+			return encodeBinary(opcode,params)
+		return encodeASCII(opcode,params)
+
+	def _sendCommand(self,opcode,*params):
+		self.ser.write(self._encode(opcode,*params))
+		return
+
+	def _outWaiting(self):
+		"""
+			Returns the number of bytes in the output buffer of the serial port (0 if the port does not report it).
+		"""
+		try:
+			return self.ser.out_waiting
+		except AttributeError:
+			return 0
+
+	@_coroutine
+	def readline(self,timeout=None):
+		"""
+			Waits for the next line sent by the microcontroller.
+
+			:param timeout: Maximum waiting time in s (Default is None, wait forever).
+			:type timeout: float
+			:returns: Line including the linebreak ("" on timeout).
+		"""
+		startTime=self.loop.time()
+		while True:
+			n=self.ser.inWaiting()
+			if n:
+				self.lineBuffer+=self.ser.read(n)
+			end=self.lineBuffer.find("\n")
+			if end>=0:
+				line=self.lineBuffer[:end+1]
+				self.lineBuffer=self.lineBuffer[end+1:]
+				raise Return(line)
+			if timeout is not None and self.loop.time()-startTime>timeout:
+				raise Return("")
+			yield From(asyncio.sleep(self.pollInterval,loop=self.loop))
+
+	@_coroutine
+	def _request(self,data,timeout=None):
+		"""
+			Sends a request and waits for its answer line. Answers of earlier requests which timed out are still counted in **pendingAnswers** and are discarded when they arrive, so a late answer is never taken for the answer of a later request.
+
+			:param data: Encoded request.
+			:type data: str
+			:param timeout: Maximum waiting time in s (Default is None, wait forever).
+			:type timeout: float
+			:returns: Answer line including the linebreak ("" on timeout).
+		"""
+		self.ser.write(data)
+		self.pendingAnswers+=1
+		startTime=self.loop.time()
+		while True:
+			if timeout is None:
+				line=yield From(self.readline())
+			else:
+				line=yield From(self.readline(max(timeout-(self.loop.time()-startTime),0)))
+			if line=="":
+				raise Return("")
+			self.pendingAnswers-=1
+			if self.pendingAnswers==0:
+				raise Return(line)
+
+	@_coroutine
+	def connect(self,timeout=10.):
+		"""
+			Waits until the microcontroller answers checkStackFinished, polling with exponential backoff (see :func:`AD9958_class.waitReady`). Answers to earlier polls which are still in flight are read until the line is quiet, so they are not taken for the answers of later requests. The elapsed time is stored in **connectTime**.
+
+			:param timeout: Maximum waiting time in s (Default is 10).
+			:type timeout: float
+			:returns: True if the microcontroller is ready, False on timeout.
+		"""
+		startTime=self.loop.time()
+		self.ser.flushInput()
+		self.lineBuffer=""
+		self.pendingAnswers=0
+		interval=0.01
+		polls=0
+		while True:
+			self._sendCommand(OP_CHECK_STACK_FINISHED)
+			polls+=1
+			line=yield From(self.readline(interval))
+			if line=="OK\n":
+				self.connectTime=self.loop.time()-startTime
+				for i in range(polls-1): #at most one late answer per earlier poll
+					line=yield From(self.readline(interval))
+					if line=="":
+						break
+				raise Return(True)
+			if self.loop.time()-startTime>timeout:
+				print "ERROR: microcontroller not ready after %.1f s."%timeout
+				raise Return(False)
+			interval=min(2*interval,0.5)
+
+	@_coroutine
+	def setBinaryMode(self,enable):
+		"""
+			Enables/disables the binary upload protocol (see :func:`AD9958_class.setBinaryMode`).
+
+			:param enable: Binary mode flag.
+			:type enable: bool
+			:returns: True if the requested mode is active.
+		"""
+		if enable and not self.binaryMode:
+			line=yield From(self._request(ASCII_BINARY_MODE,1.))
+			if line!="OK\n":
+				print "ERROR: binary mode not supported by the microcontroller. Using ASCII mode."
+				raise Return(False)
+		elif not enable and self.binaryMode:
+			self.ser.write(encodeBinary(OP_ASCII_MODE))
+		self.binaryMode=enable
+		raise Return(True)
+
+	@_coroutine
+	def uploadSequence(self,sequence,chunkSize=256):
+		"""
+			Clears the function stack and uploads a recorded sequence. The encoded sequence is written in small chunks, each one only once the output buffer of the serial port is empty (out_waiting), so ser.write never waits for the transmission and the event loop keeps running during the upload.
+
+			:param sequence: Recorded sequence.
+			:type sequence: sequence_class
+			:param chunkSize: Number of bytes written per chunk (has to fit into the output buffer of the serial port).
+			:type chunkSize: int
+		"""
+		self._sendCommand(OP_CLEAR_STACK)
+		data=sequence.encode(self.binaryMode)
+		for pos in range(0,len(data),chunkSize):
+			while self._outWaiting():
+				yield From(asyncio.sleep(self.pollInterval,loop=self.loop))
+			self.ser.write(data[pos:pos+chunkSize])
+			yield From(asyncio.sleep(0,loop=self.loop))
+		self.instructionCounter=len(sequence)
+
+	def runStack(self):
+		"""
+			Starts the function stack.
+		"""
+		self._sendCommand(OP_RUN_STACK)
+		return
+
+	@_coroutine
+	def checkLenStack(self,timeout=1.):
+		"""
+			Returns the current and maximum number of programmed instructions on the function stack.
+
+			:returns: Message of type *Programmed instructions: X (max len Y)*.
+		"""
+		line=yield From(self._request(self._encode(OP_CHECK_LEN_STACK),timeout))
+		raise Return(line[:-1])
+
+	@_coroutine
+	def getLenStack(self,timeout=1.):
+		"""
+			Returns the number of programmed instructions on the function stack (None if the answer can not be parsed).
+		"""
+		txtStr=yield From(self.checkLenStack(timeout))
+		try:
+			raise Return(int(txtStr.split()[2]))
+		except (IndexError,ValueError):
+			raise Return(None)
+
+	@_coroutine
+	def waitStackFinished(self,timeout=None):
+		"""
+			Waits until the function stack execution is finished.
+
+			:param timeout: Maximum waiting time in s (Default is None, wait forever).
+			:type timeout: float
+			:returns: True if finished, False on timeout.
+		"""
+		line=yield From(self._request(self._encode(OP_CHECK_STACK_FINISHED),timeout))
+		raise Return(line=="OK\n")
+
+	@_coroutine
+	def runSequence(self,sequence,timeout=60.):
+		"""
+			Runs a recorded sequence of any length, page by page (see :func:`AD9958_class.runSequence`).
+
+			:param sequence: Recorded sequence.
+			:type sequence: sequence_class
+			:param timeout: Maximum execution time of a page in s (Default is 60).
+			:type timeout: float
+			:returns: True if all pages were executed, False otherwise.
+		"""
+		self.pageSizes=[]
+		for page in sequence.splitPages():
+			yield From(self.uploadSequence(page))
+			lenStack=yield From(self.getLenStack())
+			self.pageSizes.append(lenStack)
+			if lenStack!=len(page):
+				print "ERROR: page %d not uploaded correctly. Programmed instructions: %s, requested instructions: %d."%(len(self.pageSizes)-1,lenStack,len(page))
+				raise Return(False)
+			self.runStack()
+			finished=yield From(self.waitStackFinished(timeout))
+			if not finished:
+				print "ERROR: page %d not finished after %.1f s."%(len(self.pageSizes)-1,timeout)
+				raise Return(False)
+		raise Return(True)
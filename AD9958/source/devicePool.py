@@ -0,0 +1,113 @@
+"""
+.. module:: devicePool
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+import time
+from multiprocessing.pool import ThreadPool
+
+
+class devicePool_class(object):
+	"""
+		Pool of several AD9958/chipKIT boards (one :class:`AD9958_class` per serial port). Function stacks are uploaded in parallel with a thread pool, so the total programming time is given by the slowest board instead of the sum over all boards.
+
+		:param devices: AD9958 objects indexed by a board name.
+		:type devices: dict
+	"""
+	def __init__(self,devices):
+		self.devices=dict(devices)
+		self.threadPool=ThreadPool(max(len(self.devices),1))
+		self.uploadTimes={} #Upload time per board in s
+		self.totalUploadTime=0
+
+	def __getitem__(self,name):
+		return self.devices[name]
+
+	def _map(self,func,names):
+		return dict(zip(names,self.threadPool.map(func,names)))
+
+	def uploadSequences(self,sequences):
+		"""
+			Uploads recorded sequences in parallel (see :func:`AD9958_class.uploadSequence`) and checks the number of programmed instructions of every board. The upload time per board is stored in **uploadTimes** and the total time in **totalUploadTime**.
+
+			:param sequences: Recorded sequences indexed by board name.
+			:type sequences: dict
+			:returns: True if all sequences were uploaded correctly.
+		"""
+		def upload(name):
+			startTime=time.time()
+			device=self.devices[name]
+			device.uploadSequence(sequences[name])
+			lenStack=device.getLenStack()
+			self.uploadTimes[name]=time.time()-startTime
+			if lenStack!=len(sequences[name]):
+				print "ERROR: board %s not uploaded correctly. Programmed instructions: %s, requested instructions: %d."%(name,lenStack,len(sequences[name]))
+				return False
+			return True
+
+		startTime=time.time()
+		results=self._map(upload,list(sequences))
+		self.totalUploadTime=time.time()-startTime
+		return all(results.values())
+
+	def runStacks(self,names=None):
+		"""
+			Arms the boards: starts the function stack of every board (or of the given boards).
+
+			:param names: Board names (Default is None, all boards).
+			:type names: list
+		"""
+		if names is None:
+			names=list(self.devices)
+		for name in names:
+			self.devices[name].runStack()
+		return
+
+	def waitStackFinished(self,timeout=None,names=None):
+		"""
+			Waits in parallel until the function stacks of all boards (or of the given boards) are finished.
+
+			:param timeout: Maximum waiting time in s (Default is None, wait forever).
+			:type timeout: float
+			:param names: Board names (Default is None, all boards).
+			:type names: list
+			:returns: Dict with True (finished) or False (timeout) per board.
+		"""
+		if names is None:
+			names=list(self.devices)
+		return self._map(lambda name:self.devices[name].waitStackFinished(timeout),names)
+
+	def close(self):
+		"""
+			Stops the worker threads.
+		"""
+		self.threadPool.close()
+		self.threadPool.join()
+		return
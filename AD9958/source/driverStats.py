@@ -0,0 +1,101 @@
+"""
+.. module:: driverStats
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+from protocol import commandNames
+
+
+class driverStats_class(object):
+	"""
+		Instrumentation counters of :class:`AD9958_class` (attribute **stats**). Counters are plain attributes updated inline by the driver, so the overhead is a few additions per command.
+
+		* **commandCalls**: number of calls per command name (including recorded instructions).
+		* **bytesWritten**, **writeCalls**: bytes and calls of ser.write.
+		* **encodeTime**, **writeTime**: time in s spent encoding commands and inside ser.write.
+		* **roundTripCalls**, **roundTripTime**, **roundTripMax**: number, total and maximum time in s of the request/answer commands (checkLenStack, checkStackFinished, checkStackHash) per command name.
+		* **rampSolverCalls**, **rampSolverTime**: calls and time in s of the ramp solver (see :func:`AD9958_class.findOptimalRamp`).
+		* **rampCacheHits**, **rampCacheMisses**: ramp cache lookups.
+	"""
+	__slots__=("opcodeCalls","bytesWritten","writeCalls","encodeTime","writeTime","roundTripCalls","roundTripTime","roundTripMax","rampSolverCalls","rampSolverTime","rampCacheHits","rampCacheMisses")
+
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		"""
+			Sets all counters to zero.
+		"""
+		self.opcodeCalls={}
+		self.bytesWritten=0
+		self.writeCalls=0
+		self.encodeTime=0.
+		self.writeTime=0.
+		self.roundTripCalls={}
+		self.roundTripTime={}
+		self.roundTripMax={}
+		self.rampSolverCalls=0
+		self.rampSolverTime=0.
+		self.rampCacheHits=0
+		self.rampCacheMisses=0
+		return
+
+	@property
+	def commandCalls(self):
+		return dict((commandNames.get(opcode,opcode),n) for opcode,n in self.opcodeCalls.items())
+
+	def addRoundTrip(self,opcode,elapsed):
+		"""
+			Records the round trip time of a request/answer command.
+		"""
+		name=commandNames[opcode]
+		self.roundTripCalls[name]=self.roundTripCalls.get(name,0)+1
+		self.roundTripTime[name]=self.roundTripTime.get(name,0.)+elapsed
+		self.roundTripMax[name]=max(self.roundTripMax.get(name,0.),elapsed)
+		return
+
+	def snapshot(self):
+		"""
+			Returns a copy of all counters as a dict (e.g. for logging the host time per shot).
+		"""
+		return {
+			"commandCalls":self.commandCalls,
+			"bytesWritten":self.bytesWritten,
+			"writeCalls":self.writeCalls,
+			"encodeTime":self.encodeTime,
+			"writeTime":self.writeTime,
+			"roundTripCalls":dict(self.roundTripCalls),
+			"roundTripTime":dict(self.roundTripTime),
+			"roundTripMax":dict(self.roundTripMax),
+			"rampSolverCalls":self.rampSolverCalls,
+			"rampSolverTime":self.rampSolverTime,
+			"rampCacheHits":self.rampCacheHits,
+			"rampCacheMisses":self.rampCacheMisses,
+		}
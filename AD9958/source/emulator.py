@@ -0,0 +1,400 @@
+"""
+.. module:: emulator
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+from __future__ import division
+import numpy as np
+from protocol import *
+
+#Firmware constants (AD9958Driver.ino)
+registerLengths=(1,3,2,3,4,2,3,2,4,4)+(4,)*15 #registerAD9958[].len in bytes
+registerDefaults=(0xF0,0,0,3<<10)+(0,)*21 #registerAD9958[].value as initialized by begin() ((0x03<<8+0x02) evaluates to 3<<10)
+commonRegisters=(0x00,0x01,0x02) #Registers shared between channel 0 and channel 1
+
+#AD9958 register values after a master reset (AD9958 datasheet)
+chipRegisterDefaults=(0xF0,0,0,0x0302)+(0,)*21
+
+#Timing model of the chipKIT Max32 (estimated clock cycles of the 80 MHz core timer)
+CHIPKIT_CLK=80e6
+SPI_CLK=40e6 #BRG=0 in begin()
+SPI_BYTE_CYCLES=int(8*CHIPKIT_CLK/SPI_CLK)+8 #8 bits at SPI_CLK plus buffer polling in SPI_simple.transfer
+SET_REGISTER_CYCLES=20 #CSB toggling and loop overhead of setRegister
+IO_UPDATE_CYCLES=10 #IO_UPDATE pulse
+PIN_WRITE_CYCLES=4 #fastDigitalWrite / PORTE access / timer reset
+FUNCTION_CALL_CYCLES=6 #function stack dispatch
+RESET_CYCLES=4000 #begin(): pin setup, timer service and SPI configuration
+
+timelineDtype=np.dtype([("index","i4"),("opcode","u1"),("params","u4",(3,)),("start","i8"),("end","i8")])
+
+
+def instructionCycles(opcode,params):
+	"""
+		Estimated execution time (in chipKIT clock cycles) of a function stack instruction, excluding the waiting time of delayTimer, waitForTimer and waitTriggerIn.
+
+		:param opcode: Instruction opcode.
+		:type opcode: int
+		:param params: Instruction parameters.
+		:type params: tuple
+	"""
+	if opcode==OP_SET_REGISTER:
+		cycles=SET_REGISTER_CYCLES+(1+registerLengths[params[0]])*SPI_BYTE_CYCLES
+		if params[2]:
+			cycles+=IO_UPDATE_CYCLES
+	elif opcode==OP_IO_UPDATE:
+		cycles=IO_UPDATE_CYCLES
+	elif opcode==OP_RESET:
+		cycles=RESET_CYCLES+SET_REGISTER_CYCLES+(1+registerLengths[0])*SPI_BYTE_CYCLES+IO_UPDATE_CYCLES
+	else:
+		cycles=PIN_WRITE_CYCLES
+	return FUNCTION_CALL_CYCLES+cycles
+
+
+class AD9958Emulator_class(object):
+	"""
+		Python emulator of the chipKIT Max32 firmware (AD9958Driver.ino) and of the AD9958. It can be passed to :class:`AD9958_class` instead of a serial.Serial object, which allows testing and benchmarking without hardware.
+
+		The emulator understands the ASCII and binary protocols, builds the function stack (at most LEN_FUNCTIONSTACK instructions, further instructions are dropped) and answers checkLenStack, checkStackHash and checkStackFinished. On runStack the stack is executed on a simulated 80 MHz timer (see :func:`instructionCycles`) and the execution timeline is stored in **timeline**.
+
+		:param triggerTimes: Times (in s after runStack) of the rising edges on the trigger input. If a waitTriggerIn finds no pending edge, the execution is suspended until :func:`AD9958Emulator_class.trigger` is called.
+		:type triggerTimes: list
+		:param maxBaudRate: Highest baud rate passing the echo test of the baud rate negotiation (Default is None, no limit).
+		:type maxBaudRate: int
+	"""
+	def __init__(self,triggerTimes=(),maxBaudRate=None):
+	#Serial port
+		self.port="emulator"
+		self.baudrate=BAUD_DEFAULT #Baud rate of the host side
+		self.maxBaudRate=maxBaudRate #Higher baud rates fail the echo test
+		self.timeout=0.2
+		self.is_open=True
+		self.inputBuffer="" #Bytes received by the microcontroller
+		self.outputBuffer="" #Bytes sent by the microcontroller
+
+	#Triggers
+		self.triggerTimes=list(triggerTimes)
+
+	#Counters
+		self.bytesReceived=0
+		self.instructionsExecuted=0
+
+		self._restart()
+
+	def _restart(self):
+		"""
+			Restarts the microcontroller and resets the AD9958 (as happens when the serial port is opened).
+		"""
+		self.binaryMode=False
+		self.firmwareBaudRate=BAUD_DEFAULT
+		self.previousBaudRate=None #Set during the echo test and confirmation of setBaud
+		self.baudEchoed=False #Echo sent, waiting for the confirmation
+		self.functionIndex=0
+		self.functionStack=[0]*LEN_FUNCTIONSTACK
+		self.parameterStack=[()]*LEN_FUNCTIONSTACK
+		self.registerAD9958=list(registerDefaults)
+		self._resetChip()
+		self.profilePins=0
+		self.triggerOut=0
+		self.running=False
+		self.timeline=np.zeros(0,dtype=timelineDtype)
+		return
+
+	def _resetChip(self):
+		"""
+			Master reset of the AD9958 followed by the single bit 3-wire mode configuration of begin().
+		"""
+		self.channelRegisters=[list(chipRegisterDefaults),list(chipRegisterDefaults)] #Buffered registers
+		self.activeRegisters=[list(chipRegisterDefaults),list(chipRegisterDefaults)] #Registers transferred by IO_update
+		self.ioUpdateCounter=0
+		self._writeChip(0,1<<1,1)
+		return
+
+	# Serial port interface
+
+	def isOpen(self):
+		return self.is_open
+
+	def open(self):
+		self.is_open=True
+		self.inputBuffer=""
+		self.outputBuffer=""
+		self._restart()
+		return
+
+	def close(self):
+		self.is_open=False
+		return
+
+	def inWaiting(self):
+		return len(self.outputBuffer)
+
+	@property
+	def in_waiting(self):
+		return len(self.outputBuffer)
+
+	@property
+	def out_waiting(self):
+		return 0 #Received bytes are processed immediately
+
+	def flushInput(self):
+		self.outputBuffer=""
+		return
+
+	reset_input_buffer=flushInput
+
+	def flush(self):
+		return
+
+	def readline(self):
+		"""
+			Returns the next line sent by the microcontroller. As for a serial port with timeout, an incomplete (or empty) line is returned if no linebreak is available.
+		"""
+		end=self.outputBuffer.find("\n")
+		if end<0:
+			line=self.outputBuffer
+		else:
+			line=self.outputBuffer[:end+1]
+		self.outputBuffer=self.outputBuffer[len(line):]
+		return line
+
+	def read(self,size=1):
+		data=self.outputBuffer[:size]
+		self.outputBuffer=self.outputBuffer[size:]
+		return data
+
+	def write(self,data):
+		"""
+			Receives bytes from the host and executes the complete commands.
+		"""
+		data=str(data)
+		self.bytesReceived+=len(data)
+		if self.baudrate!=self.firmwareBaudRate: #data is lost
+			if self.previousBaudRate is not None: #echo test or confirmation fails after BAUD_TIMEOUT
+				self.firmwareBaudRate=self.previousBaudRate
+				self.previousBaudRate=None
+				self.baudEchoed=False
+			return len(data)
+		self.inputBuffer+=data
+		if not self.running:
+			self._processInput()
+		return len(data)
+
+	def _print(self,txt):
+		self.outputBuffer+=txt
+		return
+
+	def _processInput(self):
+		buf=self.inputBuffer
+		pos=0
+		n=len(buf)
+		while pos<n and not self.running:
+			if self.binaryMode:
+				try:
+					frame=decodeBinary(buf,pos)
+				except ValueError:
+					self._print("ERROR! Received opcode: \r\n%d\r\n"%ord(buf[pos]))
+					pos+=1
+					continue
+				if frame is None:
+					break
+				opcode,params,pos=frame
+				self._execute(opcode,params)
+			else:
+				end=buf.find("\n",pos)
+				if end<0:
+					break
+				line=buf[pos:end]
+				pos=end+1
+				if self.previousBaudRate is not None:
+					self._echoTest(line)
+					continue
+				if line.split()[:1]==["setBaud"]:
+					self._print("OK\n")
+					self.previousBaudRate=self.firmwareBaudRate
+					self.firmwareBaudRate=parseUnsigned((line.split()+["0"])[1])
+					continue
+				if line.split()[:1]==["binaryMode"]:
+					self.binaryMode=True
+					self._print("OK\n")
+					continue
+				opcode,params=decodeASCII(line)
+				if opcode is None:
+					if params:
+						self._print("ERROR! Received command: \r\n%s\r\n"%params[0])
+					continue
+				self._execute(opcode,params)
+		self.inputBuffer=buf[pos:]
+		return
+
+	def _echoTest(self,line):
+		"""
+			Second and third step of setBaud: echoes BAUD_ECHO_TEST and keeps the new baud rate once BAUD_CONFIRM is received. Any other line restores the previous baud rate.
+		"""
+		if not self.baudEchoed and line==BAUD_ECHO_TEST and (self.maxBaudRate is None or self.firmwareBaudRate<=self.maxBaudRate):
+			self._print(BAUD_ECHO_TEST+"\n")
+			self.baudEchoed=True
+			return
+		if not(self.baudEchoed and line==BAUD_CONFIRM):
+			self.firmwareBaudRate=self.previousBaudRate
+		self.previousBaudRate=None
+		self.baudEchoed=False
+		return
+
+	def _execute(self,opcode,params):
+		if opcode in stackOpcodes:
+			self._pushFunctionStack(opcode,params)
+		elif opcode==OP_CLEAR_STACK:
+			self.functionIndex=0
+		elif opcode==OP_RUN_STACK:
+			self._runStack()
+		elif opcode==OP_CHECK_STACK_FINISHED:
+			self._print("OK\n")
+		elif opcode==OP_CHECK_LEN_STACK:
+			self._print("Programmed instructions: %d (max %d)\n"%(self.functionIndex,LEN_FUNCTIONSTACK))
+		elif opcode==OP_CHECK_STACK_HASH:
+			stackParams=[(tuple(params)+(0,0,0))[:3] for params in self.parameterStack[:self.functionIndex]]
+			self._print("Stack hash: %d\n"%stackHash(self.functionStack[:self.functionIndex],np.array(stackParams,dtype=np.uint32).reshape(-1,3)))
+		elif opcode==OP_PATCH_STACK:
+			index,slot,value=params
+			if index<self.functionIndex and slot<LEN_PARAM:
+				stackParams=list(self.parameterStack[index])+[0]*LEN_PARAM
+				stackParams[slot]=value
+				self.parameterStack[index]=tuple(stackParams[:max(len(self.parameterStack[index]),slot+1)])
+		elif opcode==OP_ASCII_MODE:
+			self.binaryMode=False
+		return
+
+	def _pushFunctionStack(self,opcode,params):
+		if self.functionIndex>=LEN_FUNCTIONSTACK:
+			return
+		self.functionStack[self.functionIndex]=opcode
+		self.parameterStack[self.functionIndex]=toParameterStack(opcode,params)
+		self.functionIndex+=1
+		return
+
+	# Function stack execution
+
+	def _runStack(self):
+		self.time=0 #Simulated time in clock cycles since runStack
+		self.TMR4Zero=0
+		self.pendingTriggers=[int(round(t*CHIPKIT_CLK)) for t in sorted(self.triggerTimes)]
+		self.timelineList=[]
+		self.running=True
+		self._continueStack(0)
+		return
+
+	def _continueStack(self,startIndex):
+		functionStack=self.functionStack
+		parameterStack=self.parameterStack
+		timeline=self.timelineList
+		t=self.time
+		for j in range(startIndex,self.functionIndex):
+			opcode=functionStack[j]
+			params=parameterStack[j]
+			start=t
+			t+=instructionCycles(opcode,params)
+
+			if opcode==OP_SET_REGISTER:
+				self._writeChip(params[0],params[1],params[2])
+			elif opcode==OP_IO_UPDATE:
+				self._ioUpdate()
+			elif opcode==OP_SET_PROFILE_PINS:
+				self.profilePins=(self.profilePins&params[1])|params[0]
+			elif opcode==OP_SET_TRIGGER_OUT:
+				self.triggerOut=params[0]
+			elif opcode==OP_DELAY_TIMER:
+				t+=params[0]
+			elif opcode==OP_RESET_TIMER:
+				self.TMR4Zero=t
+			elif opcode==OP_WAIT_FOR_TIMER:
+				t=max(t,self.TMR4Zero+params[0])
+			elif opcode==OP_WAIT_TRIGGER_IN:
+				while self.pendingTriggers and self.pendingTriggers[0]<start:
+					self.pendingTriggers.pop(0) #edge missed
+				if not self.pendingTriggers:
+					self.time=start
+					self.suspendedIndex=j
+					return
+				t=self.pendingTriggers.pop(0)+instructionCycles(opcode,params)
+			elif opcode==OP_RESET:
+				self.registerAD9958=list(registerDefaults)
+				self._resetChip()
+				self.TMR4Zero=t
+
+			timeline.append((j,opcode,(tuple(params)+(0,0,0))[:3],start,t))
+
+		self.time=t
+		self.instructionsExecuted+=len(timeline)
+		self.timeline=np.array(timeline,dtype=timelineDtype)
+		self.running=False
+		return
+
+	def trigger(self,delay=0):
+		"""
+			Sends a rising edge to the trigger input of a function stack suspended on waitTriggerIn.
+
+			:param delay: Time (in s) elapsed between the suspension and the rising edge.
+			:type delay: float
+		"""
+		if self.running:
+			self.pendingTriggers.insert(0,self.time+int(round(delay*CHIPKIT_CLK)))
+			self._continueStack(self.suspendedIndex)
+			self._processInput() #commands received during the execution
+		return
+
+	# AD9958
+
+	def _writeChip(self,registerAddress,value,doIO_update):
+		self.registerAD9958[registerAddress]=value
+		value&=(1<<(8*registerLengths[registerAddress]))-1
+		if registerAddress in commonRegisters:
+			self.channelRegisters[0][registerAddress]=value
+			self.channelRegisters[1][registerAddress]=value
+		else:
+			CSR=self.channelRegisters[0][0]
+			if CSR&(1<<6):
+				self.channelRegisters[0][registerAddress]=value
+			if CSR&(1<<7):
+				self.channelRegisters[1][registerAddress]=value
+		if doIO_update:
+			self._ioUpdate()
+		return
+
+	def _ioUpdate(self):
+		self.activeRegisters[0][:]=self.channelRegisters[0]
+		self.activeRegisters[1][:]=self.channelRegisters[1]
+		self.ioUpdateCounter+=1
+		return
+
+	def timelineSeconds(self):
+		"""
+			Returns the start and end times (in s after runStack) of the instructions executed by the last runStack.
+		"""
+		return self.timeline["start"]/CHIPKIT_CLK,self.timeline["end"]/CHIPKIT_CLK
@@ -0,0 +1,93 @@
+"""
+.. module:: envelope
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+from __future__ import division
+import numpy as np
+
+
+def segmentError(times,values,start,end):
+	"""
+		Maximum deviation between the samples **start** to **end** and the straight line through the samples **start** and **end**.
+	"""
+	t=times[start:end+1]
+	line=values[start]+(values[end]-values[start])*(t-times[start])/(times[end]-times[start])
+	return np.abs(line-values[start:end+1]).max()
+
+
+def fitPiecewiseLinear(times,values,maxError,minSegmentTime=0.):
+	"""
+		Greedy piecewise-linear fit of a sampled curve with knots on the samples. Starting at the first sample, each segment is extended to the furthest sample for which the deviation of the segment from all samples it spans stays within **maxError** (exponential search followed by a bisection, every returned segment is checked). Segments are at least **minSegmentTime** long (except the last one), even if this exceeds the error budget.
+
+		:param times: Sample times in s (strictly increasing).
+		:type times: numpy.ndarray
+		:param values: Sample values.
+		:type values: numpy.ndarray
+		:param maxError: Maximum deviation between the samples and the fit.
+		:type maxError: float
+		:param minSegmentTime: Minimum duration of a segment in s (Default is 0).
+		:type minSegmentTime: float
+		:returns: Indices of the knots (first and last sample included).
+	"""
+	times=np.asarray(times,dtype=float)
+	values=np.asarray(values,dtype=float)
+	N=len(times)
+	knots=[0]
+	start=0
+	while start<N-1:
+		shortest=max(start+1,min(int(np.searchsorted(times,times[start]+minSegmentTime)),N-1))
+		if segmentError(times,values,start,shortest)>maxError:
+			end=shortest
+		else:
+			#Exponential search for a failing end, then bisection between the last good and the failing end
+			good=shortest
+			step=1
+			bad=None
+			while good+step<N:
+				if segmentError(times,values,start,good+step)>maxError:
+					bad=good+step
+					break
+				good+=step
+				step*=2
+			if bad is None:
+				bad=N
+				if good<N-1 and segmentError(times,values,start,N-1)<=maxError:
+					good=N-1
+			while bad-good>1:
+				middle=(good+bad)//2
+				if segmentError(times,values,start,middle)<=maxError:
+					good=middle
+				else:
+					bad=middle
+			end=good
+		knots.append(end)
+		start=end
+	return np.array(knots,dtype=int)
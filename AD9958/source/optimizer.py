@@ -0,0 +1,182 @@
+"""
+.. module:: optimizer
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+import numpy as np
+from protocol import *
+from emulator import chipRegisterDefaults
+from sequence import sequence_class
+
+barrierOpcodes=(OP_WAIT_FOR_TIMER,OP_WAIT_TRIGGER_IN,OP_DELAY_TIMER) #Timing barriers
+eventOpcodes=(OP_SET_PROFILE_PINS,OP_SET_TRIGGER_OUT,OP_RESET_TIMER) #Observable events, treated as barriers
+AUTOCLEAR_BITS=(1<<2)+(1<<4) #Autoclear phase/sweep accumulator bits of CFR (0x03): every IO update has a side effect
+
+
+def optimizeSequence(sequence):
+	"""
+		Peephole optimizer for recorded sequences (see :func:`AD9958_class.startRecording`). The following rewrites are applied:
+
+		* **Dead writes**: a register write overwritten (on all its channels) by a later write before any IO update is removed.
+		* **Redundant writes**: a write of the value already held by the register is removed (e.g. :func:`AD9958_class.setEnabledChannels` with an unchanged selection). Writes with IO update are only removed if no other write is pending and the autoclear bits of CFR are known to be off.
+		* **IO update merging**: back-to-back IO updates (only register writes in between) are merged into the last one, unless a register transferred by the first IO update is written again before the second one (e.g. :func:`AD9958_class.clearPhaseAccumulator`) or the autoclear bits of CFR are not known to be off.
+
+		Timing barriers (waitForTimer, waitTriggerIn, delayTimer) and observable events (setProfilePins, setTriggerOut, resetTimer) are never crossed by a merge. The register state is unknown at the beginning of the sequence and known defaults are assumed after a reset. Channel registers are routed by the tracked CSR (no channel enabled after a reset) and by the recorded enabled channels while the CSR is unknown.
+
+		:param sequence: Recorded sequence.
+		:type sequence: sequence_class
+		:returns: (optimized sequence, report). The report is a dict with the number of instructions before/after, saved instructions, removed dead/redundant writes and merged IO updates.
+	"""
+	instructions=sequence.instructions()
+	opcodes=instructions["opcode"].tolist()
+	params=instructions["params"].tolist()
+	ch0Enabled=instructions["ch0Enabled"].tolist()
+	ch1Enabled=instructions["ch1Enabled"].tolist()
+	N=len(opcodes)
+	keep=[True]*N
+
+	buffered=[[None]*25,[None]*25] #Register values written into the AD9958 (None: unknown)
+	active=[[None]*25,[None]*25] #Register values transferred by the last IO update
+	pending={} #(channel,registerAddress) -> index of the writes since the last IO update
+	pendingChannels={} #index -> number of channels of a pending write not yet overwritten
+	lastIO=None #Index of the last IO update candidate for merging
+	mergeSet=set() #(channel,registerAddress) transferred by lastIO
+	mergeConflict=False
+
+	deadWrites=0
+	redundantWrites=0
+	mergedIO_updates=0
+
+	for i in range(N):
+		opcode=opcodes[i]
+		doIO_update=False
+
+		if opcode==OP_SET_REGISTER:
+			registerAddress,registerValue,doIO_update=params[i][0],params[i][1],bool(params[i][2])
+			CSR=buffered[0][0]
+			if registerAddress<=0x02:
+				channels=(0,1)
+			elif CSR is not None: #Writes are routed by the channel enable bits of the AD9958 (e.g. none after a reset)
+				channels=tuple(ch for ch,bit in ((0,6),(1,7)) if (CSR>>bit)&1)
+			else:
+				channels=tuple(ch for ch,enabled in ((0,ch0Enabled[i]),(1,ch1Enabled[i])) if enabled)
+			if not channels: #The write reaches no channel, only its IO update has an effect
+				if not doIO_update:
+					continue
+			else:
+				#Redundant write
+				if all(buffered[ch][registerAddress]==registerValue for ch in channels):
+					if not doIO_update:
+						keep[i]=False
+						redundantWrites+=1
+						continue
+					if not pending and _ioUpdateWithoutSideEffects(buffered,active):
+						keep[i]=False
+						redundantWrites+=1
+						continue
+
+				#Dead writes
+				if registerAddress!=0x00: #CSR is not buffered, it routes the following writes
+					for ch in channels:
+						j=pending.pop((ch,registerAddress),None)
+						if j is not None:
+							pendingChannels[j]-=1
+							if pendingChannels[j]==0 and keep[j]:
+								keep[j]=False
+								deadWrites+=1
+					for ch in channels:
+						pending[(ch,registerAddress)]=i
+					pendingChannels[i]=len(channels)
+					if lastIO is not None and any((ch,registerAddress) in mergeSet for ch in channels):
+						mergeConflict=True
+
+				for ch in channels:
+					buffered[ch][registerAddress]=registerValue
+
+		elif opcode==OP_IO_UPDATE:
+			doIO_update=True
+
+		elif opcode==OP_RESET:
+			for ch in (0,1):
+				buffered[ch]=list(chipRegisterDefaults)
+				buffered[ch][0]=1<<1 #single bit 3-wire mode set by begin()
+				active[ch]=list(buffered[ch])
+			pending={}
+			lastIO=None
+			mergeSet=set()
+			continue
+
+		elif opcode in barrierOpcodes or opcode in eventOpcodes:
+			lastIO=None
+			mergeSet=set()
+			continue
+
+		if doIO_update:
+			transferred=set(pending.keys())
+			if lastIO is not None and not mergeConflict and _ioUpdateWithoutSideEffects(buffered,active):
+				if opcodes[lastIO]==OP_IO_UPDATE:
+					keep[lastIO]=False
+				else:
+					params[lastIO][2]=0
+				mergedIO_updates+=1
+				mergeSet|=transferred
+			else:
+				mergeSet=transferred
+			lastIO=i
+			mergeConflict=False
+			pending={}
+			active=[list(buffered[0]),list(buffered[1])]
+
+	keep=np.array(keep,dtype=bool)
+	optimized=instructions[keep].copy()
+	optimized["params"]=np.array(params,dtype=np.uint32).reshape(-1,LEN_PARAM)[keep]
+	optimizedSequence=sequence_class.fromArray(optimized)
+
+	report={
+		"instructionsBefore":N,
+		"instructionsAfter":len(optimizedSequence),
+		"instructionsSaved":N-len(optimizedSequence),
+		"deadWrites":deadWrites,
+		"redundantWrites":redundantWrites,
+		"mergedIO_updates":mergedIO_updates,
+	}
+	return optimizedSequence,report
+
+
+def _ioUpdateWithoutSideEffects(buffered,active):
+	"""
+		Returns True if an IO update would neither transfer a changed register nor trigger an autoclear of the accumulators.
+	"""
+	for ch in (0,1):
+		for registerMap in (buffered[ch],active[ch]):
+			CFR=registerMap[0x03]
+			if CFR is None or CFR&AUTOCLEAR_BITS:
+				return False
+	return True
@@ -0,0 +1,149 @@
+"""
+.. module:: profiler
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+import time
+import json
+import inspect
+
+
+class profile_class(object):
+	"""
+		Profiler of the host time spent in the public methods of an :class:`AD9958_class` object. While active, every public method is wrapped to measure its total and self time (time not spent in nested public methods), and the emitted commands are collected with a trace hook (see :func:`AD9958_class.addTraceHook`). Use it through :func:`profile`.
+
+		:param rf: Profiled AD9958 object.
+		:type rf: AD9958_class
+	"""
+	def __init__(self,rf):
+		self.rf=rf
+		self.methods={} #Method name -> [calls, total time, self time]
+		self.events=[] #(name, category, startTime, endTime, args)
+		self.stack=[] #[method name, startTime, time in nested methods]
+		self.startTime=None
+		self.endTime=None
+		self.wrapped=[]
+
+	def __enter__(self):
+		self.startTime=time.time()
+		self.rf.addTraceHook(self._commandHook)
+		for name in dir(self.rf):
+			if name.startswith("_"):
+				continue
+			method=getattr(self.rf,name)
+			if inspect.ismethod(method):
+				setattr(self.rf,name,self._wrap(name,method))
+				self.wrapped.append(name)
+		return self
+
+	def __exit__(self,excType,excValue,traceback):
+		for name in self.wrapped:
+			delattr(self.rf,name) #restores the class method
+		self.wrapped=[]
+		self.rf.removeTraceHook(self._commandHook)
+		self.endTime=time.time()
+		return False
+
+	def _wrap(self,name,method):
+		def wrapper(*args,**kwargs):
+			frame=[name,time.time(),0.]
+			self.stack.append(frame)
+			try:
+				return method(*args,**kwargs)
+			finally:
+				endTime=time.time()
+				self.stack.pop()
+				duration=endTime-frame[1]
+				entry=self.methods.setdefault(name,[0,0.,0.])
+				entry[0]+=1
+				entry[1]+=duration
+				entry[2]+=duration-frame[2]
+				if self.stack:
+					self.stack[-1][2]+=duration
+				self.events.append((name,"api",frame[1],endTime,None))
+		return wrapper
+
+	def _commandHook(self,name,params,data,startTime,endTime):
+		if data is None:
+			nBytes=0
+		else:
+			nBytes=len(data)
+		self.events.append((name,"command",startTime,endTime,{"params":" ".join(str(x) for x in params),"bytes":nBytes}))
+		return
+
+	def report(self,printReport=True):
+		"""
+			Returns (and prints) the host time per public method.
+
+			:param printReport: Prints the table sorted by total time (Default is True).
+			:type printReport: bool
+			:returns: Dict with calls, totalTime and selfTime (in s) per method name.
+		"""
+		result=dict((name,{"calls":entry[0],"totalTime":entry[1],"selfTime":entry[2]}) for name,entry in self.methods.items())
+		if printReport:
+			print "%-28s %8s %12s %12s"%("method","calls","total [ms]","self [ms]")
+			for name in sorted(result,key=lambda x:-result[x]["totalTime"]):
+				entry=result[name]
+				print "%-28s %8d %12.3f %12.3f"%(name,entry["calls"],1e3*entry["totalTime"],1e3*entry["selfTime"])
+		return result
+
+	def exportChromeTrace(self,path):
+		"""
+			Exports the method calls and the emitted commands as a Chrome trace JSON file (complete events, open with chrome://tracing or a compatible flame view).
+
+			:param path: Output file.
+			:type path: str
+		"""
+		traceEvents=[]
+		for name,category,startTime,endTime,args in self.events:
+			event={"name":name,"cat":category,"ph":"X","ts":1e6*(startTime-self.startTime),"dur":1e6*(endTime-startTime),"pid":1,"tid":1}
+			if args is not None:
+				event["args"]=args
+			traceEvents.append(event)
+		traceEvents.sort(key=lambda event:(event["ts"],-event["dur"]))
+		with open(path,"w") as f:
+			json.dump({"traceEvents":traceEvents,"displayTimeUnit":"ms"},f)
+		return
+
+
+def profile(rf):
+	"""
+		Context manager profiling the host time spent in the public methods of an AD9958 object::
+
+			with profile(RF) as prof:
+				...
+			prof.report()
+			prof.exportChromeTrace("trace.json")
+
+		:param rf: Profiled AD9958 object.
+		:type rf: AD9958_class
+		:returns: :class:`profile_class`
+	"""
+	return profile_class(rf)
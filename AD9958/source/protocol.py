@@ -0,0 +1,367 @@
+"""
+.. module:: protocol
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+import struct
+import re
+import numpy as np
+
+#Firmware constants (AD9958Driver.ino)
+LEN_FUNCTIONSTACK=1000
+LEN_PARAM=5
+
+#Function stack opcodes (instructions executed with exact timing)
+OP_SET_REGISTER=0x01
+OP_RESET=0x02
+OP_IO_UPDATE=0x03
+OP_SET_PROFILE_PINS=0x04
+OP_SET_TRIGGER_OUT=0x05
+OP_WAIT_TRIGGER_IN=0x06
+OP_DELAY_TIMER=0x07
+OP_RESET_TIMER=0x08
+OP_WAIT_FOR_TIMER=0x09
+
+#Control opcodes (executed immediately, not stored in the function stack)
+OP_CLEAR_STACK=0x20
+OP_RUN_STACK=0x21
+OP_CHECK_STACK_FINISHED=0x22
+OP_CHECK_LEN_STACK=0x23
+OP_ASCII_MODE=0x24
+OP_CHECK_STACK_HASH=0x25
+OP_PATCH_STACK=0x26
+
+commandNames={
+	OP_SET_REGISTER:"setRegister",
+	OP_RESET:"reset",
+	OP_IO_UPDATE:"IO_update",
+	OP_SET_PROFILE_PINS:"setProfilePins",
+	OP_SET_TRIGGER_OUT:"setTriggerOut",
+	OP_WAIT_TRIGGER_IN:"waitTriggerIn",
+	OP_DELAY_TIMER:"delayTimer",
+	OP_RESET_TIMER:"resetTimer",
+	OP_WAIT_FOR_TIMER:"waitForTimer",
+	OP_CLEAR_STACK:"clearStack",
+	OP_RUN_STACK:"runStack",
+	OP_CHECK_STACK_FINISHED:"checkStackFinished",
+	OP_CHECK_LEN_STACK:"checkLenStack",
+	OP_ASCII_MODE:"asciiMode",
+	OP_CHECK_STACK_HASH:"checkStackHash",
+	OP_PATCH_STACK:"patchStack",
+}
+
+stackOpcodes=(OP_SET_REGISTER,OP_RESET,OP_IO_UPDATE,OP_SET_PROFILE_PINS,OP_SET_TRIGGER_OUT,OP_WAIT_TRIGGER_IN,OP_DELAY_TIMER,OP_RESET_TIMER,OP_WAIT_FOR_TIMER)
+
+parameterCounts={OP_SET_REGISTER:3,OP_SET_PROFILE_PINS:1,OP_SET_TRIGGER_OUT:1,OP_DELAY_TIMER:1,OP_WAIT_FOR_TIMER:1,OP_PATCH_STACK:3} #Command parameters (0 if not listed)
+
+commandOpcodes=dict((name,opcode) for opcode,name in commandNames.items())
+commandOpcodes["setProfileFlag"]=OP_SET_PROFILE_PINS #ASCII name of setProfilePins with a packed PORTE flag
+
+#Profile pins P0-P3 on PORTE of the chipKIT Max32 (see begin() in AD9958Driver.ino)
+PROFILE_PIN_POSITIONS=(7,6,5,4)
+PROFILE_PINS_MASK=~((1<<7)|(1<<6)|(1<<5)|(1<<4))&0xFFFFFFFF
+PROFILE_PINS_BITS=~PROFILE_PINS_MASK&0xFFFFFFFF
+
+#ASCII commands understood by the SerialCommand parser of AD9958Driver.ino
+asciiFormats={
+	OP_SET_REGISTER:"setRegister %s %s %s \n",
+	OP_RESET:"reset\n",
+	OP_IO_UPDATE:"IO_update \n",
+	OP_SET_PROFILE_PINS:"setProfileFlag %s \n", #PORTE flag (see profilePinsFlag)
+	OP_SET_TRIGGER_OUT:"setTriggerOut %s\n",
+	OP_WAIT_TRIGGER_IN:"waitTriggerIn\n",
+	OP_DELAY_TIMER:"delayTimer %s \n",
+	OP_RESET_TIMER:"resetTimer \n",
+	OP_WAIT_FOR_TIMER:"waitForTimer %s \n",
+	OP_CLEAR_STACK:"clearStack \n",
+	OP_RUN_STACK:"runStack \n",
+	OP_CHECK_STACK_FINISHED:"checkStackFinished \n",
+	OP_CHECK_LEN_STACK:"checkLenStack \n",
+	OP_CHECK_STACK_HASH:"checkStackHash \n",
+	OP_PATCH_STACK:"patchStack %s %s %s \n",
+}
+
+ASCII_BINARY_MODE="binaryMode \n" #Switches the microcontroller into binary mode
+
+#Baud rate negotiation (see setBaud in AD9958Driver.ino)
+ASCII_SET_BAUD="setBaud %d \n"
+BAUD_DEFAULT=9600
+BAUD_ECHO_TEST="echo UUUUUUUUUUUUUUUU0123456789ABCDEF"
+BAUD_CONFIRM="confirm" #Sent by the host after a valid echo, the new baud rate is kept only if it is received
+BAUD_SWITCH_DELAY=0.01 #s
+BAUD_TIMEOUT=1. #s
+
+#Binary frames: one byte opcode followed by fixed width little endian operands
+binaryFormats={
+	OP_SET_REGISTER:struct.Struct("<BBIB"), #registerAddress, registerValue, doIO_update
+	OP_RESET:struct.Struct("<B"),
+	OP_IO_UPDATE:struct.Struct("<B"),
+	OP_SET_PROFILE_PINS:struct.Struct("<BB"), #PORTE flag (profile pins on bits 4-7)
+	OP_SET_TRIGGER_OUT:struct.Struct("<BB"),
+	OP_WAIT_TRIGGER_IN:struct.Struct("<B"),
+	OP_DELAY_TIMER:struct.Struct("<BI"), #clock cycles
+	OP_RESET_TIMER:struct.Struct("<B"),
+	OP_WAIT_FOR_TIMER:struct.Struct("<BI"), #clock cycles
+	OP_CLEAR_STACK:struct.Struct("<B"),
+	OP_RUN_STACK:struct.Struct("<B"),
+	OP_CHECK_STACK_FINISHED:struct.Struct("<B"),
+	OP_CHECK_LEN_STACK:struct.Struct("<B"),
+	OP_CHECK_STACK_HASH:struct.Struct("<B"),
+	OP_PATCH_STACK:struct.Struct("<BHBI"), #index, parameter slot, value
+	OP_ASCII_MODE:struct.Struct("<B"),
+}
+
+
+#32 bit FNV-1a hash of the function stack (see checkStackHash in AD9958Driver.ino)
+FNV_OFFSET_BASIS=2166136261
+FNV_PRIME=16777619
+stackHashDtype=np.dtype([("opcode","u1"),("params","<u4",(3,))])
+
+#Binary setRegister frame as a NumPy record (same layout as binaryFormats[OP_SET_REGISTER])
+setRegisterFrameDtype=np.dtype([("opcode","u1"),("registerAddress","u1"),("registerValue","<u4"),("doIO_update","u1")])
+
+
+def encodeASCII(opcode,params=()):
+	"""
+		Encodes a command as an ASCII line for the SerialCommand parser of the microcontroller.
+
+		:param opcode: Command opcode.
+		:type opcode: int
+		:param params: Command parameters.
+		:type params: tuple
+		:returns: Encoded command.
+	"""
+	return asciiFormats[opcode]%tuple(params)
+
+
+def stackValue(x):
+	"""
+		Converts a command operand into the integer stored by the microcontroller. Floats (e.g. timer clock cycles) are converted as strtoul does with their ASCII representation (399.99999999999994 -> "400.0" -> 400), so that ASCII, binary and recorded sequences program the same stack.
+	"""
+	if isinstance(x,float):
+		return parseUnsigned("%s"%x)
+	return int(x)
+
+
+def encodeBinary(opcode,params=()):
+	"""
+		Encodes a command as a binary frame: one byte opcode followed by fixed width little endian operands. Timer values are truncated to integer clock cycles (as done by strtoul in ASCII mode).
+
+		:param opcode: Command opcode.
+		:type opcode: int
+		:param params: Command parameters (same as for :func:`encodeASCII`).
+		:type params: tuple
+		:returns: Encoded command.
+	"""
+	return binaryFormats[opcode].pack(opcode,*[stackValue(x) for x in params])
+
+
+def encodeSetRegisters(registerAddresses,registerValues,doIO_update=True,binary=False):
+	"""
+		Encodes a block of setRegister commands at once. In binary mode the frames are built in a NumPy record array (see **setRegisterFrameDtype**) without converting the values to Python integers.
+
+		:param registerAddresses: Register address (int) or array of register addresses.
+		:type registerAddresses: numpy.ndarray
+		:param registerValues: Array of register values.
+		:type registerValues: numpy.ndarray
+		:param doIO_update: Performs an IO update after every write.
+		:type doIO_update: bool
+		:param binary: Use the binary protocol instead of the ASCII commands.
+		:type binary: bool
+		:returns: Encoded commands.
+	"""
+	registerValues=np.asarray(registerValues,dtype=np.uint32)
+	registerAddresses=np.broadcast_to(np.asarray(registerAddresses,dtype=np.uint8),registerValues.shape)
+	if binary:
+		frames=np.empty(len(registerValues),dtype=setRegisterFrameDtype)
+		frames["opcode"]=OP_SET_REGISTER
+		frames["registerAddress"]=registerAddresses
+		frames["registerValue"]=registerValues
+		frames["doIO_update"]=doIO_update&1
+		return frames.tobytes()
+	line="setRegister %d %d "+"%d \n"%(doIO_update&1)
+	return "".join([line%(address,value) for address,value in zip(registerAddresses.tolist(),registerValues.tolist())])
+
+
+def decodeBinary(data,pos=0):
+	"""
+		Decodes one binary frame (Python counterpart of the decoder of AD9958Driver.ino).
+
+		:param data: Received bytes.
+		:type data: str
+		:param pos: Position of the frame in **data**.
+		:type pos: int
+		:returns: (opcode, params, position after the frame) or None if the frame is incomplete.
+	"""
+	if pos>=len(data):
+		return None
+	opcode=bytearray(data[pos:pos+1])[0]
+	if opcode not in binaryFormats:
+		raise ValueError("Unknown opcode 0x%02X"%opcode)
+	frameFormat=binaryFormats[opcode]
+	if pos+frameFormat.size>len(data):
+		return None
+	params=frameFormat.unpack_from(data,pos)[1:]
+	return opcode,params,pos+frameFormat.size
+
+
+_unsignedPattern=re.compile(r"(0[xX][0-9a-fA-F]+|0[0-7]*|[1-9][0-9]*)")
+
+def parseUnsigned(arg):
+	"""
+		Parses an ASCII operand the same way as strtoul(arg,NULL,0) on the microcontroller (e.g. "800.0" -> 800).
+
+		:param arg: ASCII operand.
+		:type arg: str
+		:returns: Parsed value (0 if **arg** does not start with a number).
+	"""
+	if arg.isdigit() and arg[0]!="0":
+		return min(int(arg),0xFFFFFFFF)
+	match=_unsignedPattern.match(arg)
+	if match is None:
+		return 0
+	digits=match.group(0)
+	if digits[:2] in ("0x","0X"):
+		value=int(digits,16)
+	elif digits[0]=="0":
+		value=int(digits,8)
+	else:
+		value=int(digits)
+	return min(value,0xFFFFFFFF)
+
+
+def decodeASCII(line):
+	"""
+		Decodes an ASCII command line (Python counterpart of the SerialCommand parser of AD9958Driver.ino).
+
+		:param line: Command line without the terminating linebreak.
+		:type line: str
+		:returns: (opcode, params). The opcode is None for an unrecognized command and params contains the received command name.
+	"""
+	tokens=line.split()
+	if not tokens:
+		return None,()
+	opcode=commandOpcodes.get(tokens[0])
+	if opcode is None or opcode not in asciiFormats:
+		return None,(tokens[0],)
+	nParams=parameterCounts.get(opcode,0)
+	params=[parseUnsigned(x) for x in tokens[1:nParams+1]]
+	params+=[0]*(nParams-len(params))
+	return opcode,tuple(params)
+
+
+def profilePinsFlag(pin0Flag,pin1Flag,pin2Flag,pin3Flag):
+	"""
+		Packs the profile pin states into the PORTE flag stored by the microcontroller for setProfilePins.
+	"""
+	return ((pin0Flag&1)<<PROFILE_PIN_POSITIONS[0])|((pin1Flag&1)<<PROFILE_PIN_POSITIONS[1])|((pin2Flag&1)<<PROFILE_PIN_POSITIONS[2])|((pin3Flag&1)<<PROFILE_PIN_POSITIONS[3])
+
+
+_profileFlagTables={} #(modulationLevel, PPC) -> PORTE flag table
+_profileFlagLookups={} #(modulationLevel, PPC) -> PORTE flag table as nested lists
+
+def profileFlagTable(modulationLevel,PPC):
+	"""
+		PORTE flags of the profile pins for all pairs of active registers (see :func:`AD9958_class.setModulationRegister`). The tables are computed once per (modulationLevel, PPC).
+
+		:param modulationLevel: Modulation level (0: 2 levels, 1: 4 levels, 2: 8 levels, 3: 16 levels).
+		:type modulationLevel: int
+		:param PPC: Profile pin configuration bits (register 0x01).
+		:type PPC: int
+		:returns: 16x16 array, entry [regChannel0,regChannel1] is the PORTE flag.
+	"""
+	table=_profileFlagTables.get((modulationLevel,PPC))
+	if table is not None:
+		return table
+	regChannel0,regChannel1=np.indices((16,16),dtype=np.uint32)
+	if modulationLevel==0:
+		pins=(0*regChannel0,0*regChannel0,regChannel0&1,regChannel1&1)
+	elif modulationLevel==1:
+		pins=((regChannel0>>1)&1,regChannel0&1,(regChannel1>>1)&1,regChannel1&1)
+	elif modulationLevel in (2,3) and PPC in ((1<<1),(1<<1)+1):
+		register=regChannel0 if PPC==(1<<1) else regChannel1 #priority channel
+		if modulationLevel==2:
+			pins=((register>>2)&1,(register>>1)&1,register&1,0*register)
+		else:
+			pins=((register>>3)&1,(register>>2)&1,(register>>1)&1,register&1)
+	else:
+		pins=(0*regChannel0,)*4
+	table=np.zeros((16,16),dtype=np.uint32)
+	for pin,position in zip(pins,PROFILE_PIN_POSITIONS):
+		table|=pin<<position
+	table.setflags(write=False)
+	_profileFlagTables[(modulationLevel,PPC)]=table
+	return table
+
+
+def profileFlagLookup(modulationLevel,PPC):
+	"""
+		Same as :func:`profileFlagTable` as nested lists of ints (faster for single lookups).
+	"""
+	lookup=_profileFlagLookups.get((modulationLevel,PPC))
+	if lookup is None:
+		lookup=profileFlagTable(modulationLevel,PPC).tolist()
+		_profileFlagLookups[(modulationLevel,PPC)]=lookup
+	return lookup
+
+
+def toParameterStack(opcode,params):
+	"""
+		Converts the parameters of a command into the parameterStack entries stored by the microcontroller (profile pins -> PORTE flag and mask, timer values -> integer clock cycles).
+	"""
+	if opcode==OP_SET_PROFILE_PINS:
+		return (stackValue(params[0])&PROFILE_PINS_BITS,PROFILE_PINS_MASK)
+	return tuple(stackValue(x) for x in params)
+
+
+def fromParameterStack(opcode,stackParams):
+	"""
+		Inverse of :func:`toParameterStack`: returns the command parameters for the parameterStack entries of an instruction.
+	"""
+	return tuple(int(x) for x in stackParams[:parameterCounts.get(opcode,0)])
+
+
+def stackHash(opcodes,stackParams):
+	"""
+		32 bit FNV-1a hash of a function stack, as computed by the checkStackHash command of the microcontroller: opcode (1 byte) and parameterStack entries 0-2 (4 bytes each, little endian) of every instruction.
+
+		:param opcodes: Instruction opcodes.
+		:type opcodes: numpy.ndarray
+		:param stackParams: parameterStack entries (one row per instruction, at least 3 columns).
+		:type stackParams: numpy.ndarray
+		:returns: Hash value.
+	"""
+	records=np.zeros(len(opcodes),dtype=stackHashDtype)
+	records["opcode"]=opcodes
+	records["params"]=np.asarray(stackParams)[:,:3]
+	value=FNV_OFFSET_BASIS
+	for byte in bytearray(records.tobytes()):
+		value=((value^byte)*FNV_PRIME)&0xFFFFFFFF
+	return value
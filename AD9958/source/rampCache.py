@@ -0,0 +1,190 @@
+"""
+.. module:: rampCache
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+from __future__ import division
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class rampCache_class:
+	"""
+		Persistent cache for the ramp parameters found by :func:`AD9958_class.findOptimalRamp`. Solutions are stored in a sqlite file and survive between sessions. Once **maxEntries** is exceeded, the least recently used solutions are evicted.
+
+		The cache key is (ramp type, lowValue, highValue, rampUpTime, rampDownTime, SYS_CLK).
+
+		A cache hit only reads the file: the use of the solution is kept in memory and written (in order) with the next miss, put or :func:`rampCache_class.flush`. Counts and use order are read from the file inside each insert/evict transaction, so several processes can share the file.
+
+		The cache can be shared between several AD9958 objects (e.g. the boards of a :class:`devicePool_class`, which are programmed from a thread pool): all accesses to the sqlite connection and the counters are serialized with a lock.
+
+		:param path: Path of the sqlite file (":memory:" for a cache which is not persistent).
+		:type path: str
+		:param maxEntries: Maximum number of stored solutions.
+		:type maxEntries: int
+	"""
+	def __init__(self,path,maxEntries=100000):
+		self.path=path
+		self.maxEntries=maxEntries
+
+	#Counters
+		self.hits=0
+		self.misses=0
+
+	#Database
+		self.lock=threading.Lock()
+		self.touched=OrderedDict() #Keys of the cache hits not yet written, least recently used first
+		self.connection=sqlite3.connect(path,check_same_thread=False,isolation_level=None) #Transactions are explicit (see _transaction)
+		self.connection.execute("PRAGMA journal_mode=WAL")
+		self.connection.execute("PRAGMA synchronous=NORMAL")
+		self.connection.execute("CREATE TABLE IF NOT EXISTS ramps (rampType TEXT, lowValue REAL, highValue REAL, rampUpTime REAL, rampDownTime REAL, sysClk REAL, RSRR INTEGER, RDW INTEGER, FSRR INTEGER, FDW INTEGER, lastUsed INTEGER, PRIMARY KEY (rampType,lowValue,highValue,rampUpTime,rampDownTime,sysClk))")
+		self.connection.execute("CREATE INDEX IF NOT EXISTS rampsLastUsed ON ramps (lastUsed)")
+		self.numEntries=self.connection.execute("SELECT COUNT(*) FROM ramps").fetchone()[0]
+
+	def _key(self,rampType,lowValue,highValue,rampUpTime,rampDownTime,sysClk):
+		return (str(rampType),float(lowValue),float(highValue),float(rampUpTime),float(rampDownTime),float(sysClk))
+
+	def _transaction(self,function,*args):
+		"""
+			Runs **function(*args)** in a write transaction (BEGIN IMMEDIATE, so concurrent processes are serialized). Has to be called with the lock held.
+		"""
+		self.connection.execute("BEGIN IMMEDIATE")
+		try:
+			result=function(*args)
+		except:
+			self.connection.execute("ROLLBACK")
+			raise
+		self.connection.execute("COMMIT")
+		return result
+
+	def _lastUsed(self):
+		return self.connection.execute("SELECT COALESCE(MAX(lastUsed),0) FROM ramps").fetchone()[0]
+
+	def _writeTouched(self):
+		"""
+			Writes the uses of the cache hits (inside a transaction).
+		"""
+		if not self.touched:
+			return
+		lastUsed=self._lastUsed()
+		self.connection.executemany("UPDATE ramps SET lastUsed=? WHERE rampType=? AND lowValue=? AND highValue=? AND rampUpTime=? AND rampDownTime=? AND sysClk=?",[(lastUsed+i+1,)+key for i,key in enumerate(self.touched)])
+		self.touched.clear()
+		return
+
+	def get(self,rampType,lowValue,highValue,rampUpTime,rampDownTime,sysClk):
+		"""
+			Looks up a ramp solution.
+
+			:return: [RSRR,RDW,FSRR,FDW] or None if the ramp is not cached.
+		"""
+		key=self._key(rampType,lowValue,highValue,rampUpTime,rampDownTime,sysClk)
+		with self.lock:
+			row=self.connection.execute("SELECT RSRR,RDW,FSRR,FDW FROM ramps WHERE rampType=? AND lowValue=? AND highValue=? AND rampUpTime=? AND rampDownTime=? AND sysClk=?",key).fetchone()
+			if row is None:
+				self.misses+=1
+				if self.touched:
+					self._transaction(self._writeTouched)
+				return None
+
+			self.hits+=1
+			self.touched.pop(key,None)
+			self.touched[key]=True
+		return np.array(row,dtype=int)
+
+	def _insert(self,key,solution):
+		self._writeTouched()
+		self.connection.execute("INSERT OR IGNORE INTO ramps VALUES (?,?,?,?,?,?,?,?,?,?,?)",key+tuple(int(x) for x in solution)+(self._lastUsed()+1,))
+		numEntries=self.connection.execute("SELECT COUNT(*) FROM ramps").fetchone()[0]
+		if numEntries>self.maxEntries:
+			self.connection.execute("DELETE FROM ramps WHERE rowid IN (SELECT rowid FROM ramps ORDER BY lastUsed LIMIT ?)",(numEntries-self.maxEntries,))
+			numEntries=self.maxEntries
+		return numEntries
+
+	def put(self,rampType,lowValue,highValue,rampUpTime,rampDownTime,sysClk,solution):
+		"""
+			Stores a ramp solution [RSRR,RDW,FSRR,FDW] and evicts the least recently used solutions if the cache is full.
+		"""
+		key=self._key(rampType,lowValue,highValue,rampUpTime,rampDownTime,sysClk)
+		with self.lock:
+			self.numEntries=self._transaction(self._insert,key,solution)
+		return
+
+	def flush(self):
+		"""
+			Writes the uses of the cache hits since the last miss, put or flush into the file (done automatically by :func:`rampCache_class.close`).
+		"""
+		with self.lock:
+			if self.touched:
+				self._transaction(self._writeTouched)
+		return
+
+	def invalidate(self,sysClk=None):
+		"""
+			Removes cached solutions. Has to be called when REF_CLK or PLL_MULTIPLIER change (done automatically by :func:`AD9958_class.setClock`).
+
+			:param sysClk: Only remove the solutions for this SYS_CLK (Default is None, which clears the whole cache).
+			:type sysClk: float
+		"""
+		with self.lock:
+			if sysClk is None:
+				self.connection.execute("DELETE FROM ramps")
+				self.touched.clear()
+			else:
+				self.connection.execute("DELETE FROM ramps WHERE sysClk=?",(float(sysClk),))
+			self.numEntries=self.connection.execute("SELECT COUNT(*) FROM ramps").fetchone()[0]
+		return
+
+	def resetCounters(self):
+		"""
+			Resets the hit/miss counters.
+		"""
+		with self.lock:
+			self.hits=0
+			self.misses=0
+		return
+
+	def checkStats(self):
+		"""
+			Returns the cache statistics.
+
+			:returns: Message of type *Ramp cache: X hits, Y misses, Z entries (max W)*.
+		"""
+		return "Ramp cache: %d hits, %d misses, %d entries (max %d)"%(self.hits,self.misses,self.numEntries,self.maxEntries)
+
+	def close(self):
+		"""
+			Writes the pending uses of cache hits and closes the sqlite file.
+		"""
+		with self.lock:
+			if self.touched:
+				self._transaction(self._writeTouched)
+			self.connection.close()
+		return
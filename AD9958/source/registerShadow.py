@@ -0,0 +1,141 @@
+"""
+.. module:: registerShadow
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+class registerShadow_class(object):
+	"""
+		Host side shadow of the 25 AD9958 registers of channel 0 and channel 1. The register values are stored as plain ints; a bit mask per channel flags the registers with a known value (written since the last reset/clearStack) and another one the dirty registers (written but not yet transferred by an IO update). A write does not allocate any array.
+
+		**working** reproduces the current register map of :class:`AD9958_class`: channel 0 OR channel 1 if channel 0 is enabled, channel 1 if only channel 1 is enabled, unchanged if no channel is enabled, except for the shared registers 0x00-0x02, which are updated by every write.
+	"""
+	__slots__=("map0","map1","working","known0","known1","dirty0","dirty1","workingMode","skippedWrites")
+
+	def __init__(self):
+		self.map0=[0]*25 #Register map of channel 0
+		self.map1=[0]*25 #Register map of channel 1
+		self.working=[0]*25 #Current register map
+		self.known0=0
+		self.known1=0
+		self.dirty0=0
+		self.dirty1=0
+		self.workingMode=0 #0: no channel, 1: channel 1, 2: channel 0 (or both)
+		self.skippedWrites=0
+
+	def write(self,registerAddress,registerValue,ch0Enabled,ch1Enabled,doIO_update):
+		"""
+			Updates the shadow after writing **registerValue** into **registerAddress** of the enabled channels.
+		"""
+		value=registerValue&0xFFFFFFFF
+		bit=1<<registerAddress
+		common=registerAddress<=0x02 #Registers shared between channel 0 and channel 1
+		if ch0Enabled or common:
+			self.map0[registerAddress]=value
+			self.known0|=bit
+			self.dirty0|=bit
+		if ch1Enabled or common:
+			self.map1[registerAddress]=value
+			self.known1|=bit
+			self.dirty1|=bit
+		if doIO_update:
+			self.dirty0=0
+			self.dirty1=0
+
+		#Working register
+		if ch0Enabled:
+			mode=2
+		elif ch1Enabled:
+			mode=1
+		else:
+			if common: #Shared registers are the same in all working modes
+				self.working[registerAddress]=value
+			return
+		if mode!=self.workingMode:
+			self.workingMode=mode
+			for i in range(25):
+				self.working[i]=self.map0[i]|self.map1[i] if mode==2 else self.map1[i]
+		elif mode==2:
+			self.working[registerAddress]=self.map0[registerAddress]|self.map1[registerAddress]
+		else:
+			self.working[registerAddress]=self.map1[registerAddress]
+		return
+
+	def isRedundant(self,registerAddress,registerValue,ch0Enabled,ch1Enabled,doIO_update):
+		"""
+			Returns True if the write would not change the AD9958: the register already holds **registerValue** on all targeted channels and, for an IO update, no other register is dirty.
+		"""
+		value=registerValue&0xFFFFFFFF
+		bit=1<<registerAddress
+		common=registerAddress<=0x02
+		targetCh0=ch0Enabled or common
+		targetCh1=ch1Enabled or common
+		if not (targetCh0 or targetCh1):
+			return False
+		if targetCh0 and not ((self.known0&bit) and self.map0[registerAddress]==value):
+			return False
+		if targetCh1 and not ((self.known1&bit) and self.map1[registerAddress]==value):
+			return False
+		if doIO_update and (self.dirty0 or self.dirty1):
+			return False
+		return True
+
+	def ioUpdate(self):
+		"""
+			Clears the dirty flags (IO update).
+		"""
+		self.dirty0=0
+		self.dirty1=0
+		return
+
+	def invalidate(self):
+		"""
+			Marks all register values as unknown (after a reset or when a new function stack is built).
+		"""
+		self.known0=0
+		self.known1=0
+		self.dirty0=0
+		self.dirty1=0
+		return
+
+	def snapshot(self):
+		"""
+			Returns a copy of the shadow state (see :func:`registerShadow_class.restore`).
+		"""
+		return (tuple(self.map0),tuple(self.map1),tuple(self.working),self.known0,self.known1,self.dirty0,self.dirty1,self.workingMode)
+
+	def restore(self,state):
+		"""
+			Restores a state returned by :func:`registerShadow_class.snapshot`. The register lists are updated in place, so references to them (e.g. **registerMap** of :class:`AD9958_class`) stay valid.
+		"""
+		self.map0[:]=state[0]
+		self.map1[:]=state[1]
+		self.working[:]=state[2]
+		self.known0,self.known1,self.dirty0,self.dirty1,self.workingMode=state[3:]
+		return
@@ -0,0 +1,200 @@
+"""
+.. module:: sequence
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+import numpy as np
+from protocol import *
+
+sequenceDtype=np.dtype([("opcode","u1"),("params","u4",(LEN_PARAM,)),("ch0Enabled","u1"),("ch1Enabled","u1")])
+
+
+class sequence_class:
+	"""
+		Compiled function stack recorded by :func:`AD9958_class.startRecording`. Each instruction is stored in a NumPy structured array (see **sequenceDtype**) mirroring functionStack and parameterStack of the microcontroller: opcode, five uint32 parameters and the enabled channels at the time of the call.
+
+		:param capacity: Initial number of preallocated instructions.
+		:type capacity: int
+	"""
+	def __init__(self,capacity=256):
+		self.data=np.zeros(capacity,dtype=sequenceDtype)
+		self.length=0
+
+	def __len__(self):
+		return self.length
+
+	def append(self,opcode,params,ch0Enabled,ch1Enabled):
+		"""
+			Appends an instruction.
+
+			:param opcode: Instruction opcode (see :mod:`protocol`).
+			:type opcode: int
+			:param params: Command parameters, as passed to :func:`encodeASCII`.
+			:type params: tuple
+			:param ch0Enabled: Channel 0 enabled flag.
+			:type ch0Enabled: bool
+			:param ch1Enabled: Channel 1 enabled flag.
+			:type ch1Enabled: bool
+		"""
+		if self.length==len(self.data):
+			self.data=np.concatenate((self.data,np.zeros(max(len(self.data),16),dtype=sequenceDtype)))
+		entry=self.data[self.length]
+		entry["opcode"]=opcode
+		stackParams=toParameterStack(opcode,params)
+		entry["params"][:len(stackParams)]=stackParams
+		entry["ch0Enabled"]=ch0Enabled&1
+		entry["ch1Enabled"]=ch1Enabled&1
+		self.length+=1
+		return
+
+	def appendSetRegisters(self,registerAddresses,registerValues,doIO_update,ch0Enabled,ch1Enabled):
+		"""
+			Appends a block of setRegister instructions at once.
+
+			:param registerAddresses: Register address (int) or array of register addresses.
+			:type registerAddresses: numpy.ndarray
+			:param registerValues: Array of register values.
+			:type registerValues: numpy.ndarray
+			:param doIO_update: Performs an IO update after every write.
+			:type doIO_update: bool
+			:param ch0Enabled: Channel 0 enabled flag.
+			:type ch0Enabled: bool
+			:param ch1Enabled: Channel 1 enabled flag.
+			:type ch1Enabled: bool
+		"""
+		n=len(registerValues)
+		if self.length+n>len(self.data):
+			self.data=np.concatenate((self.data,np.zeros(max(len(self.data),self.length+n-len(self.data)),dtype=sequenceDtype)))
+		entries=self.data[self.length:self.length+n]
+		entries["opcode"]=OP_SET_REGISTER
+		entries["params"][:,0]=registerAddresses
+		entries["params"][:,1]=registerValues
+		entries["params"][:,2]=doIO_update&1
+		entries["ch0Enabled"]=ch0Enabled&1
+		entries["ch1Enabled"]=ch1Enabled&1
+		self.length+=n
+		return
+
+	def clear(self):
+		"""
+			Removes all instructions.
+		"""
+		self.data[:self.length]=0
+		self.length=0
+		return
+
+	def instructions(self):
+		"""
+			Returns the recorded instructions (view of the structured array, no copy).
+		"""
+		return self.data[:self.length]
+
+	def copy(self):
+		"""
+			Returns a compact copy of the sequence.
+		"""
+		other=sequence_class(capacity=max(self.length,1))
+		other.data[:self.length]=self.data[:self.length]
+		other.length=self.length
+		return other
+
+	def commands(self):
+		"""
+			Returns the instructions as a list of (opcode, command parameters).
+		"""
+		return [(int(entry["opcode"]),fromParameterStack(entry["opcode"],entry["params"])) for entry in self.instructions()]
+
+	def hash(self):
+		"""
+			Returns the hash of the function stack built by this sequence (see :func:`stackHash`).
+		"""
+		instructions=self.instructions()
+		return stackHash(instructions["opcode"],instructions["params"])
+
+	def encode(self,binary=False):
+		"""
+			Encodes all instructions for a one shot upload.
+
+			:param binary: Use the binary protocol instead of the ASCII commands.
+			:type binary: bool
+			:returns: Encoded instructions.
+		"""
+		if binary:
+			encoder=encodeBinary
+		else:
+			encoder=encodeASCII
+		return "".join([encoder(opcode,params) for opcode,params in self.commands()])
+
+	def splitPages(self,pageSize=LEN_FUNCTIONSTACK):
+		"""
+			Splits the sequence into pages which fit into the function stack of the microcontroller. Pages are uploaded and run one after another, so the page breaks are placed at safe boundaries: preferably before a waitTriggerIn (the trigger restores the timing), otherwise before a resetTimer. If a page contains neither, it is split at **pageSize** and a warning is printed.
+
+			:param pageSize: Maximum number of instructions per page (Default is LEN_FUNCTIONSTACK).
+			:type pageSize: int
+			:returns: List of sequences.
+		"""
+		opcodes=self.instructions()["opcode"]
+		waitTriggerIn=np.flatnonzero(opcodes==OP_WAIT_TRIGGER_IN)
+		resetTimer=np.flatnonzero(opcodes==OP_RESET_TIMER)
+		pages=[]
+		start=0
+		while self.length-start>pageSize:
+			end=start+pageSize
+			for candidates in (waitTriggerIn,resetTimer):
+				candidates=candidates[(candidates>start)&(candidates<=end)]
+				if len(candidates):
+					end=candidates[-1]
+					break
+			else:
+				print "WARNING: no waitTriggerIn or resetTimer within %d instructions after instruction %d. Page split without timing guarantee."%(pageSize,start)
+			pages.append(sequence_class.fromArray(self.data[start:end]))
+			start=end
+		pages.append(sequence_class.fromArray(self.data[start:self.length]))
+		return pages
+
+	@classmethod
+	def fromArray(cls,instructions,copy=True):
+		"""
+			Creates a sequence from a structured array of type **sequenceDtype**.
+
+			:param instructions: Instructions.
+			:type instructions: numpy.ndarray
+			:param copy: Copies the instructions (Default is True). Otherwise the sequence is a view of **instructions** (e.g. a memory-mapped file, see :class:`sequenceLibrary_class`) and may be read-only.
+			:type copy: bool
+		"""
+		if not copy:
+			sequence=cls(capacity=0)
+			sequence.data=instructions
+			sequence.length=len(instructions)
+			return sequence
+		sequence=cls(capacity=max(len(instructions),1))
+		sequence.data[:len(instructions)]=instructions
+		sequence.length=len(instructions)
+		return sequence
@@ -0,0 +1,236 @@
+"""
+.. module:: sequenceLibrary
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+from __future__ import division
+import os
+import json
+import numpy as np
+from sequence import sequence_class,sequenceDtype
+from protocol import LEN_PARAM
+
+#Sequence library file: header | index | instruction records | metadata (offsets aligned to 8 bytes, little endian)
+LIBRARY_MAGIC="AD9958SL"
+LIBRARY_VERSION=1
+libraryHeaderDtype=np.dtype([("magic","S8"),("version","<u4"),("count","<u4"),("indexOffset","<u8"),("recordsOffset","<u8"),("numRecords","<u8"),("metadataOffset","<u8"),("metadataLength","<u8")])
+libraryIndexDtype=np.dtype([("name","S64"),("start","<u8"),("length","<u4"),("hash","<u4"),("metadataStart","<u8"),("metadataLength","<u4")])
+libraryRecordDtype=np.dtype([("opcode","u1"),("params","<u4",(LEN_PARAM,)),("ch0Enabled","u1"),("ch1Enabled","u1")]) #sequenceDtype on little endian hosts
+
+
+def _align(offset):
+	return (offset+7)&~7
+
+
+class sequenceLibrary_class(object):
+	"""
+		Library of compiled sequences stored in a single binary file. The file holds a header, an index (name, position, length, stack hash and metadata position of each sequence), the instruction records of all sequences (same layout as **sequenceDtype**) and the JSON metadata. The file is memory-mapped: opening a library with thousands of sequences only reads the index, and :func:`sequenceLibrary_class.get` returns a read-only view of the mapped records, so loading a sequence for upload neither copies the instructions nor re-runs the programming code (and :func:`AD9958_class.findOptimalRamp`).
+
+		Example::
+
+			library=sequenceLibrary_class("sequences.lib")
+			if "rabi" not in library:
+				RF.startRecording()
+				programRabi(RF)
+				library.add("rabi",RF.stopRecording(),SYS_CLK=RF.SYS_CLK)
+				library.save()
+			RF.uploadSequence(library.get("rabi"))
+
+		:param path: Path of the library file (created by :func:`sequenceLibrary_class.save` if it does not exist).
+		:type path: str
+	"""
+	def __init__(self,path):
+		self.path=path
+		self.pending={} #Sequences added since the last save: name -> (sequence, metadata)
+		self._open()
+
+	def _open(self):
+		self.buffer=None
+		self.index=np.zeros(0,dtype=libraryIndexDtype)
+		self.records=np.zeros(0,dtype=libraryRecordDtype)
+		self.metadataBuffer=np.zeros(0,dtype=np.uint8)
+		self.positions={} #name -> index row
+		self.unrecognized=False #The file is not a library of this version and must not be overwritten
+		if not os.path.exists(self.path) or os.path.getsize(self.path)==0:
+			return
+		buffer=np.memmap(self.path,dtype=np.uint8,mode="r")
+		header=None
+		if len(buffer)>=libraryHeaderDtype.itemsize:
+			header=buffer[:libraryHeaderDtype.itemsize].view(libraryHeaderDtype)[0]
+		if header is None or header["magic"]!=LIBRARY_MAGIC or header["version"]!=LIBRARY_VERSION:
+			print "ERROR: %s is not a sequence library (version %d)."%(self.path,LIBRARY_VERSION)
+			self.unrecognized=True
+			return
+		indexOffset=int(header["indexOffset"])
+		recordsOffset=int(header["recordsOffset"])
+		metadataOffset=int(header["metadataOffset"])
+		self.buffer=buffer
+		self.index=buffer[indexOffset:indexOffset+int(header["count"])*libraryIndexDtype.itemsize].view(libraryIndexDtype)
+		self.records=buffer[recordsOffset:recordsOffset+int(header["numRecords"])*libraryRecordDtype.itemsize].view(libraryRecordDtype)
+		self.metadataBuffer=buffer[metadataOffset:metadataOffset+int(header["metadataLength"])]
+		self.positions=dict((name,i) for i,name in enumerate(self.index["name"].tolist()))
+		return
+
+	def __len__(self):
+		return len(self.names())
+
+	def __contains__(self,name):
+		return name in self.pending or name in self.positions
+
+	def names(self):
+		"""
+			Returns the names of the stored and pending sequences.
+		"""
+		return sorted(set(self.positions)|set(self.pending))
+
+	def get(self,name,verify=False):
+		"""
+			Returns a stored sequence.
+
+			:param name: Sequence name.
+			:type name: str
+			:param verify: Compares the stack hash of the instructions with the stored one (Default is False).
+			:type verify: bool
+			:returns: Read-only :class:`sequence_class` view of the mapped file (no copy), or None if the sequence is unknown or corrupted.
+		"""
+		if name in self.pending:
+			return self.pending[name][0]
+		if name not in self.positions:
+			print "ERROR: sequence %s not in library %s."%(name,self.path)
+			return None
+		entry=self.index[self.positions[name]]
+		start=int(entry["start"])
+		sequence=sequence_class.fromArray(self.records[start:start+int(entry["length"])].view(sequenceDtype),copy=False)
+		if verify and sequence.hash()!=entry["hash"]:
+			print "ERROR: hash mismatch for sequence %s in library %s."%(name,self.path)
+			return None
+		return sequence
+
+	def metadata(self,name):
+		"""
+			Returns the metadata stored with a sequence (see :func:`sequenceLibrary_class.add`).
+		"""
+		if name in self.pending:
+			return dict(self.pending[name][1])
+		entry=self.index[self.positions[name]]
+		start=int(entry["metadataStart"])
+		return json.loads(self.metadataBuffer[start:start+int(entry["metadataLength"])].tobytes())
+
+	def stackHash(self,name):
+		"""
+			Returns the stored stack hash of a sequence (see :func:`sequence_class.hash`), without reading its instructions.
+		"""
+		if name in self.pending:
+			return self.pending[name][0].hash()
+		return int(self.index[self.positions[name]]["hash"])
+
+	def add(self,name,sequence,**metadata):
+		"""
+			Adds (or replaces) a sequence. The library file is only written by :func:`sequenceLibrary_class.save`.
+
+			:param name: Sequence name (at most 64 ASCII characters).
+			:type name: str
+			:param sequence: Compiled sequence (e.g. from :func:`AD9958_class.stopRecording`).
+			:type sequence: sequence_class
+			:param metadata: JSON serializable values stored with the sequence (e.g. SYS_CLK, parameters).
+		"""
+		if len(name)>libraryIndexDtype["name"].itemsize:
+			print "ERROR: sequence name longer than %d characters."%libraryIndexDtype["name"].itemsize
+			return
+		self.pending[name]=(sequence.copy(),metadata)
+		return
+
+	def save(self):
+		"""
+			Writes the stored and pending sequences into the library file (via a temporary file, so an open library is never left half written) and maps the new file. The stored sequences are copied into memory and the old file is unmapped before it is replaced.
+
+			.. note::
+				An existing file which is not a sequence library of this version (see **unrecognized**) is never replaced: save prints an error and the sequences stay pending.
+
+				On Windows a mapped file cannot be replaced: sequences returned by :func:`sequenceLibrary_class.get` have to be released (or copied, see :func:`sequence_class.copy`) before calling save. Otherwise an error is printed, the new library is left in *path*.tmp and the sequences stay pending.
+		"""
+		if self.unrecognized:
+			print "ERROR: %s is not a sequence library (version %d). The file is not overwritten."%(self.path,LIBRARY_VERSION)
+			return
+		names=self.names()
+		sequences=[self.get(name).copy() for name in names] #No view of the mapped file may survive the replacement
+		metadataBlobs=[json.dumps(self.metadata(name),sort_keys=True) for name in names]
+
+		index=np.zeros(len(names),dtype=libraryIndexDtype)
+		index["name"]=names
+		index["length"]=[len(sequence) for sequence in sequences]
+		index["start"]=np.concatenate(([0],np.cumsum(index["length"],dtype=np.uint64)[:-1])) if len(names) else []
+		index["hash"]=[sequence.hash() for sequence in sequences]
+		index["metadataLength"]=[len(blob) for blob in metadataBlobs]
+		index["metadataStart"]=np.concatenate(([0],np.cumsum(index["metadataLength"],dtype=np.uint64)[:-1])) if len(names) else []
+
+		header=np.zeros(1,dtype=libraryHeaderDtype)
+		header["magic"]=LIBRARY_MAGIC
+		header["version"]=LIBRARY_VERSION
+		header["count"]=len(names)
+		header["indexOffset"]=_align(libraryHeaderDtype.itemsize)
+		header["recordsOffset"]=_align(int(header["indexOffset"][0])+index.nbytes)
+		header["numRecords"]=int(index["length"].sum())
+		header["metadataOffset"]=_align(int(header["recordsOffset"][0])+int(header["numRecords"][0])*libraryRecordDtype.itemsize)
+		header["metadataLength"]=sum(len(blob) for blob in metadataBlobs)
+
+		temporaryPath=self.path+".tmp"
+		with open(temporaryPath,"wb") as f:
+			f.write(header.tobytes())
+			f.seek(int(header["indexOffset"][0]))
+			f.write(index.tobytes())
+			f.seek(int(header["recordsOffset"][0]))
+			for sequence in sequences:
+				f.write(sequence.instructions().astype(libraryRecordDtype).tobytes())
+			f.seek(int(header["metadataOffset"][0]))
+			f.write("".join(metadataBlobs))
+		self.close()
+		try:
+			if os.name=="nt" and os.path.exists(self.path):
+				os.remove(self.path) #os.rename does not replace files on Windows
+			os.rename(temporaryPath,self.path)
+		except OSError as error:
+			print "ERROR: library %s could not be replaced (%s). Release the sequences returned by get() and save again."%(self.path,error)
+			self._open()
+			return
+		self.pending={}
+		self._open()
+		return
+
+	def close(self):
+		"""
+			Releases all views of the mapped library file held by the library (header, index, records and metadata). The file is unmapped once the sequences returned by :func:`sequenceLibrary_class.get` are released as well.
+		"""
+		self.buffer=None
+		self.index=np.zeros(0,dtype=libraryIndexDtype)
+		self.records=np.zeros(0,dtype=libraryRecordDtype)
+		self.metadataBuffer=np.zeros(0,dtype=np.uint8)
+		self.positions={}
+		return
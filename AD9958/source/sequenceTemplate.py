@@ -0,0 +1,173 @@
+"""
+.. module:: sequenceTemplate
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+import numpy as np
+from AD9958 import AD9958_class
+from sequence import sequence_class,sequenceDtype
+
+
+def _sameValue(a,b):
+	"""
+		Compares two parameter values, which can be scalars or (lists of) NumPy arrays.
+	"""
+	if isinstance(a,np.ndarray) or isinstance(b,np.ndarray):
+		return np.array_equal(a,b)
+	try:
+		return bool(a==b)
+	except ValueError: #lists or tuples of arrays
+		return np.array_equal(a,b)
+
+
+def _storedValues(parameters):
+	"""
+		Copies the NumPy arrays among the parameter values, so arrays changed in place are detected by the next bind.
+	"""
+	return dict((name,np.copy(value) if isinstance(value,np.ndarray) else value) for name,value in parameters.items())
+
+
+class sequenceTemplate_class(object):
+	"""
+		Parametric sequence compiled once and bound per shot. The sequence is written as a list of programming steps (see :func:`sequenceTemplate_class.addStep`), each depending on a set of named parameters (frequencies, amplitudes, durations, sweep end points, ...). :func:`sequenceTemplate_class.compile` records all steps with an offline :class:`AD9958_class`; :func:`sequenceTemplate_class.bind` re-executes only the steps depending on changed parameters, starting from the driver state (register shadow, enabled channels, modulation and sweep settings) stored before each step. If a re-executed step leaves a different driver state, the following steps are re-executed as well, since they may read it (e.g. read-modify-write of registerMap).
+
+		Example::
+
+			def setup(RF):
+				RF.reset()
+				RF.setSweepMode("frequency")
+
+			def sweep(RF,lowFreq,highFreq):
+				RF.setSweepParameters(lowFreq,highFreq,10e-6,10e-6)
+
+			template=sequenceTemplate_class(25e6,20,80e6)
+			template.addStep(setup)
+			template.addStep(sweep,"lowFreq","highFreq")
+			RF.uploadSequence(template.compile(lowFreq=1e6,highFreq=10e6))
+			...
+			RF.patchSequence(template.bind(highFreq=12e6)) #only sweep() is executed
+
+		:param ref_clk: REF_CLK frequency in Hz.
+		:type ref_clk: int
+		:param PLL_multiplier: PLL multiplier for the AD9958.
+		:type PLL_multiplier: int
+		:param chipkit_clk: Clock frequency of the chipKIT timers in Hz.
+		:type chipkit_clk: int
+		:param rampCache: Ramp cache used by the steps (Default is None).
+		:type rampCache: rampCache_class
+	"""
+	def __init__(self,ref_clk,PLL_multiplier,chipkit_clk,rampCache=None):
+		self.rf=AD9958_class(None,ref_clk,PLL_multiplier,chipkit_clk,rampCache)
+		self.initialState=self._driverState()
+		self.steps=[] #[function, parameter names, state before, instructions, state after]
+		self.parameters={}
+		self.compiled=False
+		self.stepsExecuted=0 #Steps executed by the last compile/bind
+
+	def addStep(self,function,*parameterNames):
+		"""
+			Appends a programming step. The step is executed as **function(RF,**values)** with the offline AD9958 object and the values of the parameters it depends on. Steps must not call clearStack or runStack.
+
+			:param function: Programming step.
+			:type function: function
+			:param parameterNames: Names of the parameters the step depends on.
+			:type parameterNames: str
+		"""
+		self.steps.append([function,parameterNames,None,None,None])
+		self.compiled=False
+		return
+
+	def _driverState(self):
+		rf=self.rf
+		return (rf.registerShadow.snapshot(),rf.ch0Enabled,rf.ch1Enabled,rf.modulationLevel,rf.PPC,rf.sweepType)
+
+	def _setDriverState(self,state):
+		rf=self.rf
+		rf.registerShadow.restore(state[0])
+		rf.ch0Enabled,rf.ch1Enabled,rf.modulationLevel,rf.PPC,rf.sweepType=state[1:]
+		return
+
+	def _runStep(self,step,stateBefore,offset):
+		function,parameterNames=step[0],step[1]
+		self._setDriverState(stateBefore)
+		self.rf.recording=sequence_class()
+		self.rf.instructionCounter=offset
+		function(self.rf,**dict((name,self.parameters[name]) for name in parameterNames))
+		step[2]=stateBefore
+		step[3]=self.rf.recording.instructions().copy()
+		step[4]=self._driverState()
+		self.stepsExecuted+=1
+		return
+
+	def _sequence(self):
+		if not self.steps:
+			return sequence_class()
+		return sequence_class.fromArray(np.concatenate([step[3] for step in self.steps]))
+
+	def compile(self,**parameters):
+		"""
+			Executes all steps with the given parameter values.
+
+			:returns: Compiled sequence (see :class:`sequence_class`).
+		"""
+		self.parameters=_storedValues(parameters)
+		self.stepsExecuted=0
+		state=self.initialState
+		offset=0
+		for step in self.steps:
+			self._runStep(step,state,offset)
+			state=step[4]
+			offset+=len(step[3])
+		self.compiled=True
+		return self._sequence()
+
+	def bind(self,**parameters):
+		"""
+			Changes parameter values and re-executes only the steps depending on them (and the following steps, as long as the driver state differs from the compiled one). The number of executed steps is stored in **stepsExecuted**.
+
+			:returns: Compiled sequence (see :class:`sequence_class`).
+		"""
+		if not self.compiled:
+			self.parameters.update(parameters)
+			return self.compile(**self.parameters)
+		changed=set(name for name,value in parameters.items() if name not in self.parameters or not _sameValue(self.parameters[name],value))
+		self.parameters.update(_storedValues(parameters))
+		self.stepsExecuted=0
+		cascade=False
+		state=self.initialState
+		offset=0
+		for step in self.steps:
+			if cascade or state!=step[2] or changed.intersection(step[1]):
+				previousState=step[4]
+				self._runStep(step,state,offset)
+				cascade=step[4]!=previousState
+			state=step[4]
+			offset+=len(step[3])
+		return self._sequence()
@@ -0,0 +1,123 @@
+"""
+.. module:: timingAnalyzer
+
+
+"""
+###############################################################################
+# AD9958 Real time RF source Python library
+#
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+###############################################################################
+
+
+from __future__ import division
+import numpy as np
+from protocol import *
+from emulator import *
+
+segmentDtype=np.dtype([("index","i4"),("deadline","f8"),("arrival","f8"),("slack","f8"),("missed","?")])
+
+
+def instructionCyclesArray(instructions):
+	"""
+		Vectorized version of :func:`instructionCycles` for the instructions of a recorded sequence.
+
+		:param instructions: Structured array of type **sequenceDtype**.
+		:type instructions: numpy.ndarray
+		:returns: Execution time (in chipKIT clock cycles) of each instruction, excluding the waiting time.
+	"""
+	opcodes=instructions["opcode"]
+	params=instructions["params"].astype(np.int64)
+	cycles=np.full(len(opcodes),FUNCTION_CALL_CYCLES+PIN_WRITE_CYCLES,dtype=np.int64)
+
+	isSetRegister=opcodes==OP_SET_REGISTER
+	lengths=np.asarray(registerLengths)[np.clip(params[:,0],0,24)]
+	cycles[isSetRegister]=(FUNCTION_CALL_CYCLES+SET_REGISTER_CYCLES+(1+lengths)*SPI_BYTE_CYCLES+(params[:,2]!=0)*IO_UPDATE_CYCLES)[isSetRegister]
+	cycles[opcodes==OP_IO_UPDATE]=FUNCTION_CALL_CYCLES+IO_UPDATE_CYCLES
+	cycles[opcodes==OP_RESET]=instructionCycles(OP_RESET,())
+	return cycles
+
+
+def analyzeTiming(sequence,triggerTimes=None,chipkitClk=CHIPKIT_CLK,verbose=True):
+	"""
+		Static timing analysis of a recorded sequence (see :func:`AD9958_class.startRecording`). Predicts the start and end time of every instruction on the chipKIT with the timing model of :mod:`emulator` (register byte lengths, 40 MHz SPI clock, IO update pulse and 80 MHz timer) and checks every waitForTimer deadline.
+
+		A waitForTimer is missed when the instructions of its timer segment (since the previous waitForTimer, resetTimer or start) arrive after the deadline; the slack is the remaining waiting time (negative if missed).
+
+		:param sequence: Recorded sequence.
+		:type sequence: sequence_class
+		:param triggerTimes: Times (in s after runStack) of the trigger edges. By default every waitTriggerIn is assumed to be released immediately, which gives an upper bound of the slack of the following segments.
+		:type triggerTimes: list
+		:param chipkitClk: Clock of the chipKIT timers in Hz.
+		:type chipkitClk: float
+		:param verbose: Print the missed deadlines.
+		:type verbose: bool
+		:returns: (timeline, segments). **timeline** is a structured array (see **timelineDtype**, times in clock cycles) and **segments** has one entry per waitForTimer with deadline, arrival time, slack (in s) and a missed flag.
+	"""
+	instructions=sequence.instructions()
+	opcodes=instructions["opcode"].tolist()
+	params=instructions["params"][:,0].tolist()
+	cycles=instructionCyclesArray(instructions).tolist()
+	if triggerTimes is None:
+		pendingTriggers=[]
+	else:
+		pendingTriggers=[int(round(t*chipkitClk)) for t in sorted(triggerTimes)]
+
+	N=len(opcodes)
+	start=np.zeros(N,dtype=np.int64)
+	end=np.zeros(N,dtype=np.int64)
+	segments=[]
+	t=0
+	TMR4Zero=0
+	for j in range(N):
+		opcode=opcodes[j]
+		start[j]=t
+		t+=cycles[j]
+		if opcode==OP_WAIT_FOR_TIMER:
+			arrival=t-TMR4Zero
+			deadline=params[j]
+			segments.append((j,deadline/chipkitClk,arrival/chipkitClk,(deadline-arrival)/chipkitClk,arrival>deadline))
+			t=max(t,TMR4Zero+deadline)
+		elif opcode==OP_WAIT_TRIGGER_IN:
+			while pendingTriggers and pendingTriggers[0]<start[j]:
+				pendingTriggers.pop(0) #edge missed
+			if pendingTriggers:
+				t=pendingTriggers.pop(0)+cycles[j]
+		elif opcode==OP_DELAY_TIMER:
+			t+=params[j]
+		elif opcode in (OP_RESET_TIMER,OP_RESET):
+			TMR4Zero=t
+		end[j]=t
+
+	timeline=np.zeros(N,dtype=timelineDtype)
+	timeline["index"]=np.arange(N)
+	timeline["opcode"]=instructions["opcode"]
+	timeline["params"]=instructions["params"][:,:3]
+	timeline["start"]=start
+	timeline["end"]=end
+	segments=np.array(segments,dtype=segmentDtype)
+
+	if verbose:
+		for segment in segments[segments["missed"]]:
+			print "ERROR: waitForTimer at instruction %d missed its deadline of %.3e s by %.3e s."%(segment["index"],segment["deadline"],-segment["slack"])
+	return timeline,segments
@@ -0,0 +1,182 @@
+##############################################################################
+# BENCHMARK of the host side hot paths of AD9958_class. The driver writes
+# into a fake serial port (bytes are counted and discarded), so the results
+# only depend on the host computer.
+#
+#	python benchmarkDriver.py          -> compares with baseline.json
+#	python benchmarkDriver.py --save   -> stores the results as baseline.json
+#
+# The script exits with status 1 if a time exceeds its baseline by more than
+# the tolerance (Default 25%) or if the bytes per instruction increase.
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+from __future__ import division
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+sys.path.append('..') #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+BASELINE_PATH=os.path.join(os.path.dirname(os.path.abspath(__file__)),"baseline.json")
+
+
+class fakeSerial_class(object):
+	"""
+		Serial port which counts and discards the written bytes and answers every request with "OK".
+	"""
+	def __init__(self):
+		self.bytesWritten=0
+
+	def isOpen(self):
+		return True
+
+	def open(self):
+		return
+
+	def close(self):
+		return
+
+	def flushInput(self):
+		return
+
+	def readline(self):
+		return "OK\n"
+
+	def write(self,data):
+		self.bytesWritten+=len(data)
+		return len(data)
+
+
+def newDevice(binaryMode=False):
+	ser=fakeSerial_class()
+	RF=AD9958.AD9958_class(ser=ser,ref_clk=25e6,PLL_multiplier=20,chipkit_clk=80e6)
+	RF.binaryMode=binaryMode #the fake serial port does not need the binaryMode handshake
+	return RF,ser
+
+
+def bestTime(func,repeat,number):
+	"""
+		Best time per call (in s) over **repeat** runs of **number** calls.
+	"""
+	best=float("inf")
+	stdout=sys.stdout
+	sys.stdout=open(os.devnull,"w") #findOptimalRamp prints the ramp times
+	try:
+		for i in range(repeat):
+			startTime=time.time()
+			for j in range(number):
+				func()
+			best=min(best,(time.time()-startTime)/number)
+	finally:
+		sys.stdout.close()
+		sys.stdout=stdout
+	return best
+
+
+def buildStack(RF,nInstructions=1000):
+	"""
+		Builds a full function stack with the public API.
+	"""
+	RF.clearStack()
+	RF.reset()
+	RF.configureSysClock()
+	RF.setEnabledChannels(1,1)
+	RF.setModulationMode("frequency",4,0)
+	k=0
+	while RF.instructionCounter<nInstructions-8:
+		RF.waitTriggerIn()
+		RF.resetTimer()
+		RF.setFreq(k%4,1e6+k)
+		RF.setAmplitude(0,0.5)
+		RF.setPhase(k%4,90)
+		RF.setModulationRegister(k%4,(k+1)%4)
+		RF.waitForTimer(10e-6)
+		k+=1
+	RF.setTriggerOut(0)
+	return
+
+
+def runBenchmarks():
+	results={}
+
+	#findOptimalRamp for each sweep type
+	RF,ser=newDevice()
+	for rampTypeSelect,lowValue,highValue in (("frequency",1e6,10e6),("amplitude",0.1,0.9),("phase",10.,300.)):
+		results["findOptimalRamp_%s_s"%rampTypeSelect]=bestTime(lambda:RF.findOptimalRamp(rampTypeSelect,lowValue,highValue,10e-6,30e-6),5,5)
+
+	#setRegister throughput
+	RF,ser=newDevice()
+	results["setRegister_s"]=bestTime(lambda:RF.setRegister(0x04,123456789),5,2000)
+
+	#setModulationRegister
+	RF,ser=newDevice()
+	RF.setModulationMode("frequency",16,0)
+	results["setModulationRegister_s"]=bestTime(lambda:RF.setModulationRegister(5,11),5,2000)
+
+	#Full 1000 instruction stack
+	RF,ser=newDevice()
+	results["buildStack1000_s"]=bestTime(lambda:buildStack(RF),5,1)
+
+	#Bytes per instruction
+	for binaryMode,name in ((False,"ascii"),(True,"binary")):
+		RF,ser=newDevice(binaryMode)
+		bytesStart=ser.bytesWritten
+		buildStack(RF)
+		results["bytesPerInstruction_%s"%name]=(ser.bytesWritten-bytesStart)/RF.instructionCounter
+	return results
+
+
+def compare(results,baseline,tolerance):
+	"""
+		Prints the results next to the baseline and returns the names of the regressions.
+	"""
+	regressions=[]
+	for name in sorted(results):
+		value=results[name]
+		reference=baseline.get(name)
+		if reference is None:
+			print "%-32s %12.4g" %(name,value)
+			continue
+		if name.startswith("bytesPerInstruction"):
+			regression=value>reference
+		else:
+			regression=value>reference*(1+tolerance)
+		print "%-32s %12.4g %12.4g %+8.1f%% %s"%(name,value,reference,100*(value/reference-1),"REGRESSION" if regression else "")
+		if regression:
+			regressions.append(name)
+	return regressions
+
+
+if __name__=="__main__":
+	parser=argparse.ArgumentParser(description="Benchmark of the host side hot paths of AD9958_class.")
+	parser.add_argument("--save",action="store_true",help="store the results as baseline")
+	parser.add_argument("--baseline",default=BASELINE_PATH,help="baseline file (JSON)")
+	parser.add_argument("--tolerance",type=float,default=0.25,help="allowed relative slowdown")
+	args=parser.parse_args()
+
+	results=runBenchmarks()
+	if args.save:
+		with open(args.baseline,"w") as f:
+			json.dump({"machine":platform.platform(),"python":platform.python_version(),"results":results},f,indent=1,sort_keys=True)
+		compare(results,{},args.tolerance)
+		print "Baseline stored in %s."%args.baseline
+		sys.exit(0)
+
+	if not os.path.exists(args.baseline):
+		compare(results,{},args.tolerance)
+		print "No baseline found. Run with --save to store one."
+		sys.exit(0)
+	with open(args.baseline) as f:
+		baseline=json.load(f)["results"]
+	regressions=compare(results,baseline,args.tolerance)
+	if regressions:
+		print "ERROR: %d regression(s): %s"%(len(regressions),", ".join(regressions))
+		sys.exit(1)
+	print "No regressions."
@@ -40,14 +40,21 @@ uint32_t readNotWrite=0;
 unsigned int regValue;
 SerialCommand sCmd; 
 
-typedef void (*generalFunction)(uint32_t* ); //General function type that accepts an uint32_t array as input param
 generalFunction functionStack [LEN_FUNCTIONSTACK];
+uint8_t opcodeStack[LEN_FUNCTIONSTACK]; //Opcode of every instruction (see checkStackHash)
 uint32_t parameterStack[LEN_FUNCTIONSTACK][LEN_PARAM];
 int functionIndex=0;
 
 int triggerValue=0;
 int triggerValueOld=0;
 
+int binaryMode=0; //Commands are received as binary frames instead of ASCII lines
+uint8_t binaryFrame[BINARY_FRAME_MAXLEN];
+int binaryFramePos=0;
+int binaryFrameLen=0;
+
+unsigned long baudRate=BAUD_DEFAULT; //Current baud rate of the serial port (see setBaud)
+
 
 /****************************************************************************
 PINS
@@ -86,7 +93,7 @@ SETUP
 ****************************************************************************/
 void setup() {
 begin();
-Serial.begin(9600);
+Serial.begin(BAUD_DEFAULT);
 
 //Commands outside function stack
 sCmd.setDefaultHandler(unrecognized);
@@ -95,6 +102,7 @@ sCmd.addCommand("setRegister",setRegister_ConstructFS);
 sCmd.addCommand("reset",resetAD9958_ConstructFS);
 sCmd.addCommand("IO_update",IO_update_ConstructFS);
 sCmd.addCommand("setProfilePins",setProfilePins_ConstructFS);
+sCmd.addCommand("setProfileFlag",setProfileFlag_ConstructFS);
 sCmd.addCommand("setTriggerOut",setTriggerOut_ConstructFS);
 sCmd.addCommand("waitTriggerIn",waitTriggerIn_ConstructFS);
 sCmd.addCommand("delayTimer",delayTimer_ConstructFS);
@@ -104,6 +112,10 @@ sCmd.addCommand("clearStack",clearStack);
 sCmd.addCommand("runStack",runStack);
 sCmd.addCommand("checkStackFinished",checkStackFinished);
 sCmd.addCommand("checkLenStack",checkLenStack);
+sCmd.addCommand("checkStackHash",checkStackHash);
+sCmd.addCommand("patchStack",patchStack_ASCII);
+sCmd.addCommand("binaryMode",binaryModeOn);
+sCmd.addCommand("setBaud",setBaud_ASCII);
 }
 
 
@@ -113,7 +125,12 @@ sCmd.addCommand("checkLenStack",checkLenStack);
 LOOP
 ****************************************************************************/
 void loop() {
-	sCmd.readSerial();
+	if(binaryMode){
+		readBinary();
+	}
+	else{
+		sCmd.readSerial();
+	}
 	}
 
 
@@ -468,6 +485,14 @@ void waitForTimer(unsigned int clockCycles){
 }
 
 
+unsigned int profilePinsFlag(int P0Flag,int P1Flag,int P2Flag,int P3Flag){
+	return (P0Flag<<P0.PIN)|(P1Flag<<P1.PIN)|(P2Flag<<P2.PIN)|(P3Flag<<P3.PIN);
+}
+
+unsigned int profilePinsMask(void){
+	return ~((1<<P0.PIN)|(1<<P1.PIN)|(1<<P2.PIN)|(1<<P3.PIN));
+}
+
 void setProfilePins(unsigned int flag,unsigned int mask){
 	//This is a fast hack since P0,P1,P2,P3 are on the same port and this way they can be rewritten in a single instruction
 	PORTE=(PORTE&mask)|flag;
@@ -512,6 +537,21 @@ void unrecognized(const char *command) {
 Commands for constructing function stack
 **************************************************************************/
 
+void pushFunctionStack(uint8_t opcode,generalFunction function,uint32_t param0,uint32_t param1,uint32_t param2){
+	if(functionIndex>=LEN_FUNCTIONSTACK){ //stack is full, instruction is dropped (reported by checkLenStack)
+		return;
+	}
+	opcodeStack[functionIndex]=opcode;
+	functionStack[functionIndex]=function;
+	parameterStack[functionIndex][0]=param0;
+	parameterStack[functionIndex][1]=param1;
+	parameterStack[functionIndex][2]=param2;
+	
+	functionIndex++;
+	return;
+}
+
+
 void setRegister_ConstructFS(){
 	uint32_t regAddress;
 	uint32_t regValue;
@@ -525,28 +565,19 @@ void setRegister_ConstructFS(){
 	arg = sCmd.next();
 	doIO_update = strtoul(arg,NULL,0);
 	
-	functionStack[functionIndex]=setRegister_FS;
-	parameterStack[functionIndex][0]=regAddress;
-	parameterStack[functionIndex][1]=regValue;
-	parameterStack[functionIndex][2]=doIO_update;
-	
-	functionIndex++;
+	pushFunctionStack(OP_SET_REGISTER,setRegister_FS,regAddress,regValue,doIO_update);
 	return;
 }
 	
 
 void resetAD9958_ConstructFS(){
-	functionStack[functionIndex]= begin_FS;
-	
-	functionIndex++;
+	pushFunctionStack(OP_RESET,begin_FS,0,0,0);
 	return;	
 }
 
 
 void IO_update_ConstructFS(){
-	functionStack[functionIndex]=IO_update_FS;
-	
-	functionIndex++;
+	pushFunctionStack(OP_IO_UPDATE,IO_update_FS,0,0,0);
 	return;	
 }
 
@@ -567,15 +598,21 @@ void setProfilePins_ConstructFS(){
 	P3Flag=strtoul(arg,NULL,0);
 
 	
-	mask=~((1<<P0.PIN)|(1<<P1.PIN)|(1<<P2.PIN)|(1<<P3.PIN));
-	flag=(P0Flag<<P0.PIN)|(P1Flag<<P1.PIN)|(P2Flag<<P2.PIN)|(P3Flag<<P3.PIN);
+	mask=profilePinsMask();
+	flag=profilePinsFlag(P0Flag,P1Flag,P2Flag,P3Flag);
 	
 
-	functionStack[functionIndex]= setProfilePins_FS;
-	parameterStack[functionIndex][0]=flag;
-	parameterStack[functionIndex][1]=mask;
+	pushFunctionStack(OP_SET_PROFILE_PINS,setProfilePins_FS,flag,mask,0);
+	return;
+}
 
-	functionIndex++;
+void setProfileFlag_ConstructFS(){
+	//Same as setProfilePins with the PORTE flag precomputed by the host (single argument)
+	char *arg;
+	unsigned int mask;
+	arg = sCmd.next();
+	mask=profilePinsMask();
+	pushFunctionStack(OP_SET_PROFILE_PINS,setProfilePins_FS,strtoul(arg,NULL,0)&~mask,mask,0);
 	return;
 }
 
@@ -586,19 +623,14 @@ void setTriggerOut_ConstructFS(){
 	unsigned int flag;
 	arg = sCmd.next();
 	flag=strtoul(arg,NULL,0);
-	functionStack[functionIndex]= setTriggerOut_FS;
-	parameterStack[functionIndex][0]=flag;
-	
-	functionIndex++;
+	pushFunctionStack(OP_SET_TRIGGER_OUT,setTriggerOut_FS,flag,0,0);
 	return;
 }
 
 
 
 void waitTriggerIn_ConstructFS(){
-	functionStack[functionIndex]= waitTriggerIn_FS;
-	
-	functionIndex++;
+	pushFunctionStack(OP_WAIT_TRIGGER_IN,waitTriggerIn_FS,0,0,0);
 	return;
 }
 
@@ -609,18 +641,13 @@ void delayTimer_ConstructFS(){
 	arg = sCmd.next();
 	clockCycles=strtoul(arg,NULL,0);
 	
-	functionStack[functionIndex]= delayTimer_FS;
-	parameterStack[functionIndex][0]=clockCycles;
-	
-	functionIndex++;
+	pushFunctionStack(OP_DELAY_TIMER,delayTimer_FS,clockCycles,0,0);
 	return;	
 }
 
 
 void resetTimer_ConstructFS(){
-	functionStack[functionIndex]=  resetTimer_FS;
-	
-	functionIndex++;
+	pushFunctionStack(OP_RESET_TIMER,resetTimer_FS,0,0,0);
 	return;	
 }
 
@@ -631,10 +658,7 @@ void waitForTimer_ConstructFS(){
 	arg = sCmd.next();
 	clockCycles=strtoul(arg,NULL,0);
 	
-	functionStack[functionIndex]= waitForTimer_FS;
-	parameterStack[functionIndex][0]=clockCycles;
-	
-	functionIndex++;
+	pushFunctionStack(OP_WAIT_FOR_TIMER,waitForTimer_FS,clockCycles,0,0);
 	return;	
 }
 
@@ -667,6 +691,237 @@ void checkLenStack(){
 	Serial.print("Programmed instructions: "+String(functionIndex)+" (max "+String(LEN_FUNCTIONSTACK)+")\n");
 }
 
+
+
+//32 bit FNV-1a hash over opcode (1 byte) and parameters 0-2 (4 bytes, little endian) of every instruction (see stackHash() in protocol.py)
+void checkStackHash(){
+	uint32_t hash=FNV_OFFSET_BASIS;
+	for(int j=0; j<functionIndex;j++){
+		hash=(hash^opcodeStack[j])*FNV_PRIME;
+		for(int k=0; k<3;k++){
+			for(int shift=0; shift<32;shift+=8){
+				hash=(hash^((parameterStack[j][k]>>shift)&0xFF))*FNV_PRIME;
+			}
+		}
+	}
+	Serial.print("Stack hash: ");
+	Serial.print(hash);
+	Serial.print("\n");
+}
+
+
+
+//Overwrites one parameter of an instruction already on the function stack
+void patchStack(uint32_t index,uint32_t slot,uint32_t value){
+	if(index>=(uint32_t)functionIndex || slot>=LEN_PARAM){ //out of range, patch is dropped
+		return;
+	}
+	parameterStack[index][slot]=value;
+	return;
+}
+
+
+void patchStack_ASCII(){
+	uint32_t index;
+	uint32_t slot;
+	uint32_t value;
+	char *arg;
+
+	arg = sCmd.next();
+	index = strtoul(arg,NULL,0);
+	arg = sCmd.next();
+	slot = strtoul(arg,NULL,0);
+	arg = sCmd.next();
+	value = strtoul(arg,NULL,0);
+
+	patchStack(index,slot,value);
+	return;
+}
+
+/**************************************************************************
+Baud rate negotiation
+
+"setBaud X" answers OK at the current baud rate and switches the serial
+port to X. The host then sends BAUD_ECHO_TEST at the new baud rate, which
+is echoed back, and answers a valid echo with BAUD_CONFIRM. The new baud
+rate is only kept once BAUD_CONFIRM is received: without a valid echo or
+confirmation within BAUD_TIMEOUT_MS the previous baud rate is restored.
+**************************************************************************/
+
+void setBaud_ASCII(){
+	char *arg;
+	arg = sCmd.next();
+	setBaud(strtoul(arg,NULL,0));
+	return;
+}
+
+
+void setBaud(unsigned long newBaudRate){
+	char line[BAUD_ECHO_MAXLEN+1];
+
+	Serial.print("OK\n");
+	delay(BAUD_SWITCH_DELAY_MS); //"OK" is sent at the old baud rate
+	Serial.end();
+	Serial.begin(newBaudRate);
+
+	if(readBaudLine(line) && strcmp(line,BAUD_ECHO_TEST)==0){
+		Serial.print(BAUD_ECHO_TEST);
+		Serial.print("\n");
+		if(readBaudLine(line) && strcmp(line,BAUD_CONFIRM)==0){
+			baudRate=newBaudRate;
+			return;
+		}
+	}
+	Serial.end(); //echo test or confirmation failed, fall back
+	Serial.begin(baudRate);
+	return;
+}
+
+
+int readBaudLine(char *line){
+	//Reads a line of at most BAUD_ECHO_MAXLEN characters. Returns 0 if no linebreak is received within BAUD_TIMEOUT_MS.
+	int pos=0;
+	char c;
+	unsigned long startTime;
+
+	startTime=millis();
+	while(millis()-startTime<BAUD_TIMEOUT_MS){
+		if(Serial.available()>0){
+			c=Serial.read();
+			if(c=='\n'){
+				line[pos]=0;
+				return 1;
+			}
+			else if(pos<BAUD_ECHO_MAXLEN){
+				line[pos++]=c;
+			}
+		}
+	}
+	return 0;
+}
+
+/**************************************************************************
+Binary protocol
+
+Each command is a binary frame: one byte opcode followed by fixed width
+little endian operands (see OP_* in AD9958_definitions.h). Entered with
+the ASCII command "binaryMode" and left with OP_ASCII_MODE.
+**************************************************************************/
+
+void binaryModeOn(){
+	binaryMode=1;
+	binaryFramePos=0;
+	Serial.print("OK\n"); //the host waits for this answer before sending binary frames
+	return;
+}
+
+
+int binaryFrameLength(uint8_t opcode){
+	switch(opcode){
+		case OP_SET_REGISTER: return 7;
+		case OP_SET_PROFILE_PINS: return 2;
+		case OP_SET_TRIGGER_OUT: return 2;
+		case OP_DELAY_TIMER: return 5;
+		case OP_WAIT_FOR_TIMER: return 5;
+		case OP_PATCH_STACK: return 8;
+		case OP_RESET:
+		case OP_IO_UPDATE:
+		case OP_WAIT_TRIGGER_IN:
+		case OP_RESET_TIMER:
+		case OP_CLEAR_STACK:
+		case OP_RUN_STACK:
+		case OP_CHECK_STACK_FINISHED:
+		case OP_CHECK_LEN_STACK:
+		case OP_CHECK_STACK_HASH:
+		case OP_ASCII_MODE: return 1;
+		default: return 0; //unknown opcode
+	}
+}
+
+
+uint32_t readUint32LE(uint8_t *data){
+	return ((uint32_t)data[0])|((uint32_t)data[1]<<8)|((uint32_t)data[2]<<16)|((uint32_t)data[3]<<24);
+}
+
+
+void readBinary(){
+	while (Serial.available() > 0) {
+		binaryFrame[binaryFramePos++]=Serial.read();
+		if(binaryFramePos==1){
+			binaryFrameLen=binaryFrameLength(binaryFrame[0]);
+			if(binaryFrameLen==0){
+				Serial.println("ERROR! Received opcode: ");
+				Serial.println(binaryFrame[0]);
+				binaryFramePos=0;
+				continue;
+			}
+		}
+		if(binaryFramePos==binaryFrameLen){
+			executeBinaryFrame(binaryFrame);
+			binaryFramePos=0;
+			if(!binaryMode){ //remaining bytes are ASCII commands
+				return;
+			}
+		}
+	}
+	return;
+}
+
+
+void executeBinaryFrame(uint8_t *frame){
+	switch(frame[0]){
+		case OP_SET_REGISTER:
+			pushFunctionStack(OP_SET_REGISTER,setRegister_FS,frame[1],readUint32LE(&frame[2]),frame[6]);
+			break;
+		case OP_RESET:
+			pushFunctionStack(OP_RESET,begin_FS,0,0,0);
+			break;
+		case OP_IO_UPDATE:
+			pushFunctionStack(OP_IO_UPDATE,IO_update_FS,0,0,0);
+			break;
+		case OP_SET_PROFILE_PINS: //PORTE flag
+			pushFunctionStack(OP_SET_PROFILE_PINS,setProfilePins_FS,frame[1]&~profilePinsMask(),profilePinsMask(),0);
+			break;
+		case OP_SET_TRIGGER_OUT:
+			pushFunctionStack(OP_SET_TRIGGER_OUT,setTriggerOut_FS,frame[1],0,0);
+			break;
+		case OP_WAIT_TRIGGER_IN:
+			pushFunctionStack(OP_WAIT_TRIGGER_IN,waitTriggerIn_FS,0,0,0);
+			break;
+		case OP_DELAY_TIMER:
+			pushFunctionStack(OP_DELAY_TIMER,delayTimer_FS,readUint32LE(&frame[1]),0,0);
+			break;
+		case OP_RESET_TIMER:
+			pushFunctionStack(OP_RESET_TIMER,resetTimer_FS,0,0,0);
+			break;
+		case OP_WAIT_FOR_TIMER:
+			pushFunctionStack(OP_WAIT_FOR_TIMER,waitForTimer_FS,readUint32LE(&frame[1]),0,0);
+			break;
+		case OP_CLEAR_STACK:
+			clearStack();
+			break;
+		case OP_RUN_STACK:
+			runStack();
+			break;
+		case OP_CHECK_STACK_FINISHED:
+			checkStackFinished();
+			break;
+		case OP_CHECK_LEN_STACK:
+			checkLenStack();
+			break;
+		case OP_CHECK_STACK_HASH:
+			checkStackHash();
+			break;
+		case OP_PATCH_STACK:
+			patchStack(((uint32_t)frame[1])|((uint32_t)frame[2]<<8),frame[3],readUint32LE(&frame[4]));
+			break;
+		case OP_ASCII_MODE:
+			binaryMode=0;
+			break;
+	}
+	return;
+}
+
 /**************************************************************************
 Functions inside function stack
 **************************************************************************/
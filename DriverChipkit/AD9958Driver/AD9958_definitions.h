@@ -4,6 +4,47 @@
 
 
 #include <stdint.h>
+
+typedef void (*generalFunction)(uint32_t* ); //General function type that accepts an uint32_t array as input param
+
+/****************************************************************************
+BINARY PROTOCOL OPCODES (see AD9958/source/protocol.py)
+****************************************************************************/
+//Function stack
+#define OP_SET_REGISTER 0x01
+#define OP_RESET 0x02
+#define OP_IO_UPDATE 0x03
+#define OP_SET_PROFILE_PINS 0x04
+#define OP_SET_TRIGGER_OUT 0x05
+#define OP_WAIT_TRIGGER_IN 0x06
+#define OP_DELAY_TIMER 0x07
+#define OP_RESET_TIMER 0x08
+#define OP_WAIT_FOR_TIMER 0x09
+//Control
+#define OP_CLEAR_STACK 0x20
+#define OP_RUN_STACK 0x21
+#define OP_CHECK_STACK_FINISHED 0x22
+#define OP_CHECK_LEN_STACK 0x23
+#define OP_ASCII_MODE 0x24
+#define OP_CHECK_STACK_HASH 0x25
+#define OP_PATCH_STACK 0x26
+
+#define BINARY_FRAME_MAXLEN 8
+
+/****************************************************************************
+BAUD RATE NEGOTIATION (see AD9958/source/protocol.py)
+****************************************************************************/
+#define BAUD_DEFAULT 9600
+#define BAUD_ECHO_TEST "echo UUUUUUUUUUUUUUUU0123456789ABCDEF"
+#define BAUD_CONFIRM "confirm"
+#define BAUD_ECHO_MAXLEN 64
+#define BAUD_SWITCH_DELAY_MS 10
+#define BAUD_TIMEOUT_MS 1000
+
+//32 bit FNV-1a hash of the function stack
+#define FNV_OFFSET_BASIS 2166136261UL
+#define FNV_PRIME 16777619UL
+
 struct registerStruct{
 	uint32_t len; //length in bytes
 	uint32_t value; //register value
@@ -56,6 +97,8 @@ void startTimerService(void);
 void delayTimer(unsigned int clockCycles);
 void resetTimer(void);
 void waitForTimer(unsigned int clockCycles);
+unsigned int profilePinsFlag(int P0Flag,int P1Flag,int P2Flag,int P3Flag);
+unsigned int profilePinsMask(void);
 void setProfilePins(unsigned int flag, unsigned int mask);
 void waitForTriggerIn(void);
 int fastDigitalRead(PIN pin);
@@ -68,10 +111,12 @@ void unrecognized(const char *command);
 /**************************************************************************
 Commands for constructing function stack
 **************************************************************************/
+void pushFunctionStack(uint8_t opcode,generalFunction function,uint32_t param0,uint32_t param1,uint32_t param2);
 void setRegister_ConstructFS();
 void resetAD9958_ConstructFS();
 void IO_update_ConstructFS();
 void setProfilePins_ConstructFS();
+void setProfileFlag_ConstructFS();
 void setTriggerOut_ConstructFS();
 void waitTriggerIn_ConstructFS();
 void delayTimer_ConstructFS();
@@ -81,6 +126,25 @@ void clearStack();
 void runStack();
 void checkStackFinished();
 void checkLenStack();
+void checkStackHash();
+void patchStack(uint32_t index,uint32_t slot,uint32_t value);
+void patchStack_ASCII();
+
+/**************************************************************************
+Baud rate negotiation
+**************************************************************************/
+void setBaud_ASCII();
+void setBaud(unsigned long newBaudRate);
+int readBaudLine(char *line);
+
+/**************************************************************************
+Binary protocol
+**************************************************************************/
+void binaryModeOn();
+int binaryFrameLength(uint8_t opcode);
+uint32_t readUint32LE(uint8_t *data);
+void readBinary();
+void executeBinaryFrame(uint8_t *frame);
 
 /**************************************************************************
 Functions inside function stack
@@ -17,7 +17,6 @@
 
 from __future__ import division
 import serial
-import time
 import sys
 sys.path.append('..') #Makes AD9958 libray (sitting inside the parent folder) available
 import AD9958
@@ -35,7 +34,6 @@ try:
 except NameError:
 	serRF=serial.Serial(RF_COM_PORT, 9600, timeout=0.2)
 	print "Starting RF serial port."
-	time.sleep(5) #Waiting for microcontroller to start
 
 
 ##################################################
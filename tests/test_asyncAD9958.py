@@ -0,0 +1,180 @@
+##############################################################################
+# TESTS of the non-blocking driver (AsyncAD9958_class). Requires trollius.
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import time
+import unittest
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+try:
+	import trollius as asyncio
+	from trollius import From,Return
+except ImportError:
+	asyncio=None
+
+
+class delayedSerial_class(object):
+	"""
+		Serial port of a microcontroller which is booting for **bootTime** s and then answers the queued requests one after another (**processTime** s each).
+	"""
+	def __init__(self,bootTime=0.,processTime=0.02):
+		self.busyUntil=time.time()+bootTime
+		self.processTime=processTime
+		self.answers=[] #(time, line)
+		self.received=""
+
+	def _receive(self):
+		now=time.time()
+		while self.answers and self.answers[0][0]<=now:
+			self.received+=self.answers.pop(0)[1]
+
+	def flushInput(self):
+		self._receive()
+		self.received=""
+
+	def write(self,data):
+		for command in data.splitlines():
+			if command.startswith("checkStackFinished"):
+				line="OK\n"
+			elif command.startswith("checkLenStack"):
+				line="Programmed instructions: 0 (max 1000)\n"
+			else:
+				continue
+			self.busyUntil=max(time.time(),self.busyUntil)+self.processTime
+			self.answers.append((self.busyUntil,line))
+		return len(data)
+
+	def inWaiting(self):
+		self._receive()
+		return len(self.received)
+
+	def read(self,size=1):
+		data=self.received[:size]
+		self.received=self.received[size:]
+		return data
+
+
+class slowSerial_class(AD9958.AD9958Emulator_class):
+	"""
+		Emulator whose output buffer drains at **bytesPerSecond**. Records out_waiting and the size of every write.
+	"""
+	def __init__(self,bytesPerSecond):
+		AD9958.AD9958Emulator_class.__init__(self)
+		self.bytesPerSecond=bytesPerSecond
+		self.queued=0.
+		self.queuedTime=time.time()
+		self.writes=[] #(out_waiting, bytes)
+
+	@property
+	def out_waiting(self):
+		now=time.time()
+		self.queued=max(self.queued-(now-self.queuedTime)*self.bytesPerSecond,0)
+		self.queuedTime=now
+		return int(self.queued)
+
+	def write(self,data):
+		self.writes.append((self.out_waiting,len(data)))
+		self.queued+=len(data)
+		return AD9958.AD9958Emulator_class.write(self,data)
+
+
+def buildSequence(RF):
+	RF.setFreq(0,1e6)
+	RF.setPhase(1,90.)
+	RF.setAmplitude(0,0.5)
+	RF.waitForTimer(1e-6)
+	RF.setFreqArray(0,[2e6,3e6,4e6])
+	RF.setFreq(1,5e6)
+
+
+@unittest.skipIf(asyncio is None,"trollius is not installed")
+class asyncAD9958Test(unittest.TestCase):
+
+	def setUp(self):
+		self.loop=asyncio.new_event_loop()
+
+	def tearDown(self):
+		self.loop.close()
+
+	def runCoroutine(self,coroutine):
+		return self.loop.run_until_complete(coroutine)
+
+	def test_emulator(self):
+		for binaryMode in (False,True):
+			emulator=AD9958.AD9958Emulator_class()
+			RF=AD9958.AsyncAD9958_class(emulator,25e6,20,80e6,loop=self.loop)
+			recorder=RF.record()
+			buildSequence(recorder)
+			sequence=recorder.stopRecording()
+
+			@asyncio.coroutine
+			def session():
+				ready=yield From(RF.connect(1.))
+				self.assertTrue(ready)
+				binary=yield From(RF.setBinaryMode(binaryMode))
+				self.assertTrue(binary)
+				yield From(RF.uploadSequence(sequence))
+				lenStack=yield From(RF.getLenStack())
+				self.assertEqual(lenStack,len(sequence))
+				finished=yield From(RF.runSequence(sequence,1.))
+				raise Return(finished)
+			self.assertTrue(self.runCoroutine(session()))
+			self.assertEqual(RF.pageSizes,[len(sequence)])
+
+			reference=AD9958.AD9958Emulator_class()
+			RFReference=AD9958.AD9958_class(reference,25e6,20,80e6)
+			RFReference.setBinaryMode(binaryMode)
+			RFReference.runSequence(sequence)
+			self.assertEqual(emulator.functionStack,reference.functionStack)
+			self.assertEqual(emulator.parameterStack,reference.parameterStack)
+			self.assertEqual(emulator.activeRegisters,reference.activeRegisters)
+
+	def test_lateConnectAnswers(self):
+		RF=AD9958.AsyncAD9958_class(delayedSerial_class(bootTime=0.3),25e6,20,80e6,loop=self.loop)
+		self.assertTrue(self.runCoroutine(RF.connect(2.)))
+		self.assertEqual(self.runCoroutine(RF.getLenStack()),0)
+		self.assertEqual(self.runCoroutine(RF.getLenStack()),0)
+
+	def test_lateAnswerAfterTimeout(self):
+		RF=AD9958.AsyncAD9958_class(delayedSerial_class(processTime=0.1),25e6,20,80e6,loop=self.loop)
+		self.assertFalse(self.runCoroutine(RF.waitStackFinished(0.02)))
+		self.assertEqual(self.runCoroutine(RF.getLenStack()),0)
+		self.assertEqual(RF.pendingAnswers,0)
+
+	def test_uploadDoesNotBlock(self):
+		emulator=slowSerial_class(20000)
+		RF=AD9958.AsyncAD9958_class(emulator,25e6,20,80e6,loop=self.loop)
+		recorder=RF.record()
+		recorder.setFreqArray(0,np.linspace(1e6,2e6,300))
+		sequence=recorder.stopRecording()
+		ticks=[]
+
+		@asyncio.coroutine
+		def ticker(upload):
+			while not upload.done():
+				ticks.append(time.time())
+				yield From(asyncio.sleep(0.005,loop=self.loop))
+
+		@asyncio.coroutine
+		def session():
+			upload=asyncio.async(RF.uploadSequence(sequence,chunkSize=128),loop=self.loop)
+			yield From(ticker(upload))
+			yield From(upload)
+			lenStack=yield From(RF.getLenStack())
+			raise Return(lenStack)
+		self.assertEqual(self.runCoroutine(session()),len(sequence))
+		self.assertTrue(all(outWaiting==0 and n<=128 for outWaiting,n in emulator.writes[:-1])) #the last write is the checkLenStack request
+		self.assertGreater(len(ticks),10)
+		self.assertLess(max(np.diff(ticks)),0.05)
+
+
+if __name__=='__main__':
+	unittest.main()
@@ -0,0 +1,85 @@
+##############################################################################
+# TESTS of the baud rate negotiation (AD9958_class.setBaudRate).
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import unittest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+class lostEchoEmulator_class(AD9958.AD9958Emulator_class):
+	"""
+		The echo reaches the host garbled.
+	"""
+	def readline(self):
+		line=AD9958.AD9958Emulator_class.readline(self)
+		if line==AD9958.BAUD_ECHO_TEST+"\n":
+			return "echo UU\xff\n"
+		return line
+
+
+class lostConfirmEmulator_class(AD9958.AD9958Emulator_class):
+	"""
+		The confirmation reaches the microcontroller garbled.
+	"""
+	def write(self,data):
+		if data==AD9958.BAUD_CONFIRM+"\n":
+			data="conf\xffrm\n"
+		return AD9958.AD9958Emulator_class.write(self,data)
+
+
+class lostCheckEmulator_class(AD9958.AD9958Emulator_class):
+	"""
+		The answer to the first request after the confirmation is lost.
+	"""
+	def __init__(self):
+		AD9958.AD9958Emulator_class.__init__(self)
+		self.dropAnswer=False
+
+	def write(self,data):
+		if data==AD9958.BAUD_CONFIRM+"\n":
+			self.dropAnswer=True
+		return AD9958.AD9958Emulator_class.write(self,data)
+
+	def readline(self):
+		line=AD9958.AD9958Emulator_class.readline(self)
+		if self.dropAnswer and line:
+			self.dropAnswer=False
+			return ""
+		return line
+
+
+class baudRateTest(unittest.TestCase):
+
+	def negotiate(self,emulator,expected):
+		RF=AD9958.AD9958_class(emulator,25e6,20,80e6)
+		self.assertEqual(RF.setBaudRate(115200),expected)
+		self.assertEqual(emulator.baudrate,emulator.firmwareBaudRate)
+		self.assertEqual(emulator.baudrate,115200 if expected else AD9958.BAUD_DEFAULT)
+		self.assertEqual(RF.getLenStack(),0)
+
+	def test_success(self):
+		self.negotiate(AD9958.AD9958Emulator_class(),True)
+
+	def test_echoFails(self):
+		self.negotiate(AD9958.AD9958Emulator_class(maxBaudRate=57600),False)
+
+	def test_lostEcho(self):
+		self.negotiate(lostEchoEmulator_class(),False)
+
+	def test_lostConfirm(self):
+		self.negotiate(lostConfirmEmulator_class(),False)
+
+	def test_lostCheck(self):
+		self.negotiate(lostCheckEmulator_class(),True)
+
+
+if __name__=="__main__":
+	unittest.main()
@@ -0,0 +1,68 @@
+##############################################################################
+# TESTS of AD9958_class.setChannelWords against the per word setters.
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+def newDevice(modulationTypeSelect):
+	emulator=AD9958.AD9958Emulator_class()
+	RF=AD9958.AD9958_class(emulator,25e6,20,80e6)
+	RF.clearStack()
+	RF.reset()
+	RF.configureSysClock()
+	RF.setEnabledChannels(1,1)
+	RF.setModulationMode(modulationTypeSelect,16,0)
+	return emulator,RF
+
+
+class channelWordsTest(unittest.TestCase):
+
+	def compareWithSetters(self,modulationTypeSelect,setter,ch0Values,ch1Values):
+		emulator,RF=newDevice(modulationTypeSelect)
+		RF.setChannelWords(modulationTypeSelect,ch0Values,ch1Values)
+		RF.runStack()
+
+		reference,RFReference=newDevice(modulationTypeSelect)
+		RFReference.setEnabledChannels(1,0)
+		for channelId,value in enumerate(ch0Values):
+			getattr(RFReference,setter)(channelId,value)
+		RFReference.setEnabledChannels(0,1)
+		for channelId,value in enumerate(ch1Values):
+			getattr(RFReference,setter)(channelId,value)
+		RFReference.setEnabledChannels(1,1)
+		RFReference.runStack()
+
+		self.assertEqual(emulator.activeRegisters,reference.activeRegisters)
+		self.assertEqual(RF.registerMap0,RFReference.registerMap0)
+		self.assertEqual(RF.registerMap1,RFReference.registerMap1)
+
+	def test_frequency(self):
+		self.compareWithSetters("frequency","setFreq",np.linspace(1e6,16e6,16),np.linspace(2e6,17e6,16))
+
+	def test_phase(self):
+		self.compareWithSetters("phase","setPhase",np.linspace(90,300,16),np.linspace(10,200,16))
+
+	def test_phaseWord0(self):
+		emulator,RF=newDevice("phase")
+		RF.startRecording()
+		RF.setChannelWords("phase",[90.])
+		commands=RF.stopRecording().commands()
+		self.assertIn((AD9958.OP_SET_REGISTER,(0x05,4096,0)),commands) #IO update with the CSR write restoring the channels
+
+	def test_amplitude(self):
+		self.compareWithSetters("amplitude","setAmplitude",np.linspace(0.1,1,16),np.linspace(0,0.5,8))
+
+
+if __name__=="__main__":
+	unittest.main()
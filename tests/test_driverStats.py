@@ -0,0 +1,52 @@
+##############################################################################
+# TESTS of the driver statistics (AD9958_class.stats).
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+class driverStatsTest(unittest.TestCase):
+
+	def newDriver(self,binaryMode):
+		RF=AD9958.AD9958_class(AD9958.AD9958Emulator_class(),25e6,20,80e6)
+		RF.setBinaryMode(binaryMode)
+		RF.stats.reset()
+		return RF
+
+	def test_registerArray(self):
+		values=np.arange(16)
+		for binaryMode in (False,True):
+			RF=self.newDriver(binaryMode)
+			RF.setRegisterArray(0x0B,values)
+			RF.flush()
+
+			reference=self.newDriver(binaryMode)
+			for value in values.tolist():
+				reference.setRegister(0x0B,value)
+			reference.flush()
+
+			opcode=AD9958.OP_SET_REGISTER
+			self.assertEqual(RF.stats.opcodeCalls.get(opcode),len(values))
+			self.assertEqual(RF.stats.opcodeCalls.get(opcode),reference.stats.opcodeCalls.get(opcode))
+			self.assertEqual(RF.stats.bytesWritten,reference.stats.bytesWritten)
+
+	def test_recordedRegisterArray(self):
+		RF=self.newDriver(True)
+		RF.startRecording()
+		RF.setRegisterArray(0x0B,np.arange(5))
+		RF.stopRecording()
+		self.assertEqual(RF.stats.opcodeCalls.get(AD9958.OP_SET_REGISTER),5)
+
+
+if __name__=='__main__':
+	unittest.main()
@@ -0,0 +1,48 @@
+##############################################################################
+# TESTS of the lazy upload mode (AD9958_class.setLazyUpload).
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+class lazyUploadTest(unittest.TestCase):
+
+	def buildStack(self,RF):
+		RF.clearStack()
+		RF.reset()
+		RF.setFreqArray(0,[1e6,2e6,3e6])
+		RF.setPhaseArray(1,[10.,20.])
+		RF.setAmplitudeArray(0,[0.5,0.25])
+		RF.setRegisterArray(0x0B,np.arange(4))
+		RF.waitForTimer(1e-6)
+
+	def test_arraySetters(self):
+		emulator=AD9958.AD9958Emulator_class()
+		RF=AD9958.AD9958_class(emulator,25e6,20,80e6)
+		RF.setLazyUpload(True)
+		self.buildStack(RF)
+		RF.runStack()
+
+		reference=AD9958.AD9958Emulator_class()
+		RFReference=AD9958.AD9958_class(reference,25e6,20,80e6)
+		self.buildStack(RFReference)
+		RFReference.runStack()
+
+		self.assertEqual(emulator.functionIndex,RF.instructionCounter)
+		self.assertEqual(emulator.functionStack,reference.functionStack)
+		self.assertEqual(emulator.parameterStack,reference.parameterStack)
+		self.assertEqual(emulator.activeRegisters,reference.activeRegisters)
+
+
+if __name__=="__main__":
+	unittest.main()
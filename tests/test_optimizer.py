@@ -0,0 +1,70 @@
+##############################################################################
+# TESTS of optimizeSequence: optimized and original sequences must leave the
+# emulated AD9958 in the same state.
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import random
+import sys
+import unittest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+def randomSequence(rng,withReset):
+	RF=AD9958.AD9958_class(None,25e6,20,80e6)
+	RF.startRecording()
+	RF.reset()
+	for k in range(rng.randint(5,60)):
+		action=rng.random()
+		if withReset and action<0.08:
+			RF.reset()
+		elif action<0.25:
+			RF.setEnabledChannels(rng.randint(0,1),rng.randint(0,1),rng.randint(0,1))
+		elif action<0.65:
+			RF.setRegister(rng.choice((0x01,0x03,0x04,0x05,0x06,0x0A)),rng.choice((0,1,2,0x300,0x302,0x13FF)),rng.randint(0,1))
+		elif action<0.75:
+			RF.IO_update()
+		elif action<0.85:
+			RF.setFreq(rng.randint(0,1),rng.choice((1e6,2e6)))
+		else:
+			RF.waitForTimer(1e-6*k)
+	return RF.stopRecording()
+
+
+def runOnEmulator(sequence):
+	emulator=AD9958.AD9958Emulator_class()
+	RF=AD9958.AD9958_class(emulator,25e6,20,80e6)
+	RF.uploadSequence(sequence)
+	RF.runStack()
+	return emulator
+
+
+class optimizerTest(unittest.TestCase):
+
+	def checkEquivalence(self,withReset):
+		rng=random.Random(1234)
+		for trial in range(300):
+			sequence=randomSequence(rng,withReset)
+			optimized,report=AD9958.optimizeSequence(sequence)
+			self.assertLessEqual(len(optimized),len(sequence))
+			original=runOnEmulator(sequence)
+			result=runOnEmulator(optimized)
+			self.assertEqual(original.channelRegisters,result.channelRegisters,"trial %d"%trial)
+			#The CSR takes effect without IO update, its value transferred by the last IO update is irrelevant
+			self.assertEqual([registers[1:] for registers in original.activeRegisters],[registers[1:] for registers in result.activeRegisters],"trial %d"%trial)
+
+	def test_equivalence(self):
+		self.checkEquivalence(False)
+
+	def test_equivalenceWithReset(self):
+		self.checkEquivalence(True)
+
+
+if __name__=="__main__":
+	unittest.main()
@@ -0,0 +1,93 @@
+##############################################################################
+# TESTS of the persistent ramp cache (rampCache_class).
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from multiprocessing.pool import ThreadPool
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+class rampCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder=tempfile.mkdtemp()
+		self.cache=AD9958.rampCache_class(os.path.join(self.folder,"ramps.db"),maxEntries=1000)
+
+	def tearDown(self):
+		self.cache.close()
+		shutil.rmtree(self.folder)
+
+	def test_sharedBetweenThreads(self):
+		numThreads=8
+		numRamps=200
+		def worker(n):
+			for i in range(numRamps):
+				key=("freq",float(i),float(i+1),1e-3,1e-3,500e6)
+				if self.cache.get(*key) is None:
+					self.cache.put(*(key+([i,i+1,i+2,i+3],)))
+			return n
+		pool=ThreadPool(numThreads)
+		try:
+			pool.map(worker,range(numThreads))
+		finally:
+			pool.close()
+			pool.join()
+
+		self.assertEqual(self.cache.numEntries,numRamps)
+		self.assertEqual(self.cache.hits+self.cache.misses,numThreads*numRamps)
+		for i in range(numRamps):
+			self.assertEqual(list(self.cache.get("freq",float(i),float(i+1),1e-3,1e-3,500e6)),[i,i+1,i+2,i+3])
+
+
+	def key(self,i):
+		return ("freq",float(i),float(i+1),1e-3,1e-3,500e6)
+
+	def test_hitsAreWrittenLater(self):
+		self.cache.put(*(self.key(0)+([1,2,3,4],)))
+		changes=self.cache.connection.total_changes
+		for i in range(10):
+			self.assertEqual(list(self.cache.get(*self.key(0))),[1,2,3,4])
+		self.assertEqual(self.cache.connection.total_changes,changes)
+		self.cache.flush()
+		self.assertEqual(self.cache.connection.total_changes,changes+1)
+
+	def test_leastRecentlyUsedIsEvicted(self):
+		self.cache.maxEntries=10
+		for i in range(10):
+			self.cache.put(*(self.key(i)+([i,0,0,0],)))
+		self.assertIsNotNone(self.cache.get(*self.key(0)))
+		self.cache.put(*(self.key(10)+([10,0,0,0],)))
+		self.assertIsNotNone(self.cache.get(*self.key(0)))
+		self.assertIsNone(self.cache.get(*self.key(1)))
+		self.assertEqual(self.cache.numEntries,10)
+
+	def test_sharedBetweenProcesses(self):
+		self.cache.maxEntries=10
+		other=AD9958.rampCache_class(self.cache.path,maxEntries=10)
+		try:
+			for i in range(6):
+				self.cache.put(*(self.key(i)+([i,0,0,0],)))
+			self.assertIsNotNone(other.get(*self.key(0))) #most recently used
+			for i in range(6,12):
+				other.put(*(self.key(i)+([i,0,0,0],)))
+			self.assertEqual(other.numEntries,10)
+			self.assertEqual(self.cache.connection.execute("SELECT COUNT(*) FROM ramps").fetchone()[0],10)
+			self.assertIsNotNone(self.cache.get(*self.key(0)))
+			self.assertIsNone(self.cache.get(*self.key(1)))
+			self.assertIsNone(self.cache.get(*self.key(2)))
+			self.assertIsNotNone(self.cache.get(*self.key(3)))
+		finally:
+			other.close()
+
+if __name__=='__main__':
+	unittest.main()
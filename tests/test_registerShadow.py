@@ -0,0 +1,37 @@
+##############################################################################
+# TESTS of registerShadow_class through the register map of AD9958_class.
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import unittest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+class registerShadowTest(unittest.TestCase):
+
+	def test_commonRegisterWithoutEnabledChannels(self):
+		RF=AD9958.AD9958_class(None,25e6,20,80e6)
+		RF.startRecording()
+		RF.setEnabledChannels(1,1)
+		RF.setEnabledChannels(0,0)
+		RF.configureSysClock()
+		FR1=RF.registerMap[0x01]
+		self.assertEqual(FR1,RF.registerMap0[0x01])
+		self.assertEqual(FR1,(1<<23)+(20<<18)) #VCO gain and PLL multiplier
+
+		RF.setEnabledChannels(1,0)
+		RF.setModulationMode("frequency",4,0)
+		commands=RF.stopRecording().commands()
+		FR1Writes=[params[1] for opcode,params in commands if opcode==AD9958.OP_SET_REGISTER and params[0]==0x01]
+		self.assertEqual(FR1Writes[-1]&(0x1F<<18),20<<18) #PLL multiplier kept by the read-modify-write
+
+
+if __name__=="__main__":
+	unittest.main()
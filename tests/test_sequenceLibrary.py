@@ -0,0 +1,89 @@
+##############################################################################
+# TESTS of sequenceLibrary_class.
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import weakref
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+def recordSequence(k):
+	RF=AD9958.AD9958_class(None,25e6,20,80e6)
+	RF.startRecording()
+	RF.reset()
+	RF.setFreq(0,1e6*(k+1))
+	RF.waitForTimer(1e-6*k)
+	return RF.stopRecording()
+
+
+class sequenceLibraryTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory=tempfile.mkdtemp()
+		self.path=os.path.join(self.directory,"sequences.lib")
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_roundTrip(self):
+		library=AD9958.sequenceLibrary_class(self.path)
+		for k in range(10):
+			library.add("seq%d"%k,recordSequence(k),k=k)
+		library.save()
+
+		library=AD9958.sequenceLibrary_class(self.path)
+		self.assertEqual(len(library),10)
+		sequence=library.get("seq3",verify=True)
+		self.assertTrue(np.array_equal(sequence.instructions(),recordSequence(3).instructions()))
+		self.assertFalse(sequence.data.flags.writeable)
+		self.assertEqual(library.metadata("seq3"),{"k":3})
+		self.assertEqual(library.stackHash("seq3"),recordSequence(3).hash())
+
+	def test_saveReleasesMapping(self):
+		library=AD9958.sequenceLibrary_class(self.path)
+		library.add("a",recordSequence(1))
+		library.save()
+		oldBuffer=weakref.ref(library.buffer)
+		rename=os.rename
+		mappedAtRename=[]
+		def checkedRename(source,destination):
+			mappedAtRename.append(oldBuffer() is not None) #A mapped file cannot be replaced on Windows
+			rename(source,destination)
+		library.add("b",recordSequence(2))
+		os.rename=checkedRename
+		try:
+			library.save()
+		finally:
+			os.rename=rename
+		self.assertEqual(mappedAtRename,[False])
+		self.assertEqual(library.names(),["a","b"])
+		self.assertEqual(library.pending,{})
+		self.assertTrue(np.array_equal(library.get("a").instructions(),recordSequence(1).instructions()))
+
+
+	def test_foreignFileIsNotOverwritten(self):
+		for content in ("some other data\n","AD9958SL"+"\x02\x00\x00\x00"+"\x00"*52):
+			with open(self.path,"wb") as f:
+				f.write(content)
+			library=AD9958.sequenceLibrary_class(self.path)
+			self.assertTrue(library.unrecognized)
+			library.add("a",recordSequence(0))
+			library.save()
+			with open(self.path,"rb") as f:
+				self.assertEqual(f.read(),content)
+			self.assertIn("a",library.pending)
+			self.assertFalse(os.path.exists(self.path+".tmp"))
+
+if __name__=="__main__":
+	unittest.main()
@@ -0,0 +1,64 @@
+##############################################################################
+# TESTS of the parametric sequences (sequenceTemplate_class).
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+def setup(RF):
+	RF.reset()
+
+def freqList(RF,freqs):
+	RF.setFreqArray(0,freqs)
+
+def amplitude(RF,amp):
+	RF.setAmplitude(1,amp)
+
+
+class sequenceTemplateTest(unittest.TestCase):
+
+	def newTemplate(self):
+		template=AD9958.sequenceTemplate_class(25e6,20,80e6)
+		template.addStep(setup)
+		template.addStep(freqList,"freqs")
+		template.addStep(amplitude,"amp")
+		return template
+
+	def reference(self,**parameters):
+		RF=AD9958.AD9958_class(None,25e6,20,80e6)
+		setup(RF)
+		freqList(RF,parameters["freqs"])
+		amplitude(RF,parameters["amp"])
+		return RF.stopRecording()
+
+	def test_arrayParameters(self):
+		template=self.newTemplate()
+		freqs=np.array([1e6,2e6,3e6])
+		template.compile(freqs=freqs,amp=0.5)
+
+		sequence=template.bind(amp=0.25)
+		self.assertEqual(template.stepsExecuted,1)
+		self.assertEqual(sequence.commands(),self.reference(freqs=freqs,amp=0.25).commands())
+
+		freqs[1]=5e6 #changed in place
+		sequence=template.bind(freqs=freqs)
+		self.assertEqual(template.stepsExecuted,1)
+		self.assertEqual(sequence.commands(),self.reference(freqs=freqs,amp=0.25).commands())
+
+		sequence=template.bind(freqs=[1e6,3e6])
+		self.assertEqual(template.stepsExecuted,1)
+		self.assertEqual(sequence.commands(),self.reference(freqs=[1e6,3e6],amp=0.25).commands())
+
+
+if __name__=="__main__":
+	unittest.main()
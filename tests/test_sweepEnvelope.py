@@ -0,0 +1,51 @@
+##############################################################################
+# TESTS of the sweep envelopes (AD9958_class.setSweepEnvelope).
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+class sweepEnvelopeTest(unittest.TestCase):
+
+	def test_unsolvableSegmentIsSkipped(self):
+		RF=AD9958.AD9958_class(None,25e6,20,80e6)
+		findOptimalRampArray=RF.findOptimalRampArray
+		def failSecondSegment(*args):
+			ramps=findOptimalRampArray(*args)
+			ramps[1]=0
+			return ramps
+		RF.findOptimalRampArray=failSecondSegment
+
+		times=np.linspace(0,300e-6,4)
+		report=RF.setSweepEnvelope("frequency",times,[1e6,2e6,1e6,3e6],1e3)
+		self.assertEqual(report["segments"],3)
+		self.assertEqual(report["skippedSegments"],[1])
+		self.assertGreater(report["maxError"],0.5e6)
+
+		commands=RF.stopRecording().commands()
+		rampRates=[params[1] for opcode,params in commands if opcode==AD9958.OP_SET_REGISTER and params[0]==0x07]
+		self.assertEqual(len(rampRates),2)
+		self.assertTrue(all(rampRates))
+		waits=[params for opcode,params in commands if opcode==AD9958.OP_WAIT_FOR_TIMER]
+		self.assertEqual(len(waits),2)
+
+	def test_report(self):
+		RF=AD9958.AD9958_class(None,25e6,20,80e6)
+		times=np.linspace(0,300e-6,4)
+		report=RF.setSweepEnvelope("frequency",times,[1e6,2e6,1e6,3e6],1e3)
+		self.assertEqual(report["skippedSegments"],[])
+		self.assertLess(report["maxError"],1e3)
+
+
+if __name__=="__main__":
+	unittest.main()
@@ -0,0 +1,87 @@
+##############################################################################
+# TESTS of the readiness handshake (AD9958_class.waitReady).
+#
+#	python -m unittest discover -s tests
+#-----------------------------------------------------------------------------
+# MIT License
+# Copyright (c) 2019 DSPsandbox (Pau Gomez pau.gomez@dspsandbox.org)
+##############################################################################
+
+import os
+import sys
+import time
+import unittest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')) #Makes AD9958 libray (sitting inside the parent folder) available
+import AD9958
+
+
+class bootingSerial_class(object):
+	"""
+		Serial port of a microcontroller which is booting for **bootTime** s after the port is opened and then answers the queued requests one after another (**processTime** s each). An open port with **busyTime** set belongs to a microcontroller executing a function stack, which does not answer within **busyTime** s.
+	"""
+	def __init__(self,bootTime=0.3,processTime=0.02,timeout=0.05,busyTime=None):
+		self.bootTime=bootTime
+		self.processTime=processTime
+		self.timeout=timeout
+		self.answers=[] #(time, line)
+		self.opened=busyTime is not None
+		if self.opened:
+			self.busyUntil=time.time()+busyTime
+
+	def isOpen(self):
+		return self.opened
+
+	def open(self):
+		self.opened=True
+		self.busyUntil=time.time()+self.bootTime
+		self.answers=[]
+
+	def close(self):
+		self.opened=False
+
+	def flush(self):
+		return
+
+	def flushInput(self):
+		now=time.time()
+		self.answers=[answer for answer in self.answers if answer[0]>now]
+
+	def write(self,data):
+		for command in data.splitlines():
+			if command.startswith("checkStackFinished"):
+				line="OK\n"
+			elif command.startswith("checkLenStack"):
+				line="Programmed instructions: 0 (max 1000)\n"
+			else:
+				continue
+			self.busyUntil=max(time.time(),self.busyUntil)+self.processTime
+			self.answers.append((self.busyUntil,line))
+		return len(data)
+
+	def readline(self):
+		deadline=time.time()+self.timeout
+		while time.time()<deadline:
+			if self.answers and self.answers[0][0]<=time.time():
+				return self.answers.pop(0)[1]
+			time.sleep(0.001)
+		return ""
+
+
+class waitReadyTest(unittest.TestCase):
+
+	def test_lateAnswersAreNotTakenForLaterRequests(self):
+		RF=AD9958.AD9958_class(bootingSerial_class(),25e6,20,80e6)
+		self.assertIsNotNone(RF.connectTime)
+		self.assertEqual(RF.getLenStack(),0)
+		self.assertEqual(RF.getLenStack(),0)
+
+	def test_runningStackIsRestartedAtOnce(self):
+		startTime=time.time()
+		RF=AD9958.AD9958_class(bootingSerial_class(busyTime=60.),25e6,20,80e6)
+		self.assertLess(time.time()-startTime,2.)
+		self.assertIsNotNone(RF.connectTime)
+		self.assertEqual(RF.getLenStack(),0)
+
+
+if __name__=="__main__":
+	unittest.main()